@@ -1,10 +1,22 @@
 # app/core/cache.py
+import asyncio
 import json
+import logging
 import os
-from typing import Any, Optional, Iterable
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Dict, List, Optional, Iterable, Tuple
 from redis.asyncio import Redis
 from redis import Redis as RedisSync
 from app.core.settings import settings
+from app.core.log import log_event
+from app.core.metrics import cache_requests, collect, cumulative_samples, invalidations, redis_call_seconds, redis_errors, register_collector
+from app.core.serialization import dumps_bytes, loads_bytes
+from app.core.local_cache import snapshot_cache, resolver_cache, ruleset_cache, snapshot_flight
+from app.core.stream import stream_notifier
+from app.core.rebuild import snapshot_rebuilder
 """
 normalde /sdk/v1/flags endpoint'i şunu yapar:
 -Env+SDK key alıyor,DB'den flag+variant+rule bilgilerini çekiyor ve bunları tek bir json olarak dönderiyor.
@@ -17,6 +29,10 @@ DB'ye gidilmiyor,yalnızca Redis'ten hazır JSON'u çekiliyor.
 def flags_cache_key(project_id: int, environment_id: int) -> str:
     return f"ff:flags:{project_id}:{environment_id}"
 
+def flags_etag_cache_key(project_id: int, environment_id: int) -> str:
+    # snapshot ile aynı şekilde generation'lı yazılıyor,yani invalidate_project_sync snapshot ile birlikte bunu da geçersiz kılıyor
+    return f"ff:flags:{project_id}:{environment_id}:etag"
+
 def flags_cache_match(project_id: int) -> str:
     return f"ff:flags:{project_id}:*"
 
@@ -24,6 +40,25 @@ def cfg_cache_key(project_id: int, environment_id: Optional[int]) -> str:
     scope = "global" if environment_id is None else str(environment_id)
     return f"ff:cfg:{project_id}:{scope}"
 
+def project_version_key(project_id: int) -> str:
+    return f"ff:version:{project_id}"
+
+def project_gen_key(project_id: int) -> str:
+    return f"ff:gen:{project_id}"
+
+def metrics_key() -> str:
+    return "ff:metrics"
+
+def retired_metrics_key() -> str:
+    return "ff:metrics:retired"
+
+def hot_projects_key() -> str:
+    return "ff:hot_projects"
+
+def generational_key(key: str, gen: int) -> str:
+    # Redis'teki asıl key: ff:flags:{project_id}:{environment_id}:g{gen}
+    return f"{key}:g{gen}"
+
 
 
 
@@ -34,6 +69,11 @@ burda global bir değişken olarak _redis oluşturduk çünkü aşağıdaki meto
 değerini aşağıdaki _get_client() metotundan alacak.
 """
 
+_redis_bytes: Optional[Redis] = None
+"""
+decode_responses=False ile açılmış ikinci async bağlantı.hazır cevap gövdelerini (bytes) okurken kullanıyoruz ki değer önce str'e çevrilip sonra tekrar encode edilmesin.
+"""
+
 _redis_sync: Optional[RedisSync] = None
 """
 sync olarak bir değişken oluşturk,redis bağlantısı için artık bunu kullanacağız.
@@ -55,6 +95,21 @@ async def _get_client() -> Optional[Redis]:
             _redis = None
     return _redis
 
+async def _get_bytes_client() -> Optional[Redis]:
+    global _redis_bytes
+    if _redis_bytes is None:
+        try:
+            _redis_bytes = Redis.from_url(
+                settings.REDIS_URL,
+                decode_responses=False,
+                socket_connect_timeout=1,
+                socket_timeout=1,
+            )
+            await _redis_bytes.ping()
+        except Exception:
+            _redis_bytes = None
+    return _redis_bytes
+
 def _get_client_sync() -> Optional[RedisSync]:
     global _redis_sync
     if _redis_sync is None:
@@ -71,12 +126,27 @@ def _get_client_sync() -> Optional[RedisSync]:
     return _redis_sync
 
 
+async def _timed(op: str, call: Awaitable[Any]) -> Any:
+    t0 = time.perf_counter()
+    try:
+        return await call
+    except Exception:
+        redis_errors.inc(op)
+        raise
+    finally:
+        redis_call_seconds.observe(time.perf_counter() - t0, op)
+"""
+Redis çağrısının süresini işleme (op) göre ff_redis_call_duration_seconds'a yazar,hata olursa ff_redis_errors_total'ı artırıp hatayı çağırana bırakır.
+aşağıdaki metotlar hataları zaten kendileri yakalayıp cache miss gibi davranıyor,sessizce yutulan Redis hataları bu sayede /metrics'te görünüyor.
+"""
+
+
 async def cache_get_json(key: str):
     client = await _get_client()
     if not client:
         return None
     try:
-        raw = await client.get(key)
+        raw = await _timed("get", client.get(key))
         return None if raw is None else json.loads(raw)
     except Exception:
         return None
@@ -87,13 +157,180 @@ async def cache_set_json(key: str, value: Any, ttl_seconds: int = 120):
     if not client:
         return
     try:
-        await client.setex(key, ttl_seconds, json.dumps(value))
+        await _timed("set", client.setex(key, ttl_seconds, json.dumps(value)))
     except Exception:
         pass
 
 
+# projenin generation'ını ve o generation'daki değeri tek round-trip'te okur
+_GET_WITH_GEN_LUA = """
+local gen = redis.call('GET', KEYS[1]) or '0'
+return {gen, redis.call('GET', ARGV[1] .. ':g' .. gen)}
+"""
+
 
-def invalidate_project_sync(project_id: int) -> None:
+async def cache_get_json_gen(project_id: int, key: str) -> Tuple[Optional[int], Any]:
+    client = await _get_client()
+    if not client:
+        return None, None
+    try:
+        gen, raw = await _timed("get_gen", client.eval(_GET_WITH_GEN_LUA, 1, project_gen_key(project_id), key))
+        return int(gen), (None if raw is None else json.loads(raw))
+    except Exception:
+        return None, None
+
+
+async def cache_get_bytes_gen(project_id: int, key: str) -> Tuple[Optional[int], Optional[bytes]]:
+    client = await _get_bytes_client()
+    if not client:
+        return None, None
+    try:
+        gen, raw = await _timed("get_gen", client.eval(_GET_WITH_GEN_LUA, 1, project_gen_key(project_id), key))
+        return int(gen), raw
+    except Exception:
+        cache_requests.inc("redis", "error")
+        return None, None
+
+
+async def cache_report_hot_projects(counts: Dict[int, int], ttl_seconds: int) -> None:
+    if not counts:
+        return
+    client = await _get_client()
+    if not client:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for project_id, count in counts.items():
+            pipe.zincrby(hot_projects_key(), count, project_id)
+        pipe.expire(hot_projects_key(), ttl_seconds)
+        await _timed("hot_projects", pipe.execute())
+    except Exception:
+        pass
+
+
+async def cache_hot_projects(limit: int) -> List[int]:
+    client = await _get_client()
+    if not client:
+        return []
+    try:
+        return [int(pid) for pid in await _timed("hot_projects", client.zrevrange(hot_projects_key(), 0, limit - 1))]
+    except Exception:
+        return []
+"""
+-cache_report_hot_projects: worker'ların saydığı proje başına snapshot isteği sayılarını Redis'teki ff:hot_projects sıralı kümesine (sorted set) ZINCRBY ile ekler.
+key'in TTL'i her raporda yenileniyor,yani hiç trafik gelmezse küme kendiliğinden siliniyor.
+-cache_hot_projects en çok istek alan projelerin id'lerini çoktan aza doğru döner,process açılırken hangi projelerin önceden ısıtılacağını bulmak için kullanılıyor (core/snapshots.py warm_up).
+"""
+
+
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+async def cache_lock(key: str, gen: Optional[int], ttl_ms: int) -> Tuple[bool, Optional[str]]:
+    if gen is None:
+        return True, None
+    client = await _get_client()
+    if not client:
+        return True, None
+    token = uuid.uuid4().hex
+    try:
+        acquired = await _timed("lock", client.set(f"{generational_key(key, gen)}:lock", token, nx=True, px=ttl_ms))
+    except Exception:
+        return True, None
+    return (True, token) if acquired else (False, None)
+
+
+async def cache_unlock(key: str, gen: Optional[int], token: Optional[str]) -> None:
+    if gen is None or token is None:
+        return
+    client = await _get_client()
+    if not client:
+        return
+    try:
+        await _timed("unlock", client.eval(_UNLOCK_LUA, 1, f"{generational_key(key, gen)}:lock", token))
+    except Exception:
+        pass
+
+
+async def cache_set_json_gen(project_id: int, gen: Optional[int], items: Dict[str, Any], ttl_seconds: int = 120):
+    if gen is None:
+        return
+    client = await _get_client()
+    if not client:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for key, value in items.items():
+            # bytes değerler (hazır cevap gövdesi) olduğu gibi yazılıyor
+            pipe.setex(generational_key(key, gen), ttl_seconds, value if isinstance(value, bytes) else json.dumps(value))
+        await _timed("set_gen", pipe.execute())
+    except Exception:
+        pass
+"""
+-generation tabanlı cache: her projenin Redis'te ff:gen:{project_id} adında bir sayacı var ve projenin cache key'lerinin sonuna bu sayaç ekleniyor (ff:flags:1:2:g7 gibi).
+admin bir değişiklik yaptığında key'leri tek tek bulup silmek yerine sadece sayacı bir artırıyoruz (INCR),bundan sonra okumalar yeni generation'daki key'e bakıyor,eski key'ler de kimse okumadığı için TTL dolunca kendiliğinden siliniyor.
+-cache_get_json_gen generation'ı ve o generation'daki değeri küçük bir Lua script ile tek round-trip'te okuyor ve ikisini birlikte dönüyor.değer yoksa (cache miss) dönen generation ile
+cache_set_json_gen'i çağırıyoruz.bunun güzel bir yan etkisi var: snapshot DB'den oluşturulurken araya bir admin değişikliği girerse sayaç artmış olacağı için eski veriyi artık kimsenin okumadığı eski generation'a yazmış oluyoruz,
+yani eski veri cache'e giremiyor.
+-Redis'e ulaşılamazsa generation None dönüyor ve yazma işlemi yapılmıyor.
+-cache_get_bytes_gen aynı okumayı yapar ama değeri json.loads etmeden byte olarak döner (core/snapshots.py'deki hazır snapshot gövdeleri için),cache_set_json_gen'e bytes verilen değerler de json'a çevrilmeden yazılıyor.
+-cache_lock/cache_unlock: cache miss durumunda snapshot'ı sadece bir process'in oluşturması için generation'lı key'e ait kısa ömürlü bir kilit (SET NX PX).
+kilidi alan process DB'den oluşturup yazıyor,alamayanlar key'in dolmasını bekliyor (core/snapshots.py'deki _fill_snapshot).kilidi sadece alan process silebiliyor (token karşılaştırması ile),
+process kilidi tutarken ölürse kilit PX süresi dolunca kendiliğinden kalkıyor.Redis yoksa ya da generation bilinmiyorsa kilit olmadan devam ediyoruz (should_build=True,token=None).
+-not: Lua script key'in tam adını generation'a göre kendisi oluşturduğu için Redis Cluster'da bütün key'lerin aynı slot'ta olması gerekir,tek Redis/replica kurulumunda sorun yok.
+ayrıca ff:gen:* key'lerinin TTL'i yok,maxmemory-policy olarak volatile-* politikalarından biri kullanılırsa bu sayaçlar hiçbir zaman silinmez.
+"""
+
+
+
+# bu process'in kimliği,kendi yayınladığımız invalidation mesajlarını tekrar işlememek için
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# ff:version:{project_id} değerini sadece büyütecek şekilde yazar (geç gelen eski bir yayın versiyonu geri almasın)
+_SET_MAX_VERSION_LUA = """
+local cur = tonumber(redis.call('GET', KEYS[1]) or '0')
+local new = tonumber(ARGV[1])
+if new > cur then
+    redis.call('SET', KEYS[1], ARGV[1])
+    return new
+end
+return cur
+"""
+
+
+def invalidate_project_local(project_id: int) -> None:
+    local_prefix = flags_cache_match(project_id).rstrip("*")
+    snapshot_cache.delete_prefix(local_prefix)
+    ruleset_cache.delete_prefix(local_prefix)
+    snapshot_flight.forget_prefix(local_prefix)
+    stream_notifier.notify(project_id)
+
+
+def invalidate_project_sync(project_id: int, version: Optional[int] = None) -> float:
+    # iş kuyruğa ekleniyor,dönen değer değişikliğin SDK'lara görünür olacağı zaman (epoch sn)
+    return invalidation_queue.submit(project_id, version)
+
+
+def _invalidate_projects_now(projects: Dict[int, Optional[int]]) -> None:
+    # L1 (process içi) cache Redis kapalı olsa da her zaman temizlenir
+    for project_id, version in projects.items():
+        invalidate_project_local(project_id)
+        # kendi yazmalarımızın mesajları bu worker'a geri geldiğinde atlanıyor,versiyonu resync için burada kaydediyoruz
+        if version is not None:
+            _last_versions[project_id] = max(_last_versions.get(project_id, 0), version)
+    invalidations.inc("applied", amount=len(projects))
+    _invalidate_projects_redis(projects)
+    # L1 ve generation temizlendikten sonra snapshot'ları arka planda yeniden oluştur (write-through)
+    for project_id in projects:
+        snapshot_rebuilder.schedule(project_id)
+
+
+def _invalidate_projects_redis(projects: Dict[int, Optional[int]]) -> None:
     if os.getenv("REDIS_ENABLED", "0") != "1":
         return
 
@@ -102,26 +339,26 @@ def invalidate_project_sync(project_id: int) -> None:
         return
 
     try:
-        # Pipelined invalidation for both flags and configs
         pipe = r.pipeline()
-        found_any = False
-
-        # Patterns to invalidate
-        patterns = [
-            flags_cache_match(project_id), # ff:flags:{project_id}:*
-            f"ff:cfg:{project_id}:*"      # ff:cfg:{project_id}:*
-        ]
+        for project_id, version in projects.items():
+            # key'leri SCAN ile arayıp silmek yerine projenin generation'ını artırıyoruz,eski key'ler TTL ile kendiliğinden siliniyor
+            pipe.incr(project_gen_key(project_id))
 
-        for pattern in patterns:
-            for k in r.scan_iter(match=pattern):
-                pipe.delete(k)
-                found_any = True
-
-        if found_any:
+            # diğer replica'lara haber ver: versiyonu kaydet ve kanala yayınla
+            if version is not None:
+                pipe.eval(_SET_MAX_VERSION_LUA, 1, project_version_key(project_id), int(version))
+            pipe.publish(
+                settings.INVALIDATION_CHANNEL,
+                json.dumps({"project_id": project_id, "version": version, "origin": WORKER_ID}),
+            )
+        t0 = time.perf_counter()
+        try:
             pipe.execute()
+        finally:
+            redis_call_seconds.observe(time.perf_counter() - t0, "invalidate")
 
     except Exception:
-        pass
+        redis_errors.inc("invalidate")
 
 
 
@@ -134,4 +371,392 @@ satır sayesinde yani pipeline() ifadesi sayesinde cache'de yapacağımız deği
 kullanıyoruz.ardından eğer ki herhangi bir cache işlemi yapmayacaksak bunu found_any değişkenine bildiriyoruz,bu şekilde herhangi bir sorgu yapılmayacaksa boş execute yapmamaış olacağız.
 for döngüsünde ise cache'deki keyleri dolaşıyoruz.eğer ki key varsa bu keyin silinmesi talimatını pipe'a ekliyoruz ve found_any değişkenini true yapıyoruz.sonrasında ise bir sorgu varsa bunu if ile kontrol edip çalıştırıyoruz.
 -son satırda ise eğer ki bir hata oluşursa hiçbir şey yapmadan geç diyoruz(zaten bir cache'nin ömrü 120 sn olduğu için geç de olsa bu bilgiler farklı yerlerde görünecektir.)
+Güncelleme: metotun en başında artık bu worker'ın L1 cache'inde (local_cache.py) bu projeye ait snapshot'ları da siliyoruz.bu işlemi REDIS_ENABLED kontrolunden önce yapıyoruz çünkü L1 cache Redis'ten
+bağımsız olarak her zaman çalışıyor.derlenmiş kuralları tutan ruleset_cache de aynı keyleri kullandığı için onu da birlikte temizliyoruz.
+Güncelleme2: L1 temizlendikten sonra stream_notifier.notify ile bu projeyi dinleyen SSE bağlantılarına haber veriyoruz,bağlantılar snapshot'ı yeniden yükleyip değişiklikleri gönderiyor.
+Güncelleme3: L1 temizleme kısmı invalidate_project_local metotuna alındı.Redis key'leri silindikten sonra aynı pipeline içinde INVALIDATION_CHANNEL kanalına bir mesaj yayınlıyoruz,böylece
+diğer replica'lar/worker'lar da kendi L1 cache'lerini hemen temizliyor (aşağıdaki run_invalidation_subscriber).admin endpointleri record_change'den aldıkları versiyonu da gönderiyor,
+bu versiyonu ff:version:{project_id} key'ine de yazıyoruz ki mesajı kaçıran worker'lar sonradan karşılaştırıp fark edebilsin.artık pipeline her zaman execute ediliyor çünkü içinde en azından publish var.
+Güncelleme4: scan_iter ile ff:flags:{project_id}:* ve ff:cfg:{project_id}:* key'lerini arayıp silme kısmı kaldırıldı.SCAN bütün Redis key'lerini dolaştığı için süresi bütün projelerdeki key sayısı ile artıyordu
+ve admin isteğini o süre boyunca bekletiyordu.artık sadece INCR ff:gen:{project_id} yapıyoruz (yukarıdaki generation tabanlı cache),yani invalidation key sayısından bağımsız olarak tek bir komut.
+INCR,versiyon yazma ve publish aynı pipeline'da gittiği için hâlâ tek round-trip.
+Güncelleme5: Redis kısmı _invalidate_projects_redis metotuna alındı.temizleme bittikten sonra (Redis kapalı olsa bile) snapshot_rebuilder.schedule ile projenin bütün ortamlarının snapshot'ları
+arka planda yeniden oluşturuluyor (core/rebuild.py),yani admin değişikliğinden sonraki ilk SDK isteği snapshot'ı DB'den oluşturmayı beklemiyor.schedule generation artırıldıktan sonra çağrılıyor ki
+yeniden oluşturulan snapshot yeni generation'a yazılsın.
+Güncelleme6: invalidate_project_sync artık işi kendisi yapmıyor,aşağıdaki invalidation_queue'ya ekleyip hemen dönüyor ve değişikliğin ne zaman görünür olacağını (epoch sn) dönüyor.
+asıl iş _invalidate_projects_now'da,aynı anda zamanı gelen bütün projeler için L1 temizliği yapılıp Redis komutları tek bir pipeline'da gönderiliyor.
 """  
+
+
+class InvalidationQueue:
+    def __init__(self):
+        self._pending: Dict[int, Tuple[float, Optional[int]]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.flushed = 0
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._worker, name="ff-invalidation", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        # kapanırken bekleyen işleri kaybetmiyoruz,hemen uyguluyoruz
+        self._flush(force=True)
+
+    def submit(self, project_id: int, version: Optional[int]) -> float:
+        debounce = settings.INVALIDATION_DEBOUNCE_MS / 1000
+        with self._cond:
+            queued = self._running and debounce > 0
+            if queued:
+                self.submitted += 1
+                pending = self._pending.get(project_id)
+                if pending is None:
+                    due_at = time.monotonic() + debounce
+                    self._pending[project_id] = (due_at, version)
+                    self._cond.notify_all()
+                else:
+                    # aynı proje için bekleyen bir iş var,ona katılıyoruz (zamanı değişmiyor)
+                    self.coalesced += 1
+                    due_at = pending[0]
+                    if version is not None and (pending[1] is None or version > pending[1]):
+                        self._pending[project_id] = (due_at, version)
+        if not queued:
+            _invalidate_projects_now({project_id: version})
+            return time.time()
+        return time.time() + max(0.0, due_at - time.monotonic())
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                wait = min(due_at for due_at, _ in self._pending.values()) - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+            self._flush()
+
+    def _flush(self, force: bool = False) -> None:
+        now = time.monotonic()
+        with self._cond:
+            due = {pid: version for pid, (due_at, version) in self._pending.items() if force or due_at <= now}
+            for pid in due:
+                del self._pending[pid]
+        if not due:
+            return
+        self.batches += 1
+        self.flushed += len(due)
+        try:
+            _invalidate_projects_now(due)
+        except Exception as e:
+            log_event("invalidation.flush_failed", logging.ERROR, error=repr(e))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "running": self._running,
+            "pending": pending,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "flushed": self.flushed,
+            "debounce_ms": settings.INVALIDATION_DEBOUNCE_MS,
+        }
+"""
+-admin yazmalarından sonra yapılan invalidation işlerini kuyruğa alıp istek dışında (ayrı bir thread'de) çalıştıran sınıf.
+-bir proje için ilk iş geldiğinde INVALIDATION_DEBOUNCE_MS sonrası için zamanlanıyor,bu süre içinde aynı projeye gelen diğer işler yeni bir iş açmıyor,bekleyen işe katılıyor (coalescing),
+versiyon olarak da en büyüğü tutuluyor.yani bir script 200 değişikliği arka arkaya yaparsa 200 yerine pencere başına bir invalidation yapılıyor.
+-bekleme penceresini yeni gelen işlerle uzatmıyoruz (sabit pencere),böylece submit'in admin'e döndüğü "şu zamanda görünür olacak" bilgisi sonradan gelen işler yüzünden kaymıyor.
+-zamanı gelen bütün projeler tek bir _invalidate_projects_now çağrısı ile uygulanıyor,Redis komutları da tek pipeline'da gidiyor.
+-kuyruk start() ile başlatılmadıysa (script'ler,testler) ya da INVALIDATION_DEBOUNCE_MS 0 ise submit işi eskisi gibi hemen,çağıran thread'de yapıyor.
+-stop() worker thread'i durdurup bekleyen bütün işleri hemen uyguluyor,yani kapanış sırasında bir değişikliğin invalidation'ı kaybolmuyor.
+-süre hesapları time.monotonic() ile yapılıyor,admin'e dönülen zaman ise duvar saatine (time.time()) çevrilip veriliyor.
+"""
+
+invalidation_queue = InvalidationQueue()
+
+
+def invalidate_sdk_resolution_sync() -> None:
+    resolver_cache.clear()
+"""
+yeni bir sdk key ya da environment eklendiğinde (create_key/create_env) çağrılır.bu durumda daha önce "geçersiz key" ya da "bilinmeyen ortam" diye cache'lediğimiz sonuçlar artık
+geçerli hale gelmiş olabilir,bu yüzden SDK key çözümleme cache'ini komple temizliyoruz.bu işlemler nadir yapıldığı için tek tek key aramak yerine hepsini silmek yeterli.
+"""
+
+
+invalidation_stats: Dict[str, Any] = {
+    "connected": False,
+    "received": 0,
+    "ignored_own": 0,
+    "gaps": 0,
+    "resyncs": 0,
+    "resync_evictions": 0,
+    "reconnects": 0,
+}
+_last_versions: Dict[int, int] = {}
+
+
+def _cached_project_versions() -> Dict[int, int]:
+    versions: Dict[int, int] = {}
+    for key, value in snapshot_cache.items():
+        if not isinstance(key, str) or not isinstance(value, dict):
+            continue
+        parts = key.split(":")
+        # sadece snapshot'ların kendisi: ff:flags:{project_id}:{environment_id}
+        if len(parts) != 4 or parts[0] != "ff" or parts[1] != "flags":
+            continue
+        try:
+            project_id = int(parts[2])
+            version = int(value.get("version", 0))
+        except (TypeError, ValueError):
+            continue
+        versions[project_id] = min(versions.get(project_id, version), version)
+    return versions
+
+
+async def _resync_versions(client: Redis) -> int:
+    cached = _cached_project_versions()
+    invalidation_stats["resyncs"] += 1
+    if not cached:
+        return 0
+    project_ids = list(cached)
+    published = await client.mget([project_version_key(pid) for pid in project_ids])
+    evicted = 0
+    for project_id, raw in zip(project_ids, published):
+        if raw is None:
+            continue
+        latest = int(raw)
+        # tek bir ortamı etkileyen değişikliklerde diğer ortamların snapshot versiyonu geride kalıyor (bkz. snapshots.materialize_snapshots),
+        # bu yüzden bu worker'ın mesajlardan öğrendiği son versiyonu da hesaba katıyoruz
+        known = max(cached[project_id], _last_versions.get(project_id, 0))
+        _last_versions[project_id] = max(_last_versions.get(project_id, 0), latest)
+        if latest > known:
+            invalidate_project_local(project_id)
+            evicted += 1
+    invalidation_stats["resync_evictions"] += evicted
+    return evicted
+"""
+mesaj kaçırma durumuna karşı (Redis pub/sub mesajları saklamaz,bağlantı koptuğu anda yayınlanan mesajlar kaybolur) bu worker'ın L1'indeki snapshot'ların versiyonlarını
+Redis'teki ff:version:{project_id} değerleriyle karşılaştırıyoruz.snapshot'ın versiyonu yayınlanan son versiyondan küçükse o proje için kaçırdığımız bir değişiklik var demektir ve projeyi L1'den siliyoruz.
+Güncelleme: snapshot versiyonu artık o ortamı etkileyen son değişikliğin versiyonu,projenin son versiyonundan küçük olabiliyor.karşılaştırmayı snapshot versiyonu ile bu worker'ın mesajlardan
+(ya da bir önceki resync'ten) öğrendiği son versiyonun büyüğüne göre yapıyoruz,yoksa başka bir ortamda değişiklik olan projeler her resync'te L1'den siliniyordu.
+bütün projeler için tek bir MGET ile tek round-trip yapılıyor.
+"""
+
+
+def _handle_invalidation_message(raw: Any) -> bool:
+    try:
+        msg = json.loads(raw)
+        project_id = int(msg["project_id"])
+        version = msg.get("version")
+        if version is not None:
+            version = int(version)
+    except Exception:
+        return False
+
+    invalidation_stats["received"] += 1
+    last = _last_versions.get(project_id)
+    if version is not None:
+        _last_versions[project_id] = max(last or 0, version)
+
+    if msg.get("origin") == WORKER_ID:
+        # bu worker zaten invalidate_project_sync içinde kendi L1'ini temizledi,sadece versiyonu kaydediyoruz
+        invalidation_stats["ignored_own"] += 1
+        return False
+
+    invalidate_project_local(project_id)
+
+    if version is None:
+        return False
+    if last is not None and version > last + 1:
+        invalidation_stats["gaps"] += 1
+        return True
+    return False
+
+
+async def run_invalidation_subscriber(stop: asyncio.Event) -> None:
+    backoff = 0.5
+    while not stop.is_set():
+        client: Optional[Redis] = None
+        pubsub = None
+        try:
+            # socket_timeout vermiyoruz çünkü kanal uzun süre sessiz kalabilir
+            client = Redis.from_url(settings.REDIS_URL, decode_responses=True, socket_connect_timeout=1)
+            pubsub = client.pubsub()
+            await pubsub.subscribe(settings.INVALIDATION_CHANNEL)
+            invalidation_stats["connected"] = True
+            backoff = 0.5
+
+            # abone olmadan önce (ya da bağlantı koptuğu sırada) yayınlanmış mesajları kaçırmış olabiliriz
+            await _resync_versions(client)
+            last_resync = time.monotonic()
+
+            while not stop.is_set():
+                msg = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                gap = False
+                if msg and msg.get("type") == "message":
+                    gap = _handle_invalidation_message(msg.get("data"))
+                if gap or time.monotonic() - last_resync >= settings.INVALIDATION_RESYNC_SECONDS:
+                    await _resync_versions(client)
+                    last_resync = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            invalidation_stats["reconnects"] += 1
+            log_event("invalidation.subscriber_disconnected", logging.WARNING, error=repr(e), retry_seconds=round(backoff, 1))
+        finally:
+            invalidation_stats["connected"] = False
+            try:
+                if pubsub is not None:
+                    await pubsub.aclose()
+                if client is not None:
+                    await client.aclose()
+            except Exception:
+                pass
+
+        if not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, 30.0)
+"""
+-her worker'da lifespan ile başlatılan arka plan görevi.INVALIDATION_CHANNEL kanalına abone olup gelen her mesajda ilgili projeyi kendi L1 cache'inden siliyor ve o projeyi dinleyen SSE bağlantılarına haber veriyor.
+-Redis bağlantısı koparsa ya da hiç kurulamazsa 0.5 sn'den başlayıp 30 sn'ye kadar artan aralıklarla (exponential backoff) tekrar bağlanmayı deniyor.
+-her bağlantıdan sonra,INVALIDATION_RESYNC_SECONDS'ta bir ve bir projede versiyon atlaması (gap) gördüğümüzde _resync_versions ile versiyon karşılaştırması yapıyoruz,
+yani kaçırılan mesajlar en geç bir resync aralığı sonra fark ediliyor.
+-mesajlarda origin alanı yayınlayan worker'ın kimliği,kendi mesajlarımızı tekrar işlemiyoruz.ama versiyonlarını yine de _last_versions'a yazıyoruz,
+yoksa sonraki başka bir worker'ın mesajı bir sonraki versiyon olduğu halde gap gibi görünüp gereksiz resync yapılıyordu.
+-get_message'a timeout verdiğimiz için döngü en fazla 1 sn'de bir stop event'ini kontrol ediyor,uygulama kapanırken görev beklemeden sonlanıyor.
+"""
+
+
+def _collect_invalidation_metrics():
+    for event in ("received", "ignored_own", "gaps", "resyncs", "resync_evictions", "reconnects"):
+        yield "ff_invalidation_events_total", (event,), invalidation_stats[event]
+    yield "ff_invalidation_events_total", ("submitted",), invalidation_queue.submitted
+    yield "ff_invalidation_events_total", ("coalesced",), invalidation_queue.coalesced
+
+
+register_collector(_collect_invalidation_metrics)
+"""
+invalidation sayaçları (bu worker'a gelen yayınlar,kaçırılan mesajlar,kuyruğa eklenen ve birleşen işler) zaten invalidation_stats ve invalidation_queue'da tutuluyor,/metrics'e okuma anında buradan veriliyor.
+uygulanan invalidation sayısı (applied) _invalidate_projects_now içinde proje başına sayılıyor.
+"""
+
+
+_RETIRE_WORKER_LUA = """
+if redis.call('HDEL', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HINCRBYFLOAT', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+
+def _retired_fields(samples: List[List[Any]]) -> List[Any]:
+    args: List[Any] = []
+    for name, labels, value in cumulative_samples(samples):
+        if isinstance(value, list):
+            for index, item in enumerate(value):
+                args += [dumps_bytes([name, labels, index]), item]
+        else:
+            args += [dumps_bytes([name, labels]), value]
+    return args
+
+
+def _retired_samples(raw: Dict[bytes, bytes]) -> List[List[Any]]:
+    scalars: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+    lists: Dict[Tuple[str, Tuple[str, ...]], Dict[int, float]] = {}
+    for field, raw_value in raw.items():
+        try:
+            key = loads_bytes(field)
+            value = float(raw_value)
+        except Exception:
+            continue
+        value = int(value) if value.is_integer() else value
+        if len(key) == 3:
+            lists.setdefault((key[0], tuple(key[1])), {})[int(key[2])] = value
+        else:
+            scalars[(key[0], tuple(key[1]))] = value
+    samples = [[name, list(labels), value] for (name, labels), value in scalars.items()]
+    for (name, labels), items in lists.items():
+        samples.append([name, list(labels), [items.get(index, 0) for index in range(max(items) + 1)]])
+    return samples
+
+
+async def cache_report_metrics(samples: List[List[Any]]) -> Optional[List[Tuple[List[List[Any]], float]]]:
+    client = await _get_bytes_client()
+    if not client:
+        return None
+    now = time.time()
+    try:
+        # MULTI/EXEC: iki hash aynı anda okunuyor,arada başka bir worker'ın taşıdığı bir kayıt iki tarafta birden görünmüyor
+        pipe = client.pipeline(transaction=True)
+        pipe.hset(metrics_key(), WORKER_ID, dumps_bytes({"reported_at": now, "samples": samples}))
+        pipe.hgetall(metrics_key())
+        pipe.hgetall(retired_metrics_key())
+        _, reports, retired = await _timed("metrics", pipe.execute())
+    except Exception:
+        return None
+
+    workers: List[Tuple[List[List[Any]], float]] = []
+    for worker_id, raw in reports.items():
+        try:
+            report = loads_bytes(raw)
+        except Exception:
+            continue
+        if now - report["reported_at"] > settings.METRICS_WORKER_TTL_SECONDS:
+            # kapanmış worker: sayaçlarını ff:metrics:retired'a ekleyip kaydını siliyoruz.ikisi aynı script'te,
+            # HDEL'i başaran tek bir istek ekleme yapıyor,yani aynı anda okuyan iki worker aynı değerleri iki kez eklemiyor.
+            # okuduğumuz retired değerlerinde bu kayıt henüz yok,bu yüzden kimin taşıdığından bağımsız olarak bu okumada kaydın kendisini topluyoruz
+            try:
+                await _timed("metrics", client.eval(
+                    _RETIRE_WORKER_LUA, 2, metrics_key(), retired_metrics_key(), worker_id, *_retired_fields(report["samples"])
+                ))
+            except Exception:
+                return None
+        workers.append((report["samples"], report["reported_at"]))
+    workers.append((_retired_samples(retired), 0.0))
+    return workers
+
+
+async def run_metrics_reporter(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.METRICS_REPORT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        await cache_report_metrics(collect())
+"""
+-birden fazla uvicorn worker'ı (ya da replica) olduğunda /metrics isteği bunlardan sadece birine gidiyor,her worker'ın sayaçları ise kendi belleğinde.bu yüzden her worker
+METRICS_REPORT_SECONDS'ta bir kendi değerlerinin tamamını (toplam değerler,fark değil) Redis'teki ff:metrics hash'ine kendi WORKER_ID'si ile yazıyor.
+-/metrics isteğini alan worker önce kendi güncel değerlerini yazıp aynı pipeline'da bütün worker'ların kayıtlarını okuyor ve hepsini topluyor (core/metrics.py render),
+yani bir worker'ın değerleri en fazla bir rapor aralığı kadar eski olabiliyor.toplam değerler yazıldığı için bir rapor kaybolsa bile bir sonraki rapor eksikleri kapatıyor.
+-METRICS_WORKER_TTL_SECONDS'tan uzun süredir rapor vermeyen (kapanmış) worker'ların kayıtları okuma sırasında siliniyor.o zamana kadar sayaçları toplama dahil edilmeye devam ediyor ki
+bir worker yeniden başladığında toplam sayaçlar hemen geri gitmesin.
+Güncelleme: silinen kaydın sayaç ve histogram değerleri atılmıyor,ff:metrics:retired hash'ine ekleniyor (her seri/histogram kovası bir alan,HINCRBYFLOAT ile) ve bu hash her okumada
+toplama bir worker gibi dahil ediliyor.önceden kayıt silindiğinde toplam sayaçlar geri gidiyordu,Prometheus bunu sayaç sıfırlanması sanıp rate()/increase()'de sıçrama gösteriyordu.
+gauge'lar anlık değer oldukları için taşınmıyor.
+-Redis'e ulaşılamazsa cache_report_metrics None dönüyor,/metrics bu durumda 503 dönüyor (bkz. routers/metrics.py).
+"""
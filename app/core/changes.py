@@ -0,0 +1,96 @@
+# app/core/changes.py
+from typing import Iterable, Optional, Set, Tuple
+from sqlmodel import Session, select
+from sqlalchemy import update, delete, insert, func
+
+from app.core.settings import settings
+from app.models import Project, ProjectChange
+"""
+delta sync için projelerin değişiklik geçmişini tutan yardımcı metotlar.
+admin tarafındaki her yazma işlemi kendi transaction'ı içinde record_change'i çağırıyor,böylece projenin change_version sayacı ve değişiklik kaydı yapılan değişiklikle birlikte commit ediliyor
+(ya da birlikte rollback oluyor).SDK tarafı ise /sdk/v1/flags?since=<version> isteklerinde load_changes ile bu kayıtları okuyup sadece değişen flag ve config keylerini dönüyor.
+"""
+
+CHANGE_FLAG = "flag"
+CHANGE_CONFIG = "config"
+
+
+def current_version(session: Session, project_id: int) -> int:
+    version = session.exec(select(Project.change_version).where(Project.id == project_id)).first()
+    return int(version or 0)
+
+
+def record_change(session: Session, project_id: int, kind: str, key: str, environment_id: Optional[int] = None) -> int:
+    return record_changes(session, project_id, [(kind, key, environment_id)])
+
+
+def record_changes(session: Session, project_id: int, changes: Iterable[Tuple[str, str, Optional[int]]]) -> int:
+    session.exec(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(change_version=Project.change_version + 1)
+    )
+    version = current_version(session, project_id)
+    rows = [
+        {"project_id": project_id, "version": version, "kind": kind, "key": key, "environment_id": environment_id}
+        for kind, key, environment_id in set(changes)
+    ]
+    if rows:
+        session.exec(insert(ProjectChange), params=rows)
+
+    # en eski kayıtları sil,bu kadar geride kalan istemciler zaten tam snapshot alacak
+    retention = max(1, settings.DELTA_CHANGE_LOG_RETENTION)
+    session.exec(
+        delete(ProjectChange).where(
+            ProjectChange.project_id == project_id,
+            ProjectChange.version <= version - retention,
+        )
+    )
+    return version
+"""
+-record_change metotu commit etmez,çağıran endpoint kendi session.commit()'ini yaptığında sayaç,değişiklik kaydı ve asıl değişiklik aynı transaction'da yazılmış olur.
+-sayacı önce okuyup sonra +1 yazmak yerine change_version = change_version + 1 şeklinde tek bir UPDATE ile artırıyoruz.bu UPDATE satırı transaction bitene kadar kilitlediği için aynı projeye aynı anda
+gelen iki admin isteği aynı versiyonu alamıyor,sayaç her zaman artarak ilerliyor.
+-kind "flag" ya da "config" olabilir,key ise değişen flag'in ya da config'in key'idir.environment_id yalnızca tek bir ortamı etkileyen değişikliklerde (kural,env'e özel config) dolu,None ise değişiklik bütün ortamları etkiliyor.
+-her projede en fazla DELTA_CHANGE_LOG_RETENTION kadar versiyon geriye gidecek şekilde kayıt tutuyoruz,daha eskileri siliyoruz.
+-record_changes aynı işi birden fazla değişiklik için yapar (bulk import).sayaç sadece bir kez artıyor ve bütün değişiklik kayıtları aynı versiyonla yazılıyor,yani bir versiyonda birden fazla kayıt olabilir.
+load_changes zaten versiyon aralığındaki bütün kayıtları okuduğu için delta tarafında bir şey değişmiyor.aynı (kind,key,environment_id) birden fazla verilirse tek kayıt yazılıyor.
+kayıtlar tek bir INSERT ile (executemany) yazılıyor,ORM'in satır satır insert'ü binlerce kayıtta yavaş kalıyordu.
+"""
+
+
+def load_changes(
+    session: Session,
+    project_id: int,
+    environment_id: int,
+    since: int,
+    until: int,
+) -> Optional[Tuple[Set[str], Set[str]]]:
+    oldest = session.exec(
+        select(func.min(ProjectChange.version)).where(ProjectChange.project_id == project_id)
+    ).first()
+    if oldest is None or since + 1 < int(oldest):
+        return None
+
+    rows = session.exec(
+        select(ProjectChange.kind, ProjectChange.key, ProjectChange.environment_id).where(
+            ProjectChange.project_id == project_id,
+            ProjectChange.version > since,
+            ProjectChange.version <= until,
+        )
+    ).all()
+
+    flag_keys: Set[str] = set()
+    config_keys: Set[str] = set()
+    for kind, key, env_id in rows:
+        if env_id is not None and env_id != environment_id:
+            continue
+        if kind == CHANGE_FLAG:
+            flag_keys.add(key)
+        elif kind == CHANGE_CONFIG:
+            config_keys.add(key)
+    return flag_keys, config_keys
+"""
+since (hariç) ile until (dahil) arasındaki versiyonlarda bu ortamı etkileyen değişen flag ve config keylerini döner.
+istemcinin istediği versiyonların kayıtları silinmişse (istemci çok geride kalmışsa) ya da projede hiç kayıt yoksa None dönüyor,bu durumda SDK endpointi tam snapshot gönderiyor.
+"""
@@ -1,8 +1,22 @@
-﻿import sqlite3
+﻿import asyncio
+import sqlite3
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
 from sqlmodel import SQLModel, create_engine, Session
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
+from sqlalchemy import event, exc, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+from app.core.metrics import (
+    db_errors,
+    db_pool_checkout_seconds,
+    db_pool_pings,
+    db_pool_timeouts,
+    db_query_seconds,
+    register_collector,
+)
 from app.core.settings import settings
 from dotenv import load_dotenv
 
@@ -19,7 +33,186 @@ if not DATABASE_URL:
     DB_NAME = os.getenv("DB_NAME", "feature_flags")
     DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL, echo=False, pool_pre_ping=True)
+
+class PoolMetrics:
+    def __init__(self) -> None:
+        self.wait_seconds_max = 0.0
+
+    def observe(self, seconds: float, timed_out: bool = False) -> None:
+        db_pool_checkout_seconds.observe(seconds)
+        if timed_out:
+            db_pool_timeouts.inc()
+        if seconds > self.wait_seconds_max:
+            self.wait_seconds_max = seconds
+
+    def ping(self, ok: bool) -> None:
+        db_pool_pings.inc("ok" if ok else "failed")
+
+    def stats(self) -> Dict[str, Any]:
+        histogram = db_pool_checkout_seconds.value()
+        buckets, wait_seconds_total = histogram[:-1], histogram[-1]
+        observed = sum(buckets)
+        timeouts = int(db_pool_timeouts.value())
+        pings_failed = int(db_pool_pings.value("failed"))
+        labels = [f"le_{bound * 1000:g}ms" for bound in db_pool_checkout_seconds.buckets] + ["le_inf"]
+        return {
+            "checkouts": observed - timeouts,
+            "timeouts": timeouts,
+            "wait_seconds_total": round(wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+            "wait_ms_avg": round(wait_seconds_total * 1000 / observed, 3) if observed else 0.0,
+            "pings": int(db_pool_pings.value("ok")) + pings_failed,
+            "ping_failures": pings_failed,
+            "checkout_latency_histogram": dict(zip(labels, buckets)),
+        }
+
+
+pool_metrics = PoolMetrics()
+"""
+bağlantı havuzunun istatistikleri.havuzdan bağlantı alan her çağrının ne kadar beklediği (yeni bağlantı açma süresi dahil) observe ile histogram kovalarına yazılıyor,
+havuz dolu olduğu için DB_POOL_TIMEOUT_SECONDS içinde bağlantı alamayan çağrılar timeouts'ta sayılıyor.
+histogram kovaları kümülatif değil,her kova sadece kendi aralığına düşen alışları sayıyor (le_10ms: 5-10 ms arası).
+Güncelleme: sayaçlar artık core/metrics.py'deki kilitsiz metriklerde (ff_db_pool_*) tutuluyor,/metrics ve /admin/v1/db/stats aynı değerleri gösteriyor.wait_seconds_max sadece bu worker için,
+iki thread aynı anda yazarsa en kötü ihtimalle büyük olan değer bir sonraki daha uzun beklemeye kadar kaybolabiliyor.
+"""
+
+
+class _InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.observe(time.perf_counter() - t0, timed_out=True)
+            raise
+        pool_metrics.observe(time.perf_counter() - t0)
+        return connection
+
+
+def _ping(dbapi_connection) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    finally:
+        cursor.close()
+
+
+def _install_idle_pre_ping(target, idle_seconds: float) -> None:
+    @event.listens_for(target, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(target, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        try:
+            _ping(dbapi_connection)
+        except Exception as e:
+            pool_metrics.ping(False)
+            # havuz bu bağlantıyı atıp yenisiyle tekrar deniyor
+            raise exc.DisconnectionError(str(e)) from e
+        pool_metrics.ping(True)
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    options: Dict[str, Any] = {"echo": False}
+    pre_ping = settings.DB_POOL_PRE_PING.lower()
+    if pre_ping not in ("always", "idle", "never"):
+        raise ValueError(f"DB_POOL_PRE_PING must be always, idle or never (got {settings.DB_POOL_PRE_PING!r})")
+    options["pool_pre_ping"] = pre_ping == "always"
+
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # bellek içi sqlite tek bağlantılı kendi havuzunu kullanıyor,boyut ayarları ona uygulanamaz
+        return options
+    options.update(
+        poolclass=_InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    )
+    return options
+
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+if settings.DB_POOL_PRE_PING.lower() == "idle":
+    _install_idle_pre_ping(engine, settings.DB_POOL_PRE_PING_IDLE_SECONDS)
+
+
+_STATEMENT_KINDS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+
+def _statement_kind(statement: str) -> str:
+    kind = statement.lstrip()[:6].upper()
+    return kind if kind in _STATEMENT_KINDS else "OTHER"
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if started:
+        db_query_seconds.observe(time.perf_counter() - started.pop(), _statement_kind(statement))
+
+
+@event.listens_for(engine, "handle_error")
+def _query_failed(context):
+    if context.connection is not None:
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+    db_errors.inc(_statement_kind(context.statement or ""))
+"""
+her DB sorgusunun süresini sorgu türüne göre (SELECT/INSERT/UPDATE/DELETE/OTHER) ff_db_query_duration_seconds histogramına yazıyoruz,histogramın _count'u sorgu sayısını da veriyor.
+başlangıç zamanını bağlantının info sözlüğündeki bir listede tutuyoruz (SQLAlchemy dokümanındaki yöntem),hata olursa after_cursor_execute çağrılmadığı için handle_error listeden çıkarıp hatayı sayıyor.
+"""
+
+
+def pool_stats() -> Dict[str, Any]:
+    pool = engine.pool
+    out: Dict[str, Any] = {"pool": type(pool).__name__, "pre_ping": settings.DB_POOL_PRE_PING.lower()}
+    if isinstance(pool, QueuePool):
+        out.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+            max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+            timeout_seconds=pool.timeout(),
+        )
+    out.update(pool_metrics.stats())
+    return out
+"""
+-engine önceden create_engine(DATABASE_URL, echo=False, pool_pre_ping=True) ile oluşturuluyordu,yani havuz boyutları SQLAlchemy'nin varsayılanlarıydı (5 + 10 overflow,30 sn bekleme) ve
+pool_pre_ping yüzünden havuzdan alınan her bağlantı için sorgudan önce DB'ye fazladan bir SELECT 1 gidiyordu.artık havuz boyutu,overflow,bekleme süresi,recycle ve pre-ping ayarları
+settings.py'deki DB_POOL_* değerlerinden geliyor,deployment başına ortam değişkeni ile değiştirilebiliyor.
+-pre-ping: "always" eski davranış.varsayılan "idle"da bağlantı sadece DB_POOL_PRE_PING_IDLE_SECONDS'tan uzun süre havuzda boşta kaldıysa kontrol ediliyor,yoğun trafikte bağlantılar sürekli
+kullanıldığı için neredeyse hiç ping atılmıyor.kontrol başarısız olursa DisconnectionError ile havuz o bağlantıyı atıp yenisini açıyor.DB_POOL_RECYCLE_SECONDS MySQL'in wait_timeout'u ile
+kapatılan bağlantıların kullanılmasını ayrıca engelliyor,"never" seçilirse bu ikisine güvenmek gerekiyor.
+-run_db havuzunun (DB_THREADPOOL_SIZE) ve senkron admin endpointlerinin thread'leri aynı bağlantı havuzunu paylaşıyor.DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW bu thread sayısından küçükse
+thread'ler bağlantı beklemeye başlıyor,pool_stats'taki bekleme süreleri ve histogram bunu görmek için.
+-pool_stats havuzun anlık durumunu (kullanımdaki/boştaki bağlantılar,overflow) ve pool_metrics'in sayaçlarını birlikte döner,/admin/v1/db/stats'ta görünüyor.değerler bu worker'ın havuzuna ait.
+-_collect_pool_metrics havuzun anlık durumunu /metrics'e ff_db_pool_connections gauge'u olarak veriyor.
+"""
+
+
+def _collect_pool_metrics():
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        yield "ff_db_pool_connections", ("checked_out",), pool.checkedout()
+        yield "ff_db_pool_connections", ("checked_in",), pool.checkedin()
+        yield "ff_db_pool_connections", ("overflow",), max(0, pool.overflow())
+
+
+register_collector(_collect_pool_metrics)
+
 
 # SQLite foreign key desteğini aç (önemli)
 @event.listens_for(Engine, "connect")
@@ -32,6 +225,15 @@ def _set_sqlite_pragma(dbapi_connection, connection_record):
 def get_session():     
     with Session(engine) as session:
         yield session
+# admin yazmaları materialize edilmiş snapshot'ları (FlagSnapshot) aynı transaction'da yeniden yazıyor,MySQL/MariaDB'nin varsayılanı REPEATABLE READ'de transaction'ın ilk okumasından sonra
+# commit edilen değişiklikler görünmediği için bu session'lar READ COMMITTED ile açılıyor (sqlite bu seviyeyi desteklemiyor,postgres'te zaten varsayılan)
+_admin_engine = engine.execution_options(isolation_level="READ COMMITTED") if engine.dialect.name in ("mysql", "mariadb") else engine
+
+
+def get_admin_session():
+    with Session(_admin_engine) as session:
+        yield session
+
 """ 
 Session(engine) ile bir obje oluşturdum ve bu objemi de as yanında bulunan session referansına atadım,sonrasında bu referans ile işlem yaptım,yani farklı bir class içerisinde session.add() 
 gibi veri tabanı işlemlerimi yaptım diyelim bir endpoint için sonrasında ise bu endpointle işim bittiğimde bu with ifadesi bu oluşturduğu session adlı nesneyi öldürüyor.
@@ -39,8 +241,82 @@ yield ifadesi ise geriye nesne dönderiyordu,böylece yield ifadesinden önceki
 """
 
 
+_db_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=settings.DB_THREADPOOL_SIZE,
+            thread_name_prefix="ff-db",
+        )
+    return _db_executor
+
+
+def _call_with_session(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    with Session(engine) as session:
+        return fn(session, *args, **kwargs)
+
+
+async def run_db(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), partial(_call_with_session, fn, *args, **kwargs))
+
+
+def shutdown_db_executor() -> None:
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=False, cancel_futures=True)
+        _db_executor = None
+"""
+-/sdk/v1 endpointleri async def olarak tanımlı ama sqlmodel'in Session'ı senkron çalışıyor,yani async bir endpoint içinde session.exec() çağırdığımızda sorgu bitene kadar event loop kilitleniyordu.
+bu durumda yavaş tek bir MariaDB sorgusu,aynı worker'daki cache'den dönebilecek bütün diğer istekleri de bekletiyordu.
+-run_db metotu DB işini event loop yerine ayrı ve boyutu sınırlı bir thread havuzunda (_db_executor) çalıştırır.verdiğimiz fonksiyonun ilk parametresi session olmalı,session'ı thread'in içinde
+_call_with_session açıp kapatıyor,böylece bir session hiçbir zaman iki thread arasında paylaşılmıyor.
+-havuzun boyutunu DB_THREADPOOL_SIZE ile sınırlıyoruz ki bir anda gelen çok sayıda cache miss,DB bağlantı havuzundan fazla thread açıp bağlantı beklemesin.
+-gerçek bir async sürücü (aiomysql/asyncmy + create_async_engine) kullanmak yerine bu yolu seçtik çünkü admin tarafı ve modellerimiz senkron Session ile çalışıyor,böylece aynı engine ve
+bağlantı havuzunu kullanmaya devam ediyoruz.
+-shutdown_db_executor uygulama kapanırken main.py'deki lifespan içinden çağrılıyor.
+"""
+
+
+# create_all var olan tablolara yeni sütun eklemediği için sonradan eklenen sütunlar: (tablo, sütun, DDL)
+_COLUMN_MIGRATIONS = [
+    ("featureflag", "hash_version", "INTEGER NOT NULL DEFAULT 1"),
+    ("project", "change_version", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+
+def _add_missing_columns():
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table, column, ddl in _COLUMN_MIGRATIONS:
+            if table not in tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _add_missing_indexes():
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+
+
 def init_db():
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    _add_missing_indexes()
 """
 4️⃣ init_db() fonksiyonu nedir?
 
@@ -117,4 +393,11 @@ init_db → “veritabanı şemasını başlat” fonksiyonu.
 SQLModel → tüm modellerin kök sınıfı.
 
 .metadata.create_all(engine) → modellerine göre CREATE TABLE komutlarını çalıştırır.
+
+Güncelleme: create_all yalnızca olmayan tabloları oluşturuyor,var olan bir tabloya sonradan eklediğimiz sütunları eklemiyor.bu yüzden init_db artık _add_missing_columns() metotunu da çağırıyor,
+bu metot _COLUMN_MIGRATIONS listesindeki her sütun için tabloya bakıyor ve sütun yoksa ALTER TABLE ... ADD COLUMN ile ekliyor.örneğin featureflag.hash_version sütunu DEFAULT 1 ile eklendiği için
+bu sütundan önce oluşturulmuş flaglerin hepsi eski sha256 bucket yöntemini kullanmaya devam ediyor.
+Güncelleme2: create_all var olan tablolara sonradan eklenen index'leri de eklemiyor.init_db artık _add_missing_indexes() metotunu da çağırıyor,bu metot modellerde tanımlı her index'in (Index(...) ya da
+index=True) tabloda olup olmadığına isminden bakıyor,yoksa CREATE INDEX ile oluşturuyor.örneğin snapshot sorgusu için eklenen ix_featureflag_project_status ve ix_featurerule_flag_env_priority
+index'leri var olan veritabanlarında da bu şekilde oluşuyor.büyük tablolarda CREATE INDEX biraz sürebilir,bu sadece index ilk kez eklenirken bir kere oluyor.
 """
\ No newline at end of file
@@ -0,0 +1,212 @@
+# app/core/local_cache.py
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.log import log_event
+from app.core.metrics import register_collector
+from app.core.settings import settings
+"""
+Redis cache'i bize DB sorgularından kurtarıyordu ama her /sdk/v1/flags isteğinde yine de Redis'e ağ üzerinden gidip gelen JSON'u json.loads ile parse ediyorduk.
+bu dosyadaki cache ise worker'ın (uvicorn process'inin) kendi belleğinde duran küçük bir cache'dir,yani L1 cache.Redis ise bunun arkasındaki L2 cache oluyor.
+isteğin sırası artık şöyle: L1 -> Redis -> DB.L1'de veri varsa hiçbir I/O yapılmadan cevap dönülüyor.
+"""
+
+
+class LocalCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else float(ttl_seconds)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [k for k in self._data if isinstance(k, str) and k.startswith(prefix)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [(k, v) for k, (expires_at, v) in self._data.items() if expires_at > now]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+"""
+-LocalCache sınıfı boyutu sınırlı (max_entries) bir LRU cache'dir.OrderedDict kullanıyoruz çünkü elemanların eklenme/kullanılma sırasını tutuyor,move_to_end ile son kullanılan elemanı sona
+taşıyoruz,cache dolduğunda ise popitem(last=False) ile en uzun süredir kullanılmayan elemanı siliyoruz.
+-her elemanın yanında bir de son kullanma zamanını (expires_at) tutuyoruz.L1 cache her worker'da ayrı olduğundan başka bir replica'da yapılan admin değişikliğini bu worker duymayabilir,bu yüzden
+ttl'i Redis'teki 120 sn'den çok daha kısa tutuyoruz ki en kötü durumda bile eski veri uzun süre dönmesin.
+-time.monotonic() kullanmamızın sebebi sistem saati değiştirilse bile süre hesabımızın bozulmamasıdır.
+-invalidate_project_sync admin endpointlerinden (threadpool'da çalışan sync metotlar) çağrılırken get/set ise event loop'ta çağrılıyor,bu yüzden dict üzerindeki işlemleri bir lock ile koruyoruz.
+-hits/misses/evictions sayaçları ile cache'in ne kadar işe yaradığını stats() metotundan okuyabiliyoruz.
+-items() süresi dolmamış bütün kayıtların bir kopyasını döner,cache.py'deki invalidation aboneliği hangi projelerin snapshot'larının bu worker'da durduğunu bulmak için kullanıyor.
+"""
+
+
+snapshot_cache = LocalCache(
+    max_entries=settings.L1_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.L1_CACHE_TTL_SECONDS,
+)
+"""
+/sdk/v1/flags endpointinin oluşturduğu flag/config cevabını (payload) tutan L1 cache'dir.keyleri Redis ile aynıdır yani flags_cache_key(project_id, environment_id) ile oluşturulur.
+"""
+
+
+ruleset_cache = LocalCache(
+    max_entries=settings.L1_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.L1_CACHE_TTL_SECONDS,
+)
+"""
+snapshot_cache'deki snapshot'ların eval.py içindeki compile_ruleset ile derlenmiş hallerini (CompiledRuleset) tutar.keyleri ve ömrü snapshot_cache ile aynıdır,böylece /sdk/v1/evaluate
+kuralları her istekte değil her snapshot için bir kere derler.
+"""
+
+
+resolver_cache = LocalCache(
+    max_entries=settings.SDK_KEY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SDK_KEY_CACHE_TTL_SECONDS,
+)
+"""
+sdk.py içindeki _resolve_sdk_and_environment metotunun sonucunu tutan cache'dir.key olarak (sdk_key, env) ikilisini,value olarak ise ya ("ok", project_id, environment_id) ya da
+geçersiz keyler için ("error", status_code, detail) bilgisini tutuyoruz.hatalı keyleri de tutmamızın (negative caching) sebebi geçersiz bir key ile arka arkaya gelen isteklerin her seferinde
+DB'ye gitmesini engellemektir,bu kayıtlar SDK_KEY_NEGATIVE_TTL_SECONDS kadar kısa bir süre tutulur.
+"""
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, "asyncio.Future[Any]"] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.background = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = asyncio.ensure_future(factory())
+                self._flights[key] = flight
+                flight.add_done_callback(lambda f: self._done(key, f))
+                self.leaders += 1
+            else:
+                self.followers += 1
+        # shield: bekleyen isteklerden biri iptal olursa (istemci bağlantıyı kapattı gibi) ortak iş iptal olmasın
+        return await asyncio.shield(flight)
+
+    def spawn(self, key: str, factory: Callable[[], Awaitable[Any]]) -> bool:
+        with self._lock:
+            if key in self._flights:
+                return False
+            flight = asyncio.ensure_future(factory())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda f: self._done(key, f))
+            self.background += 1
+        flight.add_done_callback(lambda f: self._report(key, f))
+        return True
+
+    @staticmethod
+    def _report(key: str, flight: "asyncio.Future[Any]") -> None:
+        # arka plan işinin sonucunu bekleyen kimse yok,hatayı burada okuyup logluyoruz
+        if not flight.cancelled() and flight.exception() is not None:
+            log_event("background.failed", logging.ERROR, key=key, error=repr(flight.exception()))
+
+    def _done(self, key: str, flight: "asyncio.Future[Any]") -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def still_current(self, key: str) -> bool:
+        with self._lock:
+            return self._flights.get(key) is asyncio.current_task()
+
+    def forget_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [k for k in self._flights if k.startswith(prefix)]
+            for k in keys:
+                del self._flights[k]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            inflight = len(self._flights)
+        return {"inflight": inflight, "leaders": self.leaders, "followers": self.followers, "background": self.background}
+"""
+-SingleFlight aynı key için aynı anda gelen isteklerin işi bir kere yapmasını sağlar (request coalescing).bir key için ilk gelen istek (leader) işi bir Task olarak başlatıyor,
+iş bitene kadar aynı key ile gelen diğer istekler (follower) yeni bir iş başlatmak yerine aynı Task'ın sonucunu bekliyor.iş bitince key sözlükten siliniyor,hata olursa hata da bütün bekleyenlere gidiyor.
+-forget_prefix: invalidation geldiğinde o projeye ait devam eden işleri sözlükten çıkarıyoruz,böylece invalidation'dan sonra gelen istekler eski veriyi okuyan bir işe katılmıyor,yeni bir iş başlatıyor.
+-still_current: işin kendisi (factory'nin içinde) hâlâ bu key'in güncel işi olup olmadığını kontrol etmek için kullanıyor.arada invalidation olduysa iş sonucunu bekleyenlere dönüyor ama L1'e yazmıyor.
+-spawn: işi başlatıp sonucunu beklemeden dönüyor (key için zaten devam eden bir iş varsa hiçbir şey yapmıyor),stale-while-revalidate'teki arka plan yenilemesi için kullanılıyor.
+iş yine sözlükte durduğu için aynı key ile ikinci bir yenileme başlamıyor ve forget_prefix/still_current bu işler için de çalışıyor.
+-forget_prefix admin tarafından (thread havuzundan) çağrılabildiği için sözlük işlemleri bir lock ile korunuyor.
+"""
+
+
+snapshot_flight = SingleFlight()
+"""
+snapshots.py ve sdk.py'deki snapshot ve derlenmiş kural yükleme işlerinin ortak SingleFlight'ı,keyleri snapshot_cache ile aynı (ff:flags:{project_id}:{environment_id}...) olduğu için prefix ile temizlenebiliyor.
+"""
+
+
+def _collect_metrics():
+    for name, cache in (("snapshot_l1", snapshot_cache), ("ruleset_l1", ruleset_cache), ("sdk_resolver", resolver_cache)):
+        yield "ff_cache_requests_total", (name, "hit"), cache.hits
+        yield "ff_cache_requests_total", (name, "miss"), cache.misses
+        yield "ff_l1_cache_entries", (name,), len(cache._data)
+
+
+register_collector(_collect_metrics)
+"""
+L1 cache'lerin hit/miss sayıları ve boyutları /metrics'e okuma anında buradan veriliyor.LocalCache bu sayaçları zaten tutuyor,bu yüzden get() içinde ayrıca bir metrik yazmıyoruz.
+"""
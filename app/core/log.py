@@ -0,0 +1,133 @@
+# app/core/log.py
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict
+
+from app.core.serialization import dumps_bytes
+from app.core.settings import settings
+"""
+uygulamanın logları.önceden istek yolunda print kullanıyorduk,print stdout'a senkron yazıyor ve async endpointlerin içinde çağrıldığı için stdout yavaşladığında (container log sürücüsü,dolu pipe vb.)
+event loop bekliyor ve bu bütün isteklere gecikme olarak yansıyordu.burada loglar:
+-log_event ile olay adı + alanlar olarak veriliyor (ör: log_event("cache.hit", key=...)),mesaj metni oluşturulmuyor
+-bir kuyruğa atılıp hemen dönülüyor,json'a çevirme ve stdout'a yazma ayrı bir thread'de (QueueListener) yapılıyor
+-olay bazında örnekleniyor (LOG_SAMPLE_RATES),ör: cache hit'lerin %1'i yazılırken miss ve hatalar her zaman yazılıyor.sayıların kendisi zaten /metrics'te tam olarak tutuluyor
+"""
+
+logger = logging.getLogger("ff")
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        rate = getattr(record, "sample_rate", 1.0)
+        if rate < 1.0:
+            entry["sample_rate"] = rate
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        try:
+            return dumps_bytes(entry).decode("utf-8")
+        except TypeError:
+            # json'a çevrilemeyen bir alan var,alanları metin olarak yazıyoruz
+            return dumps_bytes({key: value if isinstance(value, (str, int, float, bool, type(None))) else repr(value) for key, value in entry.items()}).decode("utf-8")
+"""
+her log kaydını tek satırlık bir json olarak yazar: ts (UTC),level,event ve log_event'e verilen alanlar.örneklenen olaylarda sample_rate de yazılıyor,
+böylece logları okuyan biri (ya da log sistemi) gerçek sayıyı 1/sample_rate ile çarparak tahmin edebiliyor.
+"""
+
+
+class _QueueHandler(QueueHandler):
+    def __init__(self, log_queue: "queue.Queue[Any]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+"""
+-standart QueueHandler kaydı kuyruğa atmadan önce (prepare) mesajı formatlıyor,yani işin bir kısmı yine isteği işleyen yerde yapılıyor.burada kaydı olduğu gibi kuyruğa atıyoruz,
+formatlama QueueListener'ın thread'inde yapılıyor.log_event'in alanları her çağrıda yeni bir sözlük olduğu için kaydın sonradan değişmesi gibi bir durum yok.
+-kuyruk dolarsa (stdout uzun süre yazılamıyorsa) kayıt atılıp sayılıyor,isteği bekletmiyoruz.atılan kayıt sayısı /metrics'te (ff_log_records_dropped_total).
+"""
+
+
+class _QueueListener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # kuyruk dolu olabilir,put_nowait yerine yer açılmasını bekliyoruz (thread kuyruğu boşaltmaya devam ediyor)
+        self.queue.put(self._sentinel)
+
+
+class EventLog:
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, settings.LOG_QUEUE_SIZE))
+        self._stream = logging.StreamHandler(sys.stdout)
+        self._stream.setFormatter(_JsonFormatter())
+        self._handler = _QueueHandler(self._queue)
+        self._listener = _QueueListener(self._queue, self._stream)
+        self._running = False
+        self._rates = {event: float(rate) for event, rate in settings.LOG_SAMPLE_RATES.items()}
+        logger.setLevel(settings.LOG_LEVEL.upper())
+        logger.propagate = False
+        logger.addHandler(self._stream)
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._listener.start()
+        logger.removeHandler(self._stream)
+        logger.addHandler(self._handler)
+        self._running = True
+
+    def stop(self) -> None:
+        if not self._running:
+            return
+        logger.removeHandler(self._handler)
+        logger.addHandler(self._stream)
+        self._running = False
+        # kuyrukta kalan kayıtlar yazıldıktan sonra dönüyor
+        self._listener.stop()
+
+    def event(self, event: str, level: int = logging.INFO, **fields: Any) -> None:
+        rate = self._rates.get(event, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return
+        if not logger.isEnabledFor(level):
+            return
+        record = logger.makeRecord(logger.name, level, "", 0, event, (), None, extra={"fields": fields, "sample_rate": rate})
+        logger.handle(record)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._running,
+            "queued": self._queue.qsize(),
+            "dropped": self._handler.dropped,
+        }
+"""
+-start/stop uygulama açılırken ve kapanırken (main.py lifespan) çağrılıyor.start çağrılmadıysa (ör: script'ler) kayıtlar eskisi gibi direkt stdout'a yazılıyor,
+kapanırken stop kuyrukta kalan kayıtları yazıp thread'i durduruyor,sonrasında gelen kayıtlar yine direkt yazılıyor.
+-event önce örneklemeye bakıyor,yazılmayacak bir kayıt için LogRecord bile oluşturulmuyor.LOG_SAMPLE_RATES'te olmayan olaylar her zaman yazılıyor.
+-logger.log yerine makeRecord + handle kullanıyoruz,logger.log her kayıtta çağıranın dosya/satır bilgisini bulmak için stack'i dolaşıyor ve bu bilgiyi zaten yazmıyoruz.
+"""
+
+event_log = EventLog()
+
+
+def log_event(event: str, level: int = logging.INFO, **fields: Any) -> None:
+    event_log.event(event, level, **fields)
+
+
+def log_stats() -> Dict[str, Any]:
+    return event_log.stats()
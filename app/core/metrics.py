@@ -0,0 +1,273 @@
+# app/core/metrics.py
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.log import log_event, log_stats
+"""
+/metrics endpointinin (Prometheus text formatı) sayaçları ve histogramları.önceden elimizdeki tek ölçüm [CACHE HIT]/[CACHE MISS] print'leri ve /admin/v1/cache/stats'taki worker'a özel sayaçlardı.
+-sıcak yolda (her istek,her cache okuması,her DB sorgusu) kilit almamak için her thread kendi sözlüğüne (shard) yazıyor: event loop thread'i bir sözlüğe,run_db havuzunun her thread'i
+kendi sözlüğüne.bir sözlüğe sadece sahibi olan thread yazdığı için += işlemleri yarışmıyor,okurken (collect) bütün thread'lerin sözlükleri kopyalanıp toplanıyor.
+kilit sadece bir thread ilk kez ölçüm yazdığında kendi sözlüğünü listeye eklerken alınıyor.
+-zaten başka bir yerde tutulan değerler (invalidation sayaçları,L1 boyutları,bağlantı havuzu durumu) sıcak yola hiç dokunmadan register_collector ile kaydedilen metotlarla okuma anında toplanıyor.
+-birden fazla uvicorn worker'ı olduğunda her worker kendi değerlerini Redis'e yazıyor,/metrics bütün worker'ların değerlerini toplayıp tek bir çıktı veriyor (bkz. cache.py run_metrics_reporter).
+"""
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+_local = threading.local()
+_shards: List[Dict[Tuple[str, Tuple[str, ...]], Any]] = []
+_shards_lock = threading.Lock()
+_registry: Dict[str, "_Metric"] = {}
+_collectors: List[Callable[[], Iterable[Tuple[str, Tuple[str, ...], float]]]] = []
+
+
+def _shard() -> Dict[Tuple[str, Tuple[str, ...]], Any]:
+    try:
+        return _local.values
+    except AttributeError:
+        values: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+        with _shards_lock:
+            _shards.append(values)
+        _local.values = values
+        return values
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        _registry[name] = self
+
+
+class Counter(_Metric):
+    kind = COUNTER
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shard = _shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        key = (self.name, labels)
+        return sum(shard.get(key, 0) for shard in list(_shards))
+
+
+class Gauge(_Metric):
+    kind = GAUGE
+
+
+class Histogram(_Metric):
+    kind = HISTOGRAM
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = _shard()
+        key = (self.name, labels)
+        entry = shard.get(key)
+        if entry is None:
+            # kovalar (son eleman +Inf) ve en sonda toplam
+            entry = shard[key] = [0] * (len(self.buckets) + 2)
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def value(self, *labels: str) -> List[float]:
+        key = (self.name, labels)
+        total = [0] * (len(self.buckets) + 2)
+        for shard in list(_shards):
+            entry = shard.get(key)
+            if entry is not None:
+                total = [a + b for a, b in zip(total, entry)]
+        return total
+"""
+-Counter.inc ve Histogram.observe sıcak yolda çağrılan metotlar,label değerleri metrik tanımındaki labelnames sırasıyla pozisyonel olarak veriliyor (ör: cache_requests.inc("redis", "hit")).
+-histogram her label kombinasyonu için kova başına sayıları ve değerlerin toplamını bir listede tutuyor.kovalar kümülatif değil,çıktı yazılırken (render) kümülatif hale getiriliyor.
+-value metotları bütün thread'lerin değerlerini toplayıp döner,admin stats endpointleri gibi sıcak yol dışındaki yerler için.
+-shard'lara kilitsiz yazmak CPython'daki GIL'e dayanıyor (bir thread'in sözlüğüne başka thread yazmıyor,okuyan taraf dict.copy ile tek adımda kopyalıyor).
+"""
+
+
+http_requests = Counter("ff_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_request_seconds = Histogram("ff_http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+cache_requests = Counter("ff_cache_requests_total", "Cache lookups by tier and result (hit, miss, error)", ("tier", "result"))
+snapshot_build_seconds = Histogram("ff_snapshot_build_seconds", "Time to produce a snapshot by source (materialized, tables, admin)", ("source",))
+db_query_seconds = Histogram("ff_db_query_duration_seconds", "DB query latency by statement kind", ("statement",))
+db_errors = Counter("ff_db_errors_total", "DB queries that raised by statement kind", ("statement",))
+db_pool_checkout_seconds = Histogram(
+    "ff_db_pool_checkout_seconds", "Time to check a connection out of the pool", (), (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+db_pool_timeouts = Counter("ff_db_pool_timeouts_total", "Pool checkouts that timed out", ())
+db_pool_pings = Counter("ff_db_pool_pings_total", "Idle connection pings by result", ("result",))
+redis_call_seconds = Histogram("ff_redis_call_duration_seconds", "Redis call latency by operation", ("op",))
+redis_errors = Counter("ff_redis_errors_total", "Redis calls that failed by operation", ("op",))
+evaluated_flags = Histogram("ff_evaluate_flags_per_call", "Flags evaluated per evaluate call", ("endpoint",), COUNT_BUCKETS)
+invalidations = Counter("ff_invalidation_events_total", "Invalidation events by kind", ("event",))
+l1_entries = Gauge("ff_l1_cache_entries", "Entries in this process's L1 caches", ("cache",))
+db_pool_connections = Gauge("ff_db_pool_connections", "DB pool connections by state", ("state",))
+log_dropped = Counter("ff_log_records_dropped_total", "Log records dropped because the log queue was full")
+log_queue = Gauge("ff_log_queue_records", "Log records waiting to be written")
+"""
+bütün metriklerin listesi.isimleri Prometheus kurallarına göre (sayaçlar _total,süreler _seconds ile bitiyor) ve hepsi ff_ ile başlıyor.
+label değerleri sınırlı sayıda olacak şekilde seçildi: route isteğin path'i değil FastAPI'deki route tanımı (/admin/v1/flags/{flag_id} gibi),proje/ortam id'leri label olarak kullanılmıyor.
+"""
+
+
+def register_collector(collect: Callable[[], Iterable[Tuple[str, Tuple[str, ...], float]]]) -> None:
+    _collectors.append(collect)
+"""
+okuma anında çağrılacak bir metot kaydeder.metot (metrik adı, label değerleri, değer) üçlülerini döner,metrik adı yukarıda tanımlı bir Counter ya da Gauge olmalı.
+"""
+
+
+def _collect_log_metrics():
+    stats = log_stats()
+    yield "ff_log_records_dropped_total", (), stats["dropped"]
+    yield "ff_log_queue_records", (), stats["queued"]
+
+
+register_collector(_collect_log_metrics)
+
+
+def collect() -> List[List[Any]]:
+    merged: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+    for shard in list(_shards):
+        for key, value in shard.copy().items():
+            if isinstance(value, list):
+                current = merged.get(key)
+                merged[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+    for collect_fn in _collectors:
+        try:
+            for name, labels, value in collect_fn():
+                merged[(name, tuple(labels))] = value
+        except Exception as e:
+            log_event("metrics.collector_failed", logging.WARNING, error=repr(e))
+    return [[name, list(labels), value] for (name, labels), value in merged.items()]
+"""
+bu process'in bütün değerlerini json'a çevrilebilir bir liste olarak döner: [metrik adı, label değerleri, değer],histogramlarda değer kova sayıları + toplam listesi.
+Redis'e bu liste yazılıyor ve render de bu listeleri alıyor.
+"""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def render(workers: Iterable[Tuple[List[List[Any]], bool]]) -> str:
+    series: Dict[str, Dict[Tuple[str, ...], Any]] = {name: {} for name in _registry}
+    for samples, fresh in workers:
+        for name, labels, value in samples:
+            metric = _registry.get(name)
+            if metric is None or (metric.kind == GAUGE and not fresh):
+                continue
+            key = tuple(labels)
+            current = series[name].get(key)
+            if current is None:
+                series[name][key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                series[name][key] = [a + b for a, b in zip(current, value)]
+            else:
+                series[name][key] = current + value
+
+    lines: List[str] = []
+    for name, metric in _registry.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(series[name].items()):
+            if metric.kind != HISTOGRAM:
+                lines.append(f"{name}{_labels(metric.labelnames, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, "+Inf"), value[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(float(bound))
+                lines.append(f"{name}_bucket{_labels(metric.labelnames, labels, ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labelnames, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(metric.labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+"""
+worker'lardan gelen değer listelerini (collect çıktısı) toplayıp Prometheus text formatında (0.0.4) yazar.workers her worker için (değerler, taze mi) ikilisi.
+sayaç ve histogramlar bütün worker'lar için toplanıyor.kapanmış bir worker'ın sayaçları Redis'teki kaydı silinene kadar kaydından,silindikten sonra da ff:metrics:retired'dan
+(cache.py cache_report_metrics) toplama dahil,böylece bir worker kapanınca toplam sayaçlar geri gitmiyor.
+gauge'lar (L1 boyutu,havuzdaki bağlantılar) anlık değerler olduğu için sadece son raporu yeni olan (fresh) worker'lardan toplanıyor.
+"""
+
+
+def cumulative_samples(samples: List[List[Any]]) -> List[List[Any]]:
+    return [sample for sample in samples if sample[0] in _registry and _registry[sample[0]].kind != GAUGE]
+"""
+collect çıktısından sadece sürekli artan değerleri (sayaç ve histogram) döner.kapanan worker'ların değerleri Redis'te saklanırken (cache.py cache_report_metrics) gauge'lar atılıyor.
+"""
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    template = getattr(route, "path_format", None)
+    if template is None:
+        return "<unmatched>"
+    concrete = template
+    for name, value in (scope.get("path_params") or {}).items():
+        concrete = concrete.replace("{" + name + "}", str(value))
+    path = scope.get("path", "")
+    # include_router ile eklenen route'larda route.path router'ın kendi path'i (/flags),prefix'i (/admin/v1) isteğin path'inden buluyoruz
+    if path.endswith(concrete):
+        return path[: len(path) - len(concrete)] + template
+    return template
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = ["500"]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = _route_label(scope)
+            method = scope.get("method", "")
+            http_requests.inc(method, route, status[0])
+            http_request_seconds.observe(time.perf_counter() - t0, method, route)
+"""
+her HTTP isteğinin süresini ve durum kodunu route'a göre kaydeden ASGI middleware'i.BaseHTTPMiddleware yerine direkt ASGI olarak yazıldı,BaseHTTPMiddleware her istekte ek bir task
+ve kuyruk açıyor ve streaming cevapları (SSE,export) araya girerek taşıyor.
+-route label'ı FastAPI'nin isteği eşleştirdiği route'un path tanımı (prefix'i ile birlikte,/admin/v1/flags/{flag_id} gibi),eşleşmeyen istekler (404,/ui altındaki statik dosyalar) tek bir "<unmatched>" label'ında toplanıyor ki label sayısı path'lere göre artmasın.
+-süre cevabın son byte'ı gönderilene kadar ölçülüyor,yani /sdk/v1/stream (SSE) için bağlantının açık kaldığı süre oluyor.
+"""
@@ -0,0 +1,76 @@
+# app/core/rebuild.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from app.core.log import log_event
+"""
+admin değişikliğinden sonra projenin snapshot'larını arka planda yeniden oluşturan (write-through) zamanlayıcı.
+invalidate_project_sync admin endpointlerinden yani thread havuzundan çağrılıyor,snapshot'ı oluşturan kod (core/snapshots.py) ise event loop üzerinde çalışıyor.bu yüzden stream.py'deki
+ProjectNotifier gibi işi call_soon_threadsafe ile event loop'a aktarıyoruz.
+snapshots.py cache.py'yi import ettiği için cache.py'nin snapshots.py'yi import etmesi döngüsel import olurdu,bu yüzden yeniden oluşturma metotu buraya uygulama açılırken start() ile veriliyor.
+"""
+
+
+class SnapshotRebuilder:
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._rebuild: Optional[Callable[[int], Awaitable[Any]]] = None
+        self._tasks: Set["asyncio.Task[Any]"] = set()
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self, rebuild: Callable[[int], Awaitable[Any]]) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._rebuild = rebuild
+
+    def stop(self) -> None:
+        self._loop = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    def schedule(self, project_id: int) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._spawn, project_id)
+        except RuntimeError:
+            # loop kapanıyorsa yeniden oluşturmaya gerek yok
+            pass
+
+    def _spawn(self, project_id: int) -> None:
+        if self._rebuild is None:
+            return
+        self.scheduled += 1
+        task = asyncio.ensure_future(self._run(project_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, project_id: int) -> None:
+        try:
+            await self._rebuild(project_id)
+            self.completed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            log_event("rebuild.failed", logging.ERROR, project_id=project_id, error=repr(e))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._tasks),
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+"""
+-start: uygulama açılırken (main.py lifespan) event loop'u ve projenin snapshot'larını yeniden oluşturan metotu (snapshots.rebuild_project) kaydeder.start çağrılmadıysa (ör: script'ler) schedule hiçbir şey yapmıyor,
+cache eskisi gibi ilk istekte dolduruluyor.
+-schedule thread-safe'dir,invalidate_project_sync içinden çağrılıyor.işi event loop'a aktarıp hemen dönüyor,yani admin isteği snapshot'ların oluşmasını beklemiyor.
+-_spawn event loop üzerinde her proje için bir Task başlatıyor.Task'ları _tasks kümesinde tutuyoruz ki çöp toplayıcı (GC) bitmeden silmesin,kapanırken de stop() ile iptal edebilelim.
+-yeniden oluşturma sırasında bir hata olursa sadece loglayıp sayıyoruz,snapshot ilk SDK isteğinde normal yoldan oluşturulacak.
+"""
+
+snapshot_rebuilder = SnapshotRebuilder()
@@ -0,0 +1,75 @@
+# app/core/serialization.py
+import gzip
+import json
+from typing import Any, Dict
+
+try:
+    import orjson
+except ImportError:  # orjson opsiyonel,yoksa standart json kullanılır
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli opsiyonel,yoksa sadece gzip üretilir
+    brotli = None
+"""
+cache'e yazdığımız hazır cevap gövdelerini (response body) byte olarak üreten ve geri okuyan küçük yardımcı metotlar.
+orjson kuruluysa onu kullanıyoruz,orjson standart json modülünden birkaç kat hızlı ve direkt bytes dönüyor.kurulu değilse aynı çıktıyı standart json ile üretiyoruz.
+"""
+
+
+def dumps_bytes(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads_bytes(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+"""
+-dumps_bytes boşluksuz ve UTF-8 bir json üretir,key sırasını değiştirmez (sort_keys yok).sıranın korunması önemli çünkü distribution gibi sözlüklerde variant sırası eşiklerin hesaplanmasında kullanılıyor.
+-orjson ile standart json'un çıktısı byte byte aynı olmayabilir (float yazımı gibi),ama ikisi de aynı değeri ifade eden geçerli json üretiyor.
+"""
+
+
+# istemci ikisini de kabul ediyorsa br'yi tercih ediyoruz (aynı içerikte gzip'ten daha küçük)
+ENCODINGS = ("br", "gzip")
+
+
+def compress_variants(body: bytes, min_bytes: int) -> Dict[str, bytes]:
+    if len(body) < min_bytes:
+        return {}
+    encoded = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(body, quality=9)
+    return encoded
+
+
+def pick_encoding(accept_encoding: str, available: Dict[str, bytes]) -> str:
+    if not accept_encoding or not available:
+        return "identity"
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+"""
+-compress_variants bir cevap gövdesinin sıkıştırılmış hallerini (gzip ve brotli kuruluysa br) üretir.bu iş snapshot oluşturulurken bir kere yapılıyor,istek başına sıkıştırma yapılmıyor.
+bu yüzden hızdan çok boyuta öncelik veren seviyeleri kullanıyoruz.min_bytes'tan küçük gövdeler için sıkıştırmaya değmediğinden boş sözlük dönüyor.
+gzip'te mtime=0 veriyoruz ki aynı gövde her seferinde byte byte aynı çıktıyı versin.
+-pick_encoding istemcinin Accept-Encoding header'ına bakıp elimizdeki hallerden hangisinin gönderileceğini seçer.q=0 ile reddedilen ya da hiç yazılmayan encoding'ler seçilmiyor,* her şeyi kabul ediyor demektir.
+uygun bir hal yoksa "identity" (sıkıştırılmamış gövde) dönüyor.
+"""
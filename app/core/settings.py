@@ -1,4 +1,5 @@
 ﻿from pathlib import Path
+from typing import Dict
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -8,6 +9,80 @@ class Settings(BaseSettings):
     DB_URL: str = Field("sqlite:///./feature_flags.db", validation_alias="DATABASE_URL")
     REDIS_URL: str = Field("redis://localhost:6379/0", validation_alias="REDIS_URL")
 
+    # In-process (L1) snapshot cache
+    L1_CACHE_MAX_ENTRIES: int = 1024
+    L1_CACHE_TTL_SECONDS: float = 10.0
+
+    # SDK key -> (project_id, environment_id) çözümleme cache'i
+    SDK_KEY_CACHE_MAX_ENTRIES: int = 10000
+    SDK_KEY_CACHE_TTL_SECONDS: float = 60.0
+    SDK_KEY_NEGATIVE_TTL_SECONDS: float = 5.0
+
+    # SDK endpointlerinin DB işlerini çalıştıran thread havuzunun boyutu
+    DB_THREADPOOL_SIZE: int = 10
+
+    # DB bağlantı havuzu: sürekli açık tutulan bağlantı sayısı,doluyken açılabilecek ek bağlantı sayısı,boş bağlantı için en fazla bekleme süresi ve bağlantıların yenilenme yaşı (-1 ise yenilenmez)
+    DB_POOL_SIZE: int = 5
+    DB_POOL_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 3600
+    # havuzdan alınan bağlantının canlı olup olmadığının kontrolü: "always" her alışta,"idle" sadece DB_POOL_PRE_PING_IDLE_SECONDS'tan uzun süre boşta kalmışsa,"never" hiç
+    DB_POOL_PRE_PING: str = "idle"
+    DB_POOL_PRE_PING_IDLE_SECONDS: float = 30.0
+
+    # POST /sdk/v1/evaluate/batch isteğinde kabul edilen en fazla kullanıcı sayısı (50 flag için hash_version=1'de ~0.2 sn,hash_version=2'de ~0.1 sn CPU)
+    EVALUATE_BATCH_MAX_USERS: int = 2000
+    # batch değerlendirmelerini event loop dışında çalıştıran thread havuzunun boyutu
+    EVALUATE_THREADPOOL_SIZE: int = 2
+
+    # delta sync: proje başına tutulan en fazla değişiklik versiyonu,daha geride kalan SDK'lar tam snapshot alır
+    DELTA_CHANGE_LOG_RETENTION: int = 1000
+
+    # /sdk/v1/stream (SSE): bağlantı boştayken gönderilen heartbeat aralığı ve istemcinin yeniden bağlanma süresi
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    SSE_RETRY_MS: int = 3000
+
+    # replica'lar arası invalidation yayını (Redis pub/sub) ve kaçırılan mesajlar için versiyon karşılaştırma aralığı
+    INVALIDATION_CHANNEL: str = "ff:invalidate"
+    INVALIDATION_RESYNC_SECONDS: float = 30.0
+
+    # admin yazmalarından sonraki invalidation'ın bekletileceği süre,bu sürede aynı projeye gelen yazmalar tek bir invalidation'da birleşir (0 ise hemen yapılır)
+    INVALIDATION_DEBOUNCE_MS: int = 250
+
+    # cache miss'te snapshot'ı tek bir process'in oluşturması için Redis kilidinin ömrü,diğerlerinin bekleme süresi ve key'i kontrol etme aralığı
+    SINGLE_FLIGHT_LOCK_MS: int = 5000
+    SINGLE_FLIGHT_WAIT_MS: int = 3000
+    SINGLE_FLIGHT_POLL_MS: int = 50
+
+    # snapshot ömrü: soft süre dolunca eski snapshot dönülmeye devam edip arka planda yenileniyor,hard süre (Redis TTL) dolunca istek yeni snapshot'ı bekliyor
+    SNAPSHOT_SOFT_TTL_SECONDS: float = 120.0
+    SNAPSHOT_HARD_TTL_SECONDS: int = 900
+
+    # bu boyuttan (byte) büyük snapshot gövdelerinin gzip/brotli halleri snapshot oluşturulurken bir kere üretilip cache'leniyor
+    SNAPSHOT_COMPRESS_MIN_BYTES: int = 1024
+
+    # açılışta snapshot'ları önceden yüklenecek en çok istek alan proje sayısı (0 ise kapalı) ve bunun için beklenecek en uzun süre
+    WARMUP_PROJECTS: int = 50
+    WARMUP_TIMEOUT_SECONDS: float = 10.0
+
+    # proje başına istek sayılarının Redis'e gönderilme aralığı ve trafik gelmezse sayaçların silineceği süre
+    HOT_PROJECTS_REPORT_SECONDS: float = 60.0
+    HOT_PROJECTS_TTL_SECONDS: float = 7 * 24 * 3600
+
+    # /metrics: worker'ların değerlerini Redis'e yazma aralığı ve rapor vermeyen (kapanmış) bir worker'ın değerlerinin toplama dahil edilmeye devam edeceği süre
+    METRICS_REPORT_SECONDS: float = 5.0
+    METRICS_WORKER_TTL_SECONDS: float = 3600.0
+
+    # loglar (core/log.py): en düşük seviye,yazılmayı bekleyen en fazla kayıt sayısı (dolarsa yeni kayıtlar atılır) ve olay başına yazılma oranı (0-1,listede olmayan olaylar her zaman yazılır)
+    # env'den json olarak verilebilir,ör: LOG_SAMPLE_RATES='{"cache.hit": 0.1, "cache.miss": 1}'
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATES: Dict[str, float] = {"cache.hit": 0.01}
+
+    # admin liste endpointlerinin (GET /admin/v1/flags vb.) sayfa başına varsayılan ve en fazla satır sayısı
+    ADMIN_PAGE_SIZE: int = 100
+    ADMIN_PAGE_MAX: int = 1000
+
     JWT_SECRET: str = "CHANGE_ME"
     JWT_ALG: str = "HS256"
 
@@ -0,0 +1,135 @@
+# app/core/snapshot_loader.py
+from typing import Any, Dict, List, Optional
+from sqlmodel import Session, select
+from sqlalchemy import Integer, String, and_, literal, null, or_, type_coerce, union_all
+
+from app.core.serialization import loads_bytes
+from app.models import Project, FeatureFlag, FeatureVariant, FeatureRule, FeatureConfig
+"""
+/sdk/v1/flags cevabının (snapshot) DB'den okunduğu yer.önceden build_snapshot versiyon,config,flag,variant ve kural için sırayla 5 ayrı sorgu atıyordu,variant sorgusu da
+projenin bütün flag id'lerini IN listesi olarak gönderiyordu (5k flag'lik bir projede 5k parametreli bir sorgu).burada aynı veriyi 2 sorgu ile okuyoruz:
+1-projenin versiyonu + config'leri (projeye LEFT JOIN,config yoksa da versiyon satırı geliyor)
+2-yayındaki flag'ler + variant'ları + bu ortamın kuralları (UNION ALL,her satır bir flag ve onun bir variant'ı ya da bir kuralı)
+satırları ORM nesnesine çevirmeden (FeatureFlag(...) vs. oluşturmadan) okudukça direkt cevap sözlüğüne yazıyoruz.
+"""
+
+PUBLISHED_STATUSES = ("active", "published")
+
+# UNION ALL sorgusundaki satır türleri,aynı flag'in satırları içinde önce variant'lar sonra kurallar geliyor
+_VARIANT_ROW = 0
+_RULE_ROW = 1
+
+
+def _json(raw: Any) -> Any:
+    if raw is None:
+        return None
+    if isinstance(raw, (str, bytes)):
+        return loads_bytes(raw)
+    return raw
+"""
+JSON sütunlarını SQLAlchemy'nin JSON tipine bırakmak yerine ham metin olarak okuyup kendimiz çeviriyoruz.JSON tipi her değer için standart json.loads'u çağırıyor,5k flag'lik bir projede
+snapshot oluşturma süresinin yarısından fazlası buna gidiyordu.loads_bytes orjson kuruluysa onu kullanıyor.sürücü değeri zaten çevrilmiş olarak dönerse (ör: postgres) olduğu gibi kullanılıyor.
+"""
+
+
+def _configs_statement(project_id: int, environment_id: int):
+    return (
+        select(Project.change_version, FeatureConfig.key, type_coerce(FeatureConfig.value, String))
+        .select_from(Project)
+        .outerjoin(
+            FeatureConfig,
+            and_(
+                FeatureConfig.project_id == Project.id,
+                or_(FeatureConfig.environment_id == None, FeatureConfig.environment_id == environment_id),
+            ),
+        )
+        .where(Project.id == project_id)
+        .order_by(FeatureConfig.environment_id.is_not(None), FeatureConfig.id)
+    )
+"""
+projenin change_version'ını ve bu ortamda geçerli config'leri tek sorguda okur.sıralama önce global (environment_id=None) sonra env'e özel config'ler şeklinde,
+böylece env override'ı aynı key'deki global değerin üzerine yazıyor (önceki iki döngülü halin aynısı).
+"""
+
+
+def _flags_statement(project_id: int, environment_id: int):
+    flag_columns = (FeatureFlag.id.label("flag_id"), FeatureFlag.key, FeatureFlag.on, FeatureFlag.default_variant, FeatureFlag.hash_version)
+    published = and_(FeatureFlag.project_id == project_id, FeatureFlag.status.in_(PUBLISHED_STATUSES))
+
+    rules = (
+        select(
+            *flag_columns,
+            literal(_RULE_ROW).label("kind"),
+            FeatureRule.id.label("child_id"),
+            FeatureRule.priority.label("priority"),
+            type_coerce(null(), String).label("name"),
+            type_coerce(FeatureRule.predicate, String).label("doc"),
+            type_coerce(FeatureRule.distribution, String).label("distribution"),
+        )
+        .join(FeatureRule, and_(FeatureRule.flag_id == FeatureFlag.id, FeatureRule.environment_id == environment_id))
+        .where(published)
+    )
+    variants = (
+        select(
+            *flag_columns,
+            literal(_VARIANT_ROW),
+            FeatureVariant.id,
+            type_coerce(null(), Integer),
+            FeatureVariant.name,
+            type_coerce(FeatureVariant.payload, String),
+            type_coerce(null(), String),
+        )
+        .outerjoin(FeatureVariant, FeatureVariant.flag_id == FeatureFlag.id)
+        .where(published)
+    )
+    statement = union_all(rules, variants)
+    columns = statement.selected_columns
+    return statement.order_by(columns.flag_id, columns.kind, columns.priority, columns.child_id)
+"""
+-iki SELECT'in sütunları aynı sırada: flag'in alanları + satır türü (kind) + variant ya da kuralın alanları.variant'ın payload'u ve kuralın predicate'i ikisi de JSON olduğu için aynı "doc" sütununu paylaşıyor.
+UNION ALL'da sütun tipleri ilk SELECT'ten alındığı için olmayan sütunları type_coerce ile tipli NULL olarak veriyoruz,JSON sütunları da ham metin olarak geliyor (bkz. _json).
+-variant tarafı LEFT JOIN,yani hiç variant'ı olmayan flag'ler de en az bir satırla (child_id=None) geliyor,kuralı olmayan flag'ler kaybolmuyor.
+-flag id,satır türü,priority sırasıyla sıralıyoruz,böylece bir flag'in bütün satırları arka arkaya geliyor ve kurallar priority sırasında.
+-(project_id,status) ve (flag_id,environment_id,priority) index'leri (models.py) bu sorgunun flag ve kural tarafı için eklendi,büyük projelerde flag'ler ve kurallar tablonun tamamı taranmadan index'ten okunabiliyor.
+"""
+
+
+def fetch_snapshot(session: Session, env: str, project_id: int, environment_id: int) -> Dict[str, Any]:
+    version = 0
+    configs: Dict[str, Any] = {}
+    for change_version, key, value in session.exec(_configs_statement(project_id, environment_id)):
+        version = int(change_version or 0)
+        if key is not None:
+            configs[key] = _json(value)
+
+    flags: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    current_id = None
+    for flag_id, key, on, default_variant, hash_version, kind, child_id, priority, name, doc, distribution in session.exec(
+        _flags_statement(project_id, environment_id)
+    ):
+        if flag_id != current_id:
+            current_id = flag_id
+            current = {
+                "key": key,
+                "on": on,
+                "default_variant": default_variant,
+                "hash_version": hash_version,
+                "variants": {},
+                "rules": [],
+            }
+            flags.append(current)
+        if child_id is None:
+            continue
+        if kind == _VARIANT_ROW:
+            current["variants"][name] = _json(doc) or {}
+        else:
+            current["rules"].append({"priority": priority, "predicate": _json(doc) or {}, "distribution": _json(distribution) or {}})
+
+    return {"env": env, "project_id": project_id, "version": version, "configs": configs, "flags": flags}
+"""
+snapshot'ı yukarıdaki iki sorgu ile oluşturur.çıktı önceki build_snapshot'ın çıktısı ile aynı formatta.
+-versiyon config'lerle aynı sorguda,flag sorgusundan önce okunuyor.arada bir admin değişikliği commit edilirse snapshot versiyonundan daha yeni veri içerebilir ama daha eski veri içeremez
+(build_snapshot'taki açıklama ile aynı).
+-satırlar flag id'ye göre sıralı geldiği için bir flag'in satırları bitince bir sonraki flag başlıyor,bu yüzden flag'leri bir sözlükte aramamıza gerek kalmıyor.
+"""
@@ -0,0 +1,352 @@
+# app/core/snapshots.py
+import asyncio
+import hashlib
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from sqlmodel import Session, select
+
+from app.core.db import run_db
+from app.core.cache import (
+    cache_get_bytes_gen,
+    cache_set_json_gen,
+    cache_lock,
+    cache_unlock,
+    cache_report_hot_projects,
+    cache_hot_projects,
+    flags_cache_key,
+    flags_etag_cache_key,
+)
+from app.core.serialization import compress_variants, dumps_bytes, loads_bytes
+from app.core.snapshot_loader import fetch_snapshot
+from app.core.local_cache import snapshot_cache, snapshot_flight
+from app.core.log import log_event
+from app.core.metrics import cache_requests, snapshot_build_seconds
+from app.core.settings import settings
+from app.models import Project, Environment, FlagSnapshot
+from app.schemas import FlagsResponse
+"""
+/sdk/v1/flags cevabının (snapshot) oluşturulması,cache'lenmesi ve yüklenmesi ile ilgili her şey bu dosyada.önceden bu metotlar routers/sdk.py içindeydi,
+admin değişikliğinden sonra snapshot'ları yeniden oluşturmak (rebuild_project) ve uygulama açılırken cache'i ısıtmak (warm_up) için istek dışında da kullanılabilsinler diye buraya taşındı.
+sdk.py'deki endpointler snapshot'ı load_snapshot ile alıyor.
+"""
+
+project_hits: "Counter[int]" = Counter()
+"""
+bu worker'da load_snapshot'ın proje başına kaç kere çağrıldığını tutan sayaç.run_hot_project_reporter bunu belli aralıklarla Redis'e ekleyip sıfırlıyor,warm_up da en çok istek alan projeleri buradan buluyor.
+"""
+
+
+def build_snapshot(session: Session, env: str, project_id: int, environment_id: int) -> Dict[str, Any]:
+    return fetch_snapshot(session, env, project_id, environment_id)
+"""
+/sdk/v1/flags cevabını (snapshot) DB'den oluşturan metottur.önceden bu kod get_flags'in içindeydi,/evaluate endpointi de aynı veriye ihtiyaç duyduğu için ayrı bir metoda aldık.
+Güncelleme: projenin change_version'ı diğer sorgulardan önce okunup snapshot'a version olarak yazılıyor.arada bir admin değişikliği commit edilirse snapshot versiyonundan daha yeni veri içerebilir
+ama daha eski veri içeremez,yani istemci bir sonraki delta isteğinde o değişikliği en kötü ihtimalle bir kez daha alır.
+Güncelleme2: sorgular core/snapshot_loader.py'ye taşındı.önceden versiyon,config,flag,variant ve kurallar için sırayla 5 sorgu atılıyordu,fetch_snapshot aynı cevabı 2 sorgu ile ve
+ORM nesnesi oluşturmadan üretiyor.
+"""
+
+
+# snapshot sözlüğünde cevabın kendisine ait olmayan alanlar
+_SNAPSHOT_META = ("etag", "fresh_until", "body", "encoded")
+
+
+def snapshot_etag(snapshot: Dict[str, Any]) -> str:
+    body = {k: v for k, v in snapshot.items() if k not in _SNAPSHOT_META}
+    raw = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+"""
+-snapshot_etag bir snapshot'ın içeriğinden güçlü (strong) bir ETag üretir.snapshot'ı key'leri sıralı ve boşluksuz şekilde json'a çevirip sha256'sını alıyoruz,yani içerik birebir aynıysa
+ETag da aynı oluyor,tek bir karakter bile değişirse ETag değişiyor.ETag snapshot oluşturulurken bir kere hesaplanıp snapshot'ın içine "etag" alanı olarak yazılıyor,FlagsResponse bu alanı içermediği için cevapta görünmüyor.
+snapshot'ın ne zamana kadar taze olduğunu tutan fresh_until alanı ve hazır cevap gövdesi (body) hesaba katılmıyor,böylece içeriği değişmeden yenilenen bir snapshot'ın ETag'i de değişmiyor ve istemciler 304 almaya devam ediyor.
+"""
+
+
+async def load_snapshot(env: str, project_id: int, environment_id: int) -> Dict[str, Any]:
+    project_hits[project_id] += 1
+    cache_key = flags_cache_key(project_id, environment_id)
+    local = snapshot_cache.get(cache_key)
+    if local is not None:
+        if is_stale(local):
+            _revalidate(env, project_id, environment_id, cache_key)
+        return local
+    return await snapshot_flight.run(cache_key, lambda: _fill_snapshot(env, project_id, environment_id, cache_key))
+
+
+def is_stale(snapshot: Dict[str, Any]) -> bool:
+    return snapshot.get("fresh_until", 0) <= time.time()
+
+
+def _accept_snapshot(cache_key: str, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    if "etag" not in snapshot:
+        snapshot["etag"] = snapshot_etag(snapshot)
+    # arada invalidation olduysa bu sonuç sadece bekleyenlere dönsün,L1'e girmesin
+    if snapshot_flight.still_current(cache_key):
+        snapshot_cache.set(cache_key, snapshot)
+    return snapshot
+
+
+def _pack_snapshot(snapshot: Dict[str, Any]) -> bytes:
+    meta = {k: snapshot[k] for k in ("env", "project_id", "version", "etag", "fresh_until")}
+    parts = [("identity", snapshot["body"]), *snapshot.get("encoded", {}).items()]
+    meta["parts"] = [[encoding, len(data)] for encoding, data in parts]
+    return b"".join([dumps_bytes(meta), b"\n", *(data for _, data in parts)])
+
+
+def _unpack_snapshot(raw: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    if not raw:
+        return None
+    head, sep, body = raw.partition(b"\n")
+    if not sep:
+        # eski formatta yazılmış bir kayıt,cache miss gibi davranıp üzerine yazıyoruz
+        return None
+    snapshot = loads_bytes(head)
+    parts = snapshot.pop("parts", None) or [["identity", len(body)]]
+    encoded: Dict[str, bytes] = {}
+    offset = 0
+    for encoding, size in parts:
+        encoded[encoding] = body[offset:offset + size]
+        offset += size
+    snapshot["body"] = encoded.pop("identity")
+    snapshot["encoded"] = encoded
+    return snapshot
+
+
+async def _read_snapshot(project_id: int, cache_key: str) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    gen, raw = await cache_get_bytes_gen(project_id, cache_key)
+    return gen, _unpack_snapshot(raw)
+
+
+def snapshot_content(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    if "flags" not in snapshot:
+        snapshot.update(loads_bytes(snapshot["body"]))
+    return snapshot
+"""
+-snapshot'ı Redis'e iki parça halinde tek bir değer olarak yazıyoruz: ilk satırda küçük bir meta json'u (env,project_id,version,etag,fresh_until),"\n"'den sonra ise /sdk/v1/flags'in hazır cevap gövdesi.
+json çıktısında ham satır sonu bulunmadığı için ilk "\n" her zaman meta ile gövdeyi ayırıyor.
+Güncelleme: gövdenin gzip/br halleri de aynı değerin içinde,gövdenin hemen arkasına ekleniyor.meta'daki parts listesi hangi parçanın hangi encoding'e ait olduğunu ve uzunluğunu tutuyor,
+böylece bütün haller tek bir GET ile geliyor ve okurken sadece byte dilimleniyor.parts alanı olmayan (önceki formatta yazılmış) kayıtlarda değerin tamamı sıkıştırılmamış gövde kabul ediliyor.
+-_read_snapshot Redis'ten okurken (_unpack_snapshot) sadece küçük meta kısmını parse ediyor,gövde byte olarak duruyor.tam snapshot dönen /flags istekleri bu gövdeyi olduğu gibi gönderdiği için büyük json hiç parse edilmiyor.
+-snapshot_content flag ve config'lerin kendisine ihtiyaç duyan yerler (delta,kural derleme) için gövdeyi ilk ihtiyaç anında bir kere parse edip snapshot sözlüğüne ekliyor.
+"""
+
+
+async def _fill_snapshot(env: str, project_id: int, environment_id: int, cache_key: str) -> Dict[str, Any]:
+    gen, cached = await _read_snapshot(project_id, cache_key)
+    if gen is not None:
+        cache_requests.inc("redis", "hit" if cached else "miss")
+    if cached:
+        log_event("cache.hit", key=cache_key)
+        if is_stale(cached):
+            _revalidate(env, project_id, environment_id, cache_key)
+        return _accept_snapshot(cache_key, cached)
+
+    log_event("cache.miss", key=cache_key)
+
+    should_build, token = await cache_lock(cache_key, gen, settings.SINGLE_FLIGHT_LOCK_MS)
+    if not should_build:
+        # başka bir process bu generation için snapshot'ı oluşturuyor,Redis'e yazmasını bekliyoruz
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT_MS / 1000
+        new_gen = gen
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.SINGLE_FLIGHT_POLL_MS / 1000)
+            new_gen, cached = await _read_snapshot(project_id, cache_key)
+            if cached:
+                return _accept_snapshot(cache_key, cached)
+            if new_gen != gen:
+                break
+        should_build, token = await cache_lock(cache_key, new_gen, settings.SINGLE_FLIGHT_LOCK_MS)
+        gen = new_gen
+
+    """
+    yukarıda eklediğim Redis cache sayesinde önceden çektiğim bilgileri tekrardan kullancaksam db'ye gitmeme gerek kalmadan bellek üzerinden çekmemi sağlayacak.Bu da perfonmans kazandırır.
+    kod satırını yorumlarsak,ilk satırdaki cache_key daha önceden çekip cache'ye eklediğim verinin bir anahtarının olmasını sağlar.Bu sayede istenilen bilgiler uyuşursa bu bilgiye erişilir.
+    bu cache_key'in eşitliğini yorumlarsak: ff:flags bu bilginin bir feature flags flags'i cevabı olduğunu belirtir,yani prefix bir ifadedir,geri kalan bilgiler ise proje id'si ve env id'sidir.
+    diğer satırdaki cached_get_json() ise parametre olarak cache_key'in bilgisini cache'den çekip cached'a atmaktadır.Cevaba göre işlem yapılacağı için await olarak tanımlama yaptık.
+    3. satırda ise eğer ki bu cached dolu ise bilgiyi döndür diyoruz.
+    Güncelleme:cache_keylerin cache.py dosyasından oluşturulup alınması sağlandı,böylece cache'leri yanlış yazma derdi ortadan kalktı.  
+    Güncelleme2:Redis'e gitmeden önce worker'ın kendi belleğindeki L1 cache'e (snapshot_cache) bakıyoruz,orada varsa hiçbir ağ isteği ve json.loads yapmadan direkt dönüyoruz.
+    Redis'ten gelen veriyi de L1'e yazıyoruz ki aynı worker'a gelen sonraki istekler Redis'e hiç gitmesin.
+    Güncelleme3:cache kontrolünden önce de çalışan (ve aşağıda aynısı tekrar edilen) config sorgusu kaldırıldı,artık cache'den dönen isteklerde DB'ye hiç gidilmiyor.
+    Güncelleme4:bu kısım get_flags'ten load_snapshot metotuna taşındı ki /evaluate endpointi de aynı cache'lenmiş snapshot'ı kullanabilsin.
+    Güncelleme5:cache miss durumunda snapshot artık run_db ile thread havuzunda oluşturuluyor,event loop DB sorgularını beklerken kilitlenmiyor.
+    Güncelleme6:snapshot oluşturulduktan sonra ETag'i hesaplanıp içine yazılıyor,ETag Redis'e ayrıca kendi key'i ile de yazılıyor ki 304 kontrolü snapshot'ı çekmeden yapılabilsin.
+    Güncelleme7:Redis okuma/yazma işlemleri generation tabanlı key'lerle yapılıyor (cache.py).okurken gelen generation'ı saklayıp yazarken aynısını kullanıyoruz,snapshot ve ETag tek pipeline ile yazılıyor.
+    Güncelleme8 (stampede koruması): popüler bir proje invalidate edildiğinde aynı anda gelen bütün istekler cache miss alıp aynı snapshot'ı DB'den tekrar tekrar oluşturuyordu.artık iki seviyede tek uçuş (single-flight) var:
+    process içinde load_snapshot işi snapshot_flight üzerinden çalıştırıyor,aynı key için bir worker'da aynı anda sadece bir _fill_snapshot çalışıyor,diğer istekler onun sonucunu bekliyor.
+    process'ler arasında ise cache_lock ile Redis'te generation'a özel kısa ömürlü bir kilit alıyoruz.kilidi alan DB'den oluşturuyor,alamayanlar SINGLE_FLIGHT_POLL_MS aralıklarla Redis'teki key'e bakıp
+    dolmasını bekliyor.bekleme süresi (SINGLE_FLIGHT_WAIT_MS) dolarsa ya da bu sırada generation değişirse kilidi tekrar deniyoruz,kilit sahibi ölmüş ve kilidin süresi dolmuşsa bu sefer kendimiz oluşturuyoruz,
+    yani bir process'in çökmesi diğerlerini sonsuza kadar bekletmiyor.
+    Güncelleme9 (stale-while-revalidate): snapshot'lar Redis'e artık sabit 120 sn yerine iki süre ile yazılıyor.snapshot'ın içindeki fresh_until alanı soft süreyi (SNAPSHOT_SOFT_TTL_SECONDS),
+    Redis TTL'i ise hard süreyi (SNAPSHOT_HARD_TTL_SECONDS) tutuyor.soft süresi dolmuş bir snapshot bulunursa bekletmeden o dönülüyor ve _revalidate ile arka planda yenileniyor,
+    sadece hard süre dolduysa ya da admin invalidation'ı ile generation değiştiyse istek snapshot'ın oluşmasını bekliyor.
+    Güncelleme10: Redis'te artık snapshot'ın json hali değil /sdk/v1/flags'in hazır cevap gövdesi (bytes) duruyor,okurken _read_snapshot ile sadece küçük meta kısmı parse ediliyor.
+    """
+
+    # should_build hâlâ False ise kilit başkasında ama snapshot gelmedi,istemciyi daha fazla bekletmemek için kilitsiz (token=None) oluşturuyoruz
+    try:
+        resp = await store_snapshot(env, project_id, environment_id, cache_key, gen)
+    finally:
+        await cache_unlock(cache_key, gen, token)
+    return _accept_snapshot(cache_key, resp)
+
+
+def encode_snapshot(session: Session, env: str, project_id: int, environment_id: int) -> Dict[str, Any]:
+    resp = build_snapshot(session, env, project_id, environment_id)
+    resp["etag"] = snapshot_etag(resp)
+    # cevap modeli ile doğrulama,json'a çevirme ve sıkıştırma işi snapshot başına sadece burada bir kere yapılıyor
+    resp["body"] = dumps_bytes(FlagsResponse.model_validate(resp).model_dump(mode="json"))
+    resp["encoded"] = compress_variants(resp["body"], settings.SNAPSHOT_COMPRESS_MIN_BYTES)
+    return resp
+
+
+def load_materialized(session: Session, env: str, project_id: int, environment_id: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    raw = session.exec(
+        select(FlagSnapshot.payload).where(FlagSnapshot.project_id == project_id, FlagSnapshot.environment_id == environment_id)
+    ).first()
+    snapshot = _unpack_snapshot(raw)
+    if snapshot is not None:
+        cache_requests.inc("materialized", "hit")
+        snapshot_build_seconds.observe(time.perf_counter() - t0, "materialized")
+        return snapshot
+    cache_requests.inc("materialized", "miss")
+    snapshot = encode_snapshot(session, env, project_id, environment_id)
+    snapshot_build_seconds.observe(time.perf_counter() - t0, "tables")
+    return snapshot
+
+
+def materialize_snapshots(session: Session, project_id: int, environment_id: Optional[int] = None) -> None:
+    # aynı projeye yazan admin transaction'ları satırları sırayla yazsın diye proje satırını kilitliyoruz (record_change'in UPDATE'i zaten aldıysa bir şey değişmiyor)
+    session.exec(select(Project.id).where(Project.id == project_id).with_for_update()).first()
+    environments = _project_environments(session, project_id)
+    if environment_id is not None:
+        environments = [(eid, env) for eid, env in environments if eid == environment_id]
+    for environment_id, env in environments:
+        t0 = time.perf_counter()
+        snapshot = encode_snapshot(session, env, project_id, environment_id)
+        snapshot_build_seconds.observe(time.perf_counter() - t0, "admin")
+        snapshot["fresh_until"] = 0
+        row = session.get(FlagSnapshot, (project_id, environment_id))
+        if row is None:
+            row = FlagSnapshot(project_id=project_id, environment_id=environment_id, etag=snapshot["etag"], payload=b"")
+        row.version = snapshot["version"]
+        row.etag = snapshot["etag"]
+        row.payload = _pack_snapshot(snapshot)
+        session.add(row)
+    session.flush()
+"""
+-materialize_snapshots admin endpointlerinde commit'ten hemen önce çağrılıyor ve projenin her ortamı için snapshot'ı (etag,cevap gövdesi ve sıkıştırılmış halleri dahil) oluşturup FlagSnapshot tablosuna
+Redis'tekiyle aynı formatta yazıyor.yazma ile aynı transaction'da olduğu için satır her zaman commit edilmiş veriyle aynı,değişiklik commit edilmezse satır da eski halinde kalıyor.
+proje satırı kilitlendikten sonra okuma yapıldığı için (admin session'ları MySQL'de READ COMMITTED,bkz. db.get_admin_session) aynı projeye aynı anda yazan iki istekten sonra commit edilen,
+diğerinin değişikliğini de görmüş oluyor.bedeli admin yazmasının snapshot oluşturma süresi kadar uzaması,yani büyük projelerde yazma isteği snapshot oluşturma süresi kadar uzuyor.
+Güncelleme: environment_id verilirse sadece o ortamın satırı yazılıyor.record_change'deki gibi tek bir ortamı etkileyen değişikliklerde (kural,env'e özel config,yeni ortam) endpointler ortamı veriyor,
+projenin bütün ortamları sadece bütün ortamları etkileyen değişikliklerde (flag,variant,global config,import) yeniden yazılıyor.önceden her yazma bütün ortamları proje kilidi altında
+yeniden oluşturuyordu,5k flag'lik 3 ortamlı bir projede env'e özel bir config yazması ~1.3 sn sürüyordu.
+diğer ortamların satırları dokunulmadığı için versiyonları (ve ETag'leri) o ortamı etkileyen son değişikliğin versiyonunda kalıyor,yani bir ortamın snapshot versiyonu projenin change_version'ından
+küçük olabilir.delta sync bunu zaten doğru karşılıyor (load_changes başka ortamlara ait kayıtları atlıyor),bu ortamların SDK'ları da hiçbir şey değişmediği için 304 almaya devam ediyor.
+-load_materialized cache miss'te (ve soft süresi dolan snapshot yenilenirken) snapshot'ı tablolardan oluşturmak yerine FlagSnapshot'tan primary key ile tek satır okuyor,satırda json çevirme ya da
+sıkıştırma işi de yapılmış olduğu için sadece byte dilimleniyor.satır yoksa (bu tablo eklenmeden önce oluşturulmuş ve o zamandan beri admin yazması almamış projeler) eski yoldan oluşturuluyor,
+bunlar için scripts/materialize_snapshots.py ile satırlar önceden yazılabilir.
+-DB'ye admin API'si dışından (elle SQL vb.) yazılan değişiklikler satıra yansımaz,böyle bir değişiklikten sonra projenin satırlarını script ile yeniden yazmak gerekiyor.
+-satırın bulunup bulunmadığı ff_cache_requests_total{tier="materialized"} ile,snapshot'ın ne kadar sürede hazırlandığı (satırdan,tablolardan ya da admin yazmasında) ff_snapshot_build_seconds ile
+sayılıyor (core/metrics.py).
+"""
+
+
+async def store_snapshot(env: str, project_id: int, environment_id: int, cache_key: str, gen: Optional[int]) -> Dict[str, Any]:
+    resp = await run_db(load_materialized, env, project_id, environment_id)
+    resp["fresh_until"] = time.time() + settings.SNAPSHOT_SOFT_TTL_SECONDS
+    await cache_set_json_gen(
+        project_id,
+        gen,
+        {cache_key: _pack_snapshot(resp), flags_etag_cache_key(project_id, environment_id): resp["etag"]},
+        ttl_seconds=max(int(settings.SNAPSHOT_HARD_TTL_SECONDS), int(settings.SNAPSHOT_SOFT_TTL_SECONDS) + 1),
+    )
+    return resp
+"""
+snapshot'ı DB'den oluşturup ETag'ini,soft süresini (fresh_until),FlagsResponse ile doğrulanıp json'a çevrilmiş hazır cevap gövdesini (body) ve bu gövdenin sıkıştırılmış hallerini (encoded) yazar,
+sonra snapshot ile ETag'i verilen generation'a hard süre kadar TTL ile kaydeder.json'a çevirme ve sıkıştırma CPU işi olduğu için encode_snapshot içinde DB sorguları ile birlikte thread havuzunda yapılıyor,
+büyük bir snapshot'ı sıkıştırırken event loop beklemiyor.
+Güncelleme: snapshot önce load_materialized ile FlagSnapshot tablosundan okunuyor,sadece satır yoksa tablolardan oluşturuluyor.
+fresh_until bir duvar saati (time.time()) değeridir çünkü snapshot Redis üzerinden diğer process'ler tarafından da okunuyor,monotonic saat process'e özel olduğu için burada kullanılamaz.
+"""
+
+
+def _revalidate(env: str, project_id: int, environment_id: int, cache_key: str) -> None:
+    refresh_key = f"{cache_key}:refresh"
+    snapshot_flight.spawn(refresh_key, lambda: _refresh_snapshot(env, project_id, environment_id, cache_key, refresh_key))
+
+
+async def _refresh_snapshot(env: str, project_id: int, environment_id: int, cache_key: str, refresh_key: str) -> None:
+    gen, cached = await _read_snapshot(project_id, cache_key)
+    if cached and not is_stale(cached):
+        # başka bir worker bizden önce yenilemiş
+        snapshot = cached
+    else:
+        should_build, token = await cache_lock(cache_key, gen, settings.SINGLE_FLIGHT_LOCK_MS)
+        if not should_build:
+            return
+        try:
+            snapshot = await store_snapshot(env, project_id, environment_id, cache_key, gen)
+        finally:
+            await cache_unlock(cache_key, gen, token)
+    if snapshot_flight.still_current(refresh_key):
+        snapshot_cache.set(cache_key, snapshot)
+"""
+-_revalidate soft süresi dolmuş bir snapshot dönülürken çağrılıyor,yenileme işini snapshot_flight.spawn ile arka planda başlatıp hemen dönüyor.aynı key için zaten bir yenileme devam ediyorsa yenisi başlamıyor.
+-_refresh_snapshot önce Redis'e bakıyor,başka bir worker snapshot'ı zaten yenilediyse DB'ye gitmeden onu alıyor.yenilenmemişse cache miss'teki gibi cache_lock ile kilit alıp snapshot'ı oluşturuyor,
+kilidi alamazsa başka bir process yeniliyor demektir ve bir şey yapmadan çıkıyor (L1'deki snapshot'ın kısa TTL'i dolunca yenisi Redis'ten okunacak).
+-yenileme sürerken admin tarafı invalidation yaptıysa forget_prefix bu işi sözlükten çıkarmış oluyor,still_current False döndüğü için eski veriyle oluşturulmuş olabilecek snapshot L1'e yazılmıyor.
+"""
+
+
+def _project_environments(session: Session, project_id: int) -> List[Tuple[int, str]]:
+    rows = session.exec(select(Environment.id, Environment.name).where(Environment.project_id == project_id)).all()
+    return [(int(environment_id), name) for environment_id, name in rows]
+
+
+async def rebuild_project(project_id: int) -> None:
+    environments = await run_db(_project_environments, project_id)
+    await asyncio.gather(*(load_snapshot(env, project_id, environment_id) for environment_id, env in environments))
+"""
+bir projenin bütün ortamlarının snapshot'larını yükler.invalidate_project_sync L1'i temizleyip generation'ı artırdıktan sonra çağrıldığı için load_snapshot cache'de bir şey bulamıyor,
+snapshot'ı DB'den oluşturup Redis'e ve L1'e yazıyor,yani asıl iş yine load_snapshot'ın single-flight ve Redis kilidi ile korunan yolundan yapılıyor.
+bu sırada gelen SDK istekleri de aynı single-flight'a katıldığı için ikinci kez oluşturulmuyor.araya bir SDK isteği girip snapshot'ı zaten oluşturduysa load_snapshot onu L1'den dönüyor ve DB'ye gidilmiyor.
+core/rebuild.py'deki snapshot_rebuilder admin değişikliklerinden sonra bu metotu çağırıyor.
+"""
+
+
+def _recently_changed_projects(session: Session, limit: int) -> List[int]:
+    rows = session.exec(select(Project.id).order_by(Project.change_version.desc()).limit(limit)).all()
+    return [int(project_id) for project_id in rows]
+
+
+async def warm_up(limit: int) -> int:
+    project_ids = await cache_hot_projects(limit)
+    if not project_ids:
+        project_ids = await run_db(_recently_changed_projects, limit)
+    await asyncio.gather(*(rebuild_project(project_id) for project_id in project_ids))
+    return len(project_ids)
+"""
+uygulama açılırken (main.py lifespan) en çok istek alan limit kadar projenin snapshot'larını önceden yükler,böylece yeni açılan bir worker'a gelen ilk istekler cache miss almıyor.
+hangi projelerin en çok istek aldığını Redis'teki ff:hot_projects kümesinden okuyoruz.Redis yoksa ya da küme boşsa (ilk kurulum) en çok değişiklik yapılan (change_version'ı en büyük) projeleri seçiyoruz.
+Redis'te snapshot zaten varsa DB'ye gidilmeden sadece bu worker'ın L1 cache'i dolduruluyor.geriye ısıtılan proje sayısını dönüyor.
+"""
+
+
+async def run_hot_project_reporter(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.HOT_PROJECTS_REPORT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        counts = dict(project_hits)
+        project_hits.clear()
+        await cache_report_hot_projects(counts, ttl_seconds=int(settings.HOT_PROJECTS_TTL_SECONDS))
+"""
+her worker'da lifespan ile başlatılan arka plan görevi.HOT_PROJECTS_REPORT_SECONDS'ta bir project_hits sayaçlarını Redis'e ekleyip sıfırlıyor,kapanırken de son sayaçları gönderiyor.
+sayaçları dict(...) ile kopyalayıp clear() etmemizin arasında event loop'a sıra verilmediği için arada gelen bir isteğin sayımı kaybolmuyor.
+"""
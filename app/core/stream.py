@@ -0,0 +1,72 @@
+# app/core/stream.py
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+"""
+/sdk/v1/stream (SSE) bağlantılarına "bu projede bir şey değişti" haberini ileten küçük yayın (broadcast) katmanı.
+admin endpointleri senkron olduğu için FastAPI'nin thread havuzunda çalışıyor,SSE bağlantıları ise event loop üzerinde bekliyor.bu yüzden haberi thread'den event loop'a
+call_soon_threadsafe ile aktarıyoruz.
+"""
+
+
+class ProjectNotifier:
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._events: Dict[int, asyncio.Event] = {}
+        self._subscribers: Dict[int, int] = {}
+        self._guard = threading.Lock()
+        self.notifications = 0
+
+    def subscribe(self, project_id: int) -> None:
+        self._loop = asyncio.get_running_loop()
+        with self._guard:
+            self._subscribers[project_id] = self._subscribers.get(project_id, 0) + 1
+
+    def unsubscribe(self, project_id: int) -> None:
+        with self._guard:
+            left = self._subscribers.get(project_id, 0) - 1
+            if left > 0:
+                self._subscribers[project_id] = left
+                return
+            self._subscribers.pop(project_id, None)
+        self._events.pop(project_id, None)
+
+    def current(self, project_id: int) -> asyncio.Event:
+        event = self._events.get(project_id)
+        if event is None:
+            event = self._events[project_id] = asyncio.Event()
+        return event
+
+    def notify(self, project_id: int) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed() or project_id not in self._subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._notify, project_id)
+        except RuntimeError:
+            # loop kapanıyorsa dinleyen bağlantı da kalmamıştır
+            pass
+
+    def _notify(self, project_id: int) -> None:
+        event = self._events.pop(project_id, None)
+        if event is not None:
+            self.notifications += 1
+            event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._guard:
+            subscribers = dict(self._subscribers)
+        return {
+            "projects": len(subscribers),
+            "connections": sum(subscribers.values()),
+            "notifications": self.notifications,
+        }
+"""
+-her proje için bir asyncio.Event tutuyoruz.SSE bağlantısı snapshot'ı okumadan ÖNCE current() ile o anki event'i alıyor,gönderme işini bitirince de bu event'in set edilmesini bekliyor.
+notify geldiğinde event set ediliyor ve sözlükten çıkarılıyor,sonraki bekleyiciler için yeni bir event oluşuyor.event'i snapshot'tan önce aldığımız için snapshot okunurken gelen bir değişiklik de kaçmıyor.
+-boşta bekleyen bir bağlantının maliyeti sadece bir event'i bekleyen bir coroutine,yani tek bir worker binlerce bağlantıyı rahatça taşıyabiliyor.
+-bir projede değişiklik olduğunda o projeye bağlı bütün bağlantılar aynı anda uyanıyor,snapshot'ı yeniden yükleme işini load_snapshot (core/snapshots.py) içindeki single-flight tek bir işe indiriyor.
+-notify thread-safe'dir,invalidate_project_sync içinden çağrılıyor.loop henüz bağlanmadıysa ya da projeyi dinleyen yoksa hiçbir şey yapmıyor.
+"""
+
+stream_notifier = ProjectNotifier()
@@ -1,23 +1,75 @@
-﻿from contextlib import asynccontextmanager
+﻿import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
 from pathlib import Path
 
-from app.core.db import init_db
-from app.routers import sdk, admin
+from app.core.db import init_db, shutdown_db_executor
+from app.core.eval import shutdown_eval_executor
+from app.core.log import event_log, log_event
+from app.core.cache import invalidation_queue, run_invalidation_subscriber, run_metrics_reporter
+from app.core.metrics import MetricsMiddleware
+from app.core.rebuild import snapshot_rebuilder
+from app.core.settings import settings
+from app.core.snapshots import rebuild_project, run_hot_project_reporter, warm_up
+from app.routers import sdk, admin, metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    event_log.start()
     init_db()
+    snapshot_rebuilder.start(rebuild_project)
+    invalidation_queue.start()
+
+    if settings.WARMUP_PROJECTS > 0:
+        try:
+            warmed = await asyncio.wait_for(warm_up(settings.WARMUP_PROJECTS), timeout=settings.WARMUP_TIMEOUT_SECONDS)
+            log_event("warmup.done", projects=warmed)
+        except Exception as e:
+            log_event("warmup.skipped", logging.WARNING, error=repr(e))
+
+    stop = asyncio.Event()
+    tasks = []
+    if os.getenv("REDIS_ENABLED", "0") == "1":
+        tasks.append(asyncio.create_task(run_invalidation_subscriber(stop)))
+        tasks.append(asyncio.create_task(run_hot_project_reporter(stop)))
+        tasks.append(asyncio.create_task(run_metrics_reporter(stop)))
+
     yield
 
+    stop.set()
+    invalidation_queue.stop()
+    snapshot_rebuilder.stop()
+    for task in tasks:
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+    shutdown_db_executor()
+    shutdown_eval_executor()
+    event_log.stop()
+
 
 app = FastAPI(title="Feature Flags & Remote Config", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 """
 uygulama ilk ayağa kalkarken init_db() çağırıyor.
 bu sayede tablolar oluşturuluyor ve db hazırlanıyor.
 FastAPI kısmında ise parametre olarak yukarıda oluşturduğumuz lifespan'ı parametre olarak veriyoruz ve de başlangıçta bu işleri yap diyoruz.
+Güncelleme: yield'den sonraki kısım uygulama kapanırken çalışır,burada SDK endpointlerinin DB işlerini yapan thread havuzunu kapatıyoruz.
+Güncelleme2: Redis açıksa (REDIS_ENABLED=1) her worker başlarken invalidation kanalını dinleyen arka plan görevini başlatıyoruz,böylece başka bir replica'da yapılan admin değişikliği
+bu worker'ın L1 cache'inden de hemen siliniyor.kapanırken görevi durdurup bitmesini bekliyoruz.
+Güncelleme3: snapshot_rebuilder'a bu worker'ın event loop'u ve rebuild_project veriliyor,admin değişikliklerinden sonra snapshot'lar arka planda yeniden oluşturuluyor.
+ardından en çok istek alan WARMUP_PROJECTS kadar projenin snapshot'ları warm_up ile önceden yükleniyor (en fazla WARMUP_TIMEOUT_SECONDS beklenir,süre dolarsa ya da hata olursa açılış devam eder).
+Redis açıksa proje başına istek sayılarını Redis'e gönderen run_hot_project_reporter görevi de başlatılıyor,bir sonraki açılışta hangi projelerin ısıtılacağı buradan bulunuyor.
+Güncelleme4: admin yazmalarının invalidation'larını birleştirip istek dışında uygulayan invalidation_queue başlatılıyor.kapanırken önce bu kuyruk durduruluyor ki bekleyen invalidation'lar uygulanıp diğer replica'lara yayınlansın.
+Güncelleme5: Redis açıksa worker'ın metriklerini Redis'e yazan run_metrics_reporter da başlatılıyor,/metrics bütün worker'ların değerlerini buradan toplayıp gösteriyor.
+Güncelleme6: logları stdout'a yazan thread (event_log,bkz. core/log.py) ilk iş olarak başlatılıyor,kapanırken de en son durduruluyor ki diğer görevlerin kapanırken yazdığı loglar kaybolmasın.
+bütün HTTP isteklerinin süresini route'a göre ölçen MetricsMiddleware de uygulamaya ekleniyor (bkz. core/metrics.py).
 """
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -47,4 +99,6 @@ Bu sayede:
 /sdk/v1/flags gibi endpoint’ler aktif oluyor.
 Swagger’da “sdk” diye ayrı bir grup altında görünüyor.
 Özet: “Feature flags’i dış dünyaya servis eden asıl endpoint’leri” bu satır projeye ekliyor.
-"""
\ No newline at end of file
+"""
+
+app.include_router(metrics.router, tags=["metrics"])    # Prometheus için /metrics
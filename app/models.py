@@ -1,6 +1,7 @@
 ﻿from typing import Optional, Any
 from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import JSON, UniqueConstraint
+from sqlalchemy import JSON, LargeBinary, UniqueConstraint, Index
+from sqlalchemy.dialects.mysql import LONGBLOB
 """
 bu class yapısı database'de project,environment ve sdkkey adında tablolarda işlem yapmamızı sağlar.
 """
@@ -8,8 +9,10 @@ bu class yapısı database'de project,environment ve sdkkey adında tablolarda i
 class Project(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
+    change_version: int = 0  # admin tarafındaki her değişiklikte artan sayaç (delta sync)
 """
 ürünün id'si ve ismi , id ve name sütunlarında tutulmaktadır.
+Güncelleme: change_version sütunu eklendi,projede bir flag/variant/kural/config değiştiğinde bir artıyor.SDK'lar son aldıkları versiyonu since parametresi ile gönderip sadece değişenleri alabiliyor.
 """
 
 class Environment(SQLModel, table=True):
@@ -50,13 +53,17 @@ engellemek amacıyla hızlıca bu key değerinin ismini değiştiririz ve hatay
 """
 
 class FeatureFlag(SQLModel, table=True):
-    __table_args__ = (UniqueConstraint("project_id", "key", name="uq_flag_project_key"),)
+    __table_args__ = (
+        UniqueConstraint("project_id", "key", name="uq_flag_project_key"),
+        Index("ix_featureflag_project_status", "project_id", "status"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     key: str = Field(index=True)               
     on: bool = True
     default_variant: str = "off"
     status: str = Field(default="draft", index=True)  # draft | active | published
     project_id: int = Field(foreign_key="project.id", index=True)
+    hash_version: int = 2  # 1: sha256 (eski flagler) | 2: hızlı 64 bit hash
 """
 -yukarıdaki kod yapısı db'de bulunan featureflag tablosu ile ilgilenmektedir.bu tabloda yer alan id kısmı primary key olarak ayarlanmış,
 -key ise flag'imiz benzersiz bir keyi olacaktır.örnek vermek gerekirse biz bu uygulamamızda kullanıcıların karanlık tema özelliğini kullanabilmelerini yönetmek istiyoruz diyelim,bu örnek üzerinden ilerlersek key'imize 
@@ -69,6 +76,9 @@ kapattık,ama başka bir kullanım olan dark özelliğini de default_variant'a e
 draft değeri yeni bir flag ekliyorum ama bu kodu halen yazıyorum,bu kod kullanıcıya gösterilmiyor ve başka kod yapıları tarafından çağrılmıyor,yani yapım aşamasında.
 active değeri bir tane flag'in tamamlandığını kullanıcının kullanacabileceğini ama herhangi bir sıkıntı yaşanma durumuna karşı durumun sürekli izlendiğini belirtiyor.
 published değeri ise artık bu flag'in final versiyonu olduğunu belirtir.
+-güncelleme2: hash_version sütunu eklendi,kullanıcıların bucket'a ayrılırken hangi hash yönteminin kullanılacağını tutar (detaylar eval.py'de).yeni oluşturulan flagler varsayılan olarak 2'yi
+yani hızlı hash'i kullanır.sütun eklenmeden önce oluşturulmuş flagler ise db.py'deki migration ile 1 (sha256) değerini alır,böylece eski flaglerde hiçbir kullanıcının variant'ı değişmez.
+-güncelleme3: (project_id, status) index'i eklendi,snapshot sorgusu (core/snapshot_loader.py) projenin yayındaki (active/published) flag'lerini bu index'ten buluyor.
 """
 
 class FeatureVariant(SQLModel, table=True):
@@ -93,6 +103,7 @@ sa_column=Column(JSON) bu kod yapısı ise sqlalchemy'nin özelliğidir.bu kod s
 """
 
 class FeatureRule(SQLModel, table=True):
+    __table_args__ = (Index("ix_featurerule_flag_env_priority", "flag_id", "environment_id", "priority"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     flag_id: int = Field(foreign_key="featureflag.id", index=True)
     environment_id: int = Field(foreign_key="environment.id", index=True)
@@ -114,6 +125,7 @@ id: 2  flag_id:10  environment_id:3  priority:2  predicate:{"attr": "country", "
 id: 3  flag_id:10  environment_id:3  priority:3  predicate:{"attr": "is_premium", "op": "==", "value": true}  distrubtion: {"dark": 80, "off": 20}
 mesela {"country": "TR", "age": 25} diye bir tane user data'mız var diyelim,predicate ksımı gidip bu data'nın içerisindeki country seçeneğine bakar ve TR ile eşit mi kontrolunu yapar,kurala uyduğu için priority numarası 1 olan kısım bu kullanıcıya
 uygulanır.
+-güncelleme: (flag_id, environment_id, priority) index'i eklendi,snapshot sorgusu bir flag'in bir ortamdaki kurallarını priority sırasıyla direkt bu index'ten okuyor.
 """
 
 class FeatureConfig(SQLModel, table=True):
@@ -131,3 +143,31 @@ yukarıdaki tablo yapım featureflaglerin hangi ortamlarda hangi keylere göre 
 __table_args__ ifadesinin içerisindek UniqueConstraint ifadesi içerisine parametre olarak alınan ifadelerden yalnızca birinin db'de olmasını sağlar.name ifadesinde ise bir hata gerçekleştiği zaman bu hatanın hangi unique de 
 gerçekleştiğini belirtir.
 """
+
+
+class ProjectChange(SQLModel, table=True):
+    __table_args__ = (Index("ix_projectchange_project_version", "project_id", "version"),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    project_id: int = Field(foreign_key="project.id")
+    version: int
+    kind: str                                   # flag | config
+    key: str
+    environment_id: Optional[int] = None        # None: bütün ortamları etkiliyor
+"""
+bu tablo projelerdeki değişikliklerin kaydını tutar (delta sync için).her satır hangi versiyonda hangi flag'in ya da config key'inin değiştiğini gösterir,satırın içeriği değil sadece key'i tutuluyor,
+güncel içerik zaten snapshot'tan alınıyor.(project_id, version) üzerindeki index ile "şu versiyondan sonra neler değişti" sorgusu hızlı çalışıyor.kayıtların yazılıp okunması core/changes.py'de.
+"""
+
+
+class FlagSnapshot(SQLModel, table=True):
+    project_id: int = Field(foreign_key="project.id", primary_key=True)
+    environment_id: int = Field(foreign_key="environment.id", primary_key=True)
+    version: int = 0
+    etag: str
+    payload: bytes = Field(sa_column=Column(LargeBinary().with_variant(LONGBLOB, "mysql", "mariadb"), nullable=False))
+"""
+her (proje,ortam) için /sdk/v1/flags cevabının hazır (materialized) halini tutan tablo.payload Redis'teki snapshot değeri ile aynı formatta (meta json + "\n" + cevap gövdesi + gzip/br halleri,bkz. core/snapshots.py),
+yani buradan okunan satır hiçbir json çevirme ya da sıkıştırma yapmadan direkt kullanılabiliyor.
+admin tarafındaki her yazma işlemi bu satırları kendi transaction'ı içinde yeniden yazıyor (materialize_snapshots),SDK tarafı cache miss'te snapshot'ı flag/variant/kural tablolarından
+oluşturmak yerine bu tablodan primary key ile tek satır okuyor.MySQL'de LargeBinary BLOB (en fazla 64KB) oluyor,büyük projelerin snapshot'ları sığsın diye LONGBLOB kullanıyoruz.
+"""
@@ -1,19 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Any
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Optional, Any, Dict, Iterator, List, Tuple
 from sqlmodel import Session, select
+from sqlalchemy import delete, insert
 from sqlalchemy.exc import IntegrityError
 
-from app.core.db import get_session
-from app.core.cache import invalidate_project_sync
+from app.core.db import get_admin_session, engine, pool_stats
+from app.core.cache import invalidate_project_sync, invalidate_sdk_resolution_sync, invalidation_stats, invalidation_queue
+from app.core.local_cache import snapshot_cache, resolver_cache, ruleset_cache, snapshot_flight
+from app.core.rebuild import snapshot_rebuilder
+from app.core.snapshots import materialize_snapshots
+from app.core.log import log_event
+from app.core.metrics import cache_requests
 from app.models import Project, Environment, SDKKey, FeatureFlag, FeatureVariant, FeatureRule, FeatureConfig
 from app.core.admin_auth import require_admin
+from app.core.eval import HASH_BUCKETS
+from app.core.changes import record_change, record_changes, CHANGE_FLAG, CHANGE_CONFIG
+from app.core.serialization import dumps_bytes
+from app.core.settings import settings
 
 router = APIRouter(dependencies=[Depends(require_admin)])
 
 
+def _invalidate(response: Response, project_id: int, version: Optional[int] = None) -> None:
+    visible_at = invalidate_project_sync(project_id, version)
+    log_event("admin.change", project_id=project_id, version=version, visible_at=round(visible_at, 3))
+    response.headers["X-Change-Visible-At"] = datetime.fromtimestamp(visible_at, timezone.utc).isoformat(timespec="milliseconds")
+"""
+yazma yapan endpointlerin ortak invalidation adımı.invalidate_project_sync işi kuyruğa ekleyip hemen dönüyor (core/cache.py InvalidationQueue),dönen zamanı da
+X-Change-Visible-At header'ı ile (UTC,ISO 8601) admin'e bildiriyoruz,yani değişikliğin SDK'lara ne zaman görünür olacağı cevaptan okunabiliyor.
+her değişiklik admin.change olayı olarak da loglanıyor (proje,yeni versiyon,görünür olacağı zaman).
+"""
+
+
+def _page(session: Session, query, model, response: Response, cursor: Optional[int], limit: int) -> list:
+    if cursor is not None:
+        query = query.where(model.id > cursor)
+    rows = session.exec(query.order_by(model.id).limit(limit + 1)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    return rows
+"""
+admin liste endpointlerinin ortak sayfalama adımı (keyset pagination).OFFSET yerine "id > cursor" kullanıyoruz,OFFSET'te DB atlanan satırları da okumak zorunda kaldığı için
+ileri sayfalar gittikçe yavaşlıyordu,keyset'te her sayfa aynı maliyette (project_id ile filtrelenen sorgularda project_id index'i id'yi de içerdiği için sıralama index'ten geliyor).
+-limit+1 satır okuyup fazladan satır geldiyse sonraki sayfa var demektir,bu durumda son satırın id'sini X-Next-Cursor header'ı ile dönüyoruz.istemci bir sonraki istekte bunu cursor parametresi olarak gönderiyor,
+header yoksa son sayfadır.
+-cevabın gövdesi eskisi gibi düz bir liste,yani sayfalamayı bilmeyen istemciler bozulmuyor (sadece ilk sayfayı alıyorlar).
+"""
+
+
+def _page_params(
+    cursor: Optional[int] = Query(None, ge=0),
+    limit: int = Query(settings.ADMIN_PAGE_SIZE, ge=1, le=settings.ADMIN_PAGE_MAX),
+) -> Tuple[Optional[int], int]:
+    return cursor, limit
+
+
 @router.post("/projects", response_model=Project)
-def create_project(project: Project, session: Session = Depends(get_session)):
+def create_project(project: Project, session: Session = Depends(get_admin_session)):
     existing = session.exec(select(Project).where(Project.name == project.name)).first()
     if existing:
         raise HTTPException(status_code=409, detail="Project name already exists")
@@ -27,23 +75,36 @@ yeni bir proje (örn: shop) oluşturup veritabanına kaydediyor.sonrada kaydetti
 """
 
 @router.get("/projects", response_model=list[Project])
-def list_projects(session: Session = Depends(get_session)):
-    return session.exec(select(Project)).all()
+def list_projects(
+    response: Response,
+    name: Optional[str] = Query(None, description="isminde bu metin geçen projeler"),
+    page: Tuple[Optional[int], int] = Depends(_page_params),
+    session: Session = Depends(get_admin_session),
+):
+    query = select(Project)
+    if name:
+        query = query.where(Project.name.contains(name, autoescape=True))
+    return _page(session, query, Project, response, *page)
 """
 get/projects
 db'deki tüm projeleri listeliyor.
+Güncelleme: liste artık sayfalı (cursor,limit),bkz. _page.
+Güncelleme2: name ile isme göre arama eklendi.UI'daki proje dropdown'ları bütün sayfaları çekmek yerine ilk sayfayı gösterip bu parametre ile arama yapıyor.
 """
 
 
 @router.post("/envs", response_model=Environment)
-def create_env(env: Environment, session: Session = Depends(get_session)):
+def create_env(env: Environment, response: Response, session: Session = Depends(get_admin_session)):
     if not session.get(Project, env.project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     try:
         session.add(env)
+        session.flush()
+        materialize_snapshots(session, env.project_id, env.id)
         session.commit()
         session.refresh(env)
-        invalidate_project_sync(env.project_id)
+        _invalidate(response, env.project_id)
+        invalidate_sdk_resolution_sync()
         return env
     except IntegrityError:
         session.rollback()
@@ -57,19 +118,32 @@ models dosyamda yer alan environment tablomda bir kontrol eklemiştim,aynı öze
 yakalıyordu,biz bu hatayı daha anlamlı bir hale getirebilmek için try extcept bloğu ekledik.
 Güncelleme:
 invalidate_project_sync(env.project_id) kod satırı env tablosunda herhangi bir değişiklik yapıtığımızda ilgili id'ye sahip olan json bilgilerini cache'den silmektedir.
+Güncelleme2: invalidate_sdk_resolution_sync() ile SDK key çözümleme cache'ini temizliyoruz,çünkü daha önce "Unknown environment" diye cache'lenmiş bir istek artık geçerli olabilir.
+Güncelleme3: yazma yapan bütün endpointler commit'ten önce materialize_snapshots ile projenin FlagSnapshot satırlarını aynı transaction'da yeniden yazıyor (bkz. core/snapshots.py),
+yeni ortamın satırı da burada oluşuyor.
+Güncelleme4: tek bir ortamı etkileyen yazmalar (kural,env'e özel config,yeni ortam) materialize_snapshots'a record_change'e verdikleri environment_id'yi de veriyor,sadece o ortamın satırı yazılıyor.
 """
 
 @router.get("/envs", response_model=list[Environment])
-def list_envs(session: Session = Depends(get_session)):
-    return session.exec(select(Environment)).all()
+def list_envs(
+    response: Response,
+    project_id: Optional[int] = None,
+    page: Tuple[Optional[int], int] = Depends(_page_params),
+    session: Session = Depends(get_admin_session),
+):
+    query = select(Environment)
+    if project_id is not None:
+        query = query.where(Environment.project_id == project_id)
+    return _page(session, query, Environment, response, *page)
 """
 Get/envs
 tüm environment kayıların getirip listeliyor.
+Güncelleme: project_id verilirse sadece o projenin ortamları dönüyor,liste sayfalı (cursor,limit).önceden UI bütün ortamları alıp kendisi filtreliyordu.
 """
 
 
 @router.post("/keys", response_model=SDKKey)
-def create_key(k: SDKKey, session: Session = Depends(get_session)):
+def create_key(k: SDKKey, response: Response, session: Session = Depends(get_admin_session)):
     if not session.get(Project, k.project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     if not session.get(Environment, k.environment_id):
@@ -78,7 +152,8 @@ def create_key(k: SDKKey, session: Session = Depends(get_session)):
         session.add(k)
         session.commit()
         session.refresh(k)
-        invalidate_project_sync(k.project_id)
+        _invalidate(response, k.project_id)
+        invalidate_sdk_resolution_sync()
         return k
     except IntegrityError:
         session.rollback()
@@ -89,25 +164,43 @@ yeni bir sdk key eklemesi yapıyoruz,ama eklemeyi tam yapmadan önce eklenecek o
 eğer yoksa hata fırlatıyoruz.
 sonrasında ise ürünleri ekliyoruz,ama except içerisinde bir catch bloğu kontrolu yapıyoruz,eğer ki key varsa 409 hata kodu ile sdk key zaten var hatası fırlatıyoruz.
 Güncelleme:invalidate_project_sync(k.project_id) satırı ilgili bilgileri cache'den siliyor.
+Güncelleme2:invalidate_sdk_resolution_sync() satırı ile daha önce "Invalid SDK key" diye cache'lenmiş sonuçlar temizleniyor,böylece yeni key hemen kullanılabiliyor.
 """
 
 @router.get("/keys", response_model=list[SDKKey])
-def list_keys(session: Session = Depends(get_session)):
-    return session.exec(select(SDKKey)).all()
+def list_keys(
+    response: Response,
+    project_id: Optional[int] = None,
+    environment_id: Optional[int] = None,
+    page: Tuple[Optional[int], int] = Depends(_page_params),
+    session: Session = Depends(get_admin_session),
+):
+    query = select(SDKKey)
+    if project_id is not None:
+        query = query.where(SDKKey.project_id == project_id)
+    if environment_id is not None:
+        query = query.where(SDKKey.environment_id == environment_id)
+    return _page(session, query, SDKKey, response, *page)
 """
 Get/keys
 tüm sdk key kayıtlarını getiriyoruz.
+Güncelleme: project_id ve environment_id filtreleri eklendi,liste sayfalı (cursor,limit).
 """
 
 @router.post("/flags", response_model=FeatureFlag)
-def create_flag(flag: FeatureFlag, session: Session = Depends(get_session)):
+def create_flag(flag: FeatureFlag, response: Response, session: Session = Depends(get_admin_session)):
     if flag.status not in {"draft", "active", "published"}:
         raise HTTPException(422, "Invalid status")
+    if flag.hash_version not in HASH_BUCKETS:
+        raise HTTPException(422, "Invalid hash_version")
     if not session.get(Project, flag.project_id):
         raise HTTPException(404, "Project not found")
     try:
-        session.add(flag); session.commit(); session.refresh(flag)
-        invalidate_project_sync(flag.project_id)
+        session.add(flag)
+        version = record_change(session, flag.project_id, CHANGE_FLAG, flag.key)
+        materialize_snapshots(session, flag.project_id)
+        session.commit(); session.refresh(flag)
+        _invalidate(response, flag.project_id, version)
         return flag
     except IntegrityError:
         session.rollback()
@@ -120,14 +213,41 @@ Güncelleme:
 ilk if kontrolu ile status alanına "draft", "active", "published" ifadelerinden başka bir şey yazldığında hata fırlatılmasını sağladık.
 ek olarak aynı key değerine sahip olan herhangi bir satır eklendiği zaman 409 hatası fırlatıyoruz.
 Güncelleme2:  invalidate_project_sync(flag.project_id) satırı ile ilgili bilgiler cache'den siliniyor.
+Güncelleme3: hash_version alanı için de kontrol eklendi,eval.py'de tanımlı olmayan bir hash versiyonu girilirse 422 hatası fırlatıyoruz.
+Güncelleme4: record_change ile projenin değişiklik sayacı artırılıp değişiklik kaydı ekleniyor (delta sync için).commit'ten önce çağırdığımız için flag ile aynı transaction'da yazılıyor,
+key çakışması olursa rollback ile değişiklik kaydı da geri alınıyor.aşağıdaki diğer yazma endpointlerinde de aynı şekilde kullanılıyor.
+Güncelleme5: record_change'in döndüğü versiyonu invalidate_project_sync'e veriyoruz,bu versiyon diğer replica'lara invalidation mesajı ile birlikte yayınlanıyor.
 """
 
 @router.get("/flags", response_model=list[FeatureFlag])
-def list_flags(session: Session = Depends(get_session)):
-    return session.exec(select(FeatureFlag)).all()
+def list_flags(
+    response: Response,
+    project_id: Optional[int] = None,
+    status: Optional[str] = None,
+    page: Tuple[Optional[int], int] = Depends(_page_params),
+    session: Session = Depends(get_admin_session),
+):
+    query = select(FeatureFlag)
+    if project_id is not None:
+        query = query.where(FeatureFlag.project_id == project_id)
+    if status is not None:
+        query = query.where(FeatureFlag.status == status)
+    return _page(session, query, FeatureFlag, response, *page)
 """
 get/flags
 veritabanındaki tüm featureflag kayıtlarını json olarak listeliyor.
+Güncelleme: project_id ve status filtreleri eklendi,liste sayfalı (cursor,limit).
+"""
+
+@router.get("/flags/{flag_id}", response_model=FeatureFlag)
+def get_flag(flag_id: int, session: Session = Depends(get_admin_session)):
+    f = session.get(FeatureFlag, flag_id)
+    if not f:
+        raise HTTPException(404, "Flag not found")
+    return f
+"""
+get/flags/{flag_id}
+tek bir flag'i id ile döner.UI'daki flag yönetim ekranı önceden bu flag'i bulmak için bütün flag listesini çekiyordu.
 """
 
 class StatusUpdate(BaseModel):
@@ -150,15 +270,18 @@ class FeatureConfigUpdate(BaseModel):
 
 
 @router.patch("/flags/{flag_id}/status", response_model=FeatureFlag)
-def update_flag_status(flag_id: int, body: StatusUpdate, session: Session = Depends(get_session)):
+def update_flag_status(flag_id: int, body: StatusUpdate, response: Response, session: Session = Depends(get_admin_session)):
     if body.status not in {"draft", "active", "published"}:
         raise HTTPException(422, "Invalid status")
     f = session.get(FeatureFlag, flag_id)
     if not f:
         raise HTTPException(404, "Flag not found")
     f.status = body.status
-    session.add(f); session.commit(); session.refresh(f)
-    invalidate_project_sync(f.project_id)
+    session.add(f)
+    version = record_change(session, f.project_id, CHANGE_FLAG, f.key)
+    materialize_snapshots(session, f.project_id)
+    session.commit(); session.refresh(f)
+    _invalidate(response, f.project_id, version)
     return f
 """
 bilgileri girilen satırın status'unu güncellemek için:
@@ -169,7 +292,7 @@ Güncelleme: invalidate_project_sync(f.project_id) satırı ile ilgili yenilenmi
 """
 
 @router.post("/flags/{flag_id}/variants", response_model=FeatureVariant)
-def create_variant(flag_id: int, v: FeatureVariant, session: Session = Depends(get_session)):
+def create_variant(flag_id: int, v: FeatureVariant, response: Response, session: Session = Depends(get_admin_session)):
     f = session.get(FeatureFlag, flag_id)
     if not f:
         raise HTTPException(404, "Flag not found")
@@ -177,8 +300,11 @@ def create_variant(flag_id: int, v: FeatureVariant, session: Session = Depends(g
         raise HTTPException(422, "Variant name is required")
     v.flag_id = flag_id
     try:
-        session.add(v); session.commit(); session.refresh(v)
-        invalidate_project_sync(f.project_id)
+        session.add(v)
+        version = record_change(session, f.project_id, CHANGE_FLAG, f.key)
+        materialize_snapshots(session, f.project_id)
+        session.commit(); session.refresh(v)
+        _invalidate(response, f.project_id, version)
         return v
     except IntegrityError:
         session.rollback()
@@ -193,11 +319,17 @@ Güncelleme2:
 yeni bir f değişkeni oluşturuldu.invalidate_project_sync(f.project_id) satırı ile cache'de ilgili veriler temizlendi.
 """
 @router.get("/flags/{flag_id}/variants", response_model=list[FeatureVariant])
-def list_variants(flag_id: int, session: Session = Depends(get_session)):
-    return session.exec(select(FeatureVariant).where(FeatureVariant.flag_id == flag_id)).all()
+def list_variants(
+    flag_id: int,
+    response: Response,
+    page: Tuple[Optional[int], int] = Depends(_page_params),
+    session: Session = Depends(get_admin_session),
+):
+    return _page(session, select(FeatureVariant).where(FeatureVariant.flag_id == flag_id), FeatureVariant, response, *page)
 """
 get/flags/{flag_id}/variants
 url'deki flag_id'yi alıp featurevariant tablosundaki flag_id ile aynı olan bütün sonuçları getirir.
+Güncelleme: diğer admin listeleri gibi sayfalı (cursor,limit),bkz. _page.
 """
 
 # -------- Rules --------
@@ -244,7 +376,7 @@ türleri bulunmaktadır.
 
 # ------- Rules -------
 @router.post("/flags/{flag_id}/rules", response_model=FeatureRule)
-def create_rule(flag_id: int, r: FeatureRule, session: Session = Depends(get_session)):
+def create_rule(flag_id: int, r: FeatureRule, response: Response, session: Session = Depends(get_admin_session)):
     f = session.get(FeatureFlag, flag_id)
     if not f:
         raise HTTPException(404, "Flag not found")
@@ -259,8 +391,11 @@ def create_rule(flag_id: int, r: FeatureRule, session: Session = Depends(get_ses
     _validate_distribution(r.distribution, allowed)
 
     r.flag_id = flag_id
-    session.add(r); session.commit(); session.refresh(r)
-    invalidate_project_sync(f.project_id)
+    session.add(r)
+    version = record_change(session, f.project_id, CHANGE_FLAG, f.key, r.environment_id)
+    materialize_snapshots(session, f.project_id, r.environment_id)
+    session.commit(); session.refresh(r)
+    _invalidate(response, f.project_id, version)
     return r
 """
 post/flags/{flag_id}/rules
@@ -277,16 +412,26 @@ Güncelleme2: invalidate_project_sync(f.project_id) satırı ile ilgili veriler
 """
 
 @router.get("/flags/{flag_id}/rules", response_model=list[FeatureRule])
-def list_rules(flag_id: int, session: Session = Depends(get_session)):
-    return session.exec(select(FeatureRule).where(FeatureRule.flag_id == flag_id)).all()
+def list_rules(
+    flag_id: int,
+    response: Response,
+    environment_id: Optional[int] = None,
+    page: Tuple[Optional[int], int] = Depends(_page_params),
+    session: Session = Depends(get_admin_session),
+):
+    query = select(FeatureRule).where(FeatureRule.flag_id == flag_id)
+    if environment_id is not None:
+        query = query.where(FeatureRule.environment_id == environment_id)
+    return _page(session, query, FeatureRule, response, *page)
 """
 get/flags/{flag_id}/rules
 url'deki flag_id'ye sahip olan tüm kuralları listeler.
+Güncelleme: diğer admin listeleri gibi sayfalı (cursor,limit),environment_id ile tek bir ortamın kuralları da istenebiliyor.
 """
 
 
 @router.delete("/rules/{rule_id}")
-def delete_rule(rule_id: int, session: Session = Depends(get_session)):
+def delete_rule(rule_id: int, response: Response, session: Session = Depends(get_admin_session)):
     r = session.get(FeatureRule, rule_id)
     if not r:
         raise HTTPException(status_code=404, detail="Rule not found")
@@ -297,14 +442,16 @@ def delete_rule(rule_id: int, session: Session = Depends(get_session)):
 
     project_id = f.project_id
     session.delete(r)
+    version = record_change(session, project_id, CHANGE_FLAG, f.key, r.environment_id)
+    materialize_snapshots(session, project_id, r.environment_id)
     session.commit()
 
-    invalidate_project_sync(project_id)
+    _invalidate(response, project_id, version)
     return {"ok": True}
 
 
 @router.patch("/rules/{rule_id}", response_model=FeatureRule)
-def patch_rule(rule_id: int, payload: dict = Body(...), session: Session = Depends(get_session)):
+def patch_rule(rule_id: int, response: Response, payload: dict = Body(...), session: Session = Depends(get_admin_session)):
     r = session.get(FeatureRule, rule_id)
     if not r:
         raise HTTPException(status_code=404, detail="Rule not found")
@@ -337,15 +484,17 @@ def patch_rule(rule_id: int, payload: dict = Body(...), session: Session = Depen
         r.distribution = dist
 
     session.add(r)
+    version = record_change(session, f.project_id, CHANGE_FLAG, f.key, r.environment_id)
+    materialize_snapshots(session, f.project_id, r.environment_id)
     session.commit()
     session.refresh(r)
 
-    invalidate_project_sync(f.project_id)
+    _invalidate(response, f.project_id, version)
     return r
 
 
 @router.delete("/variants/{variant_id}")
-def delete_variant(variant_id: int, session: Session = Depends(get_session)):
+def delete_variant(variant_id: int, response: Response, session: Session = Depends(get_admin_session)):
     v = session.get(FeatureVariant, variant_id)
     if not v:
         raise HTTPException(status_code=404, detail="Variant not found")
@@ -366,14 +515,16 @@ def delete_variant(variant_id: int, session: Session = Depends(get_session)):
 
     project_id = f.project_id
     session.delete(v)
+    version = record_change(session, project_id, CHANGE_FLAG, f.key)
+    materialize_snapshots(session, project_id)
     session.commit()
 
-    invalidate_project_sync(project_id)
+    _invalidate(response, project_id, version)
     return {"ok": True}
 
 
 @router.post("/configs", response_model=FeatureConfig)
-def create_config(payload: FeatureConfigCreate, session: Session = Depends(get_session)):
+def create_config(payload: FeatureConfigCreate, response: Response, session: Session = Depends(get_admin_session)):
     # 1) Check Project
     if not session.get(Project, payload.project_id):
         raise HTTPException(status_code=404, detail="Project not found")
@@ -407,46 +558,369 @@ def create_config(payload: FeatureConfigCreate, session: Session = Depends(get_s
 
     session.add(cfg)
     try:
+        version = record_change(session, payload.project_id, CHANGE_CONFIG, payload.key, payload.environment_id)
+        materialize_snapshots(session, payload.project_id, payload.environment_id)
         session.commit()
         session.refresh(cfg)
     except IntegrityError:
         session.rollback()
         raise HTTPException(status_code=409, detail="Config key already exists in this scope")
 
-    invalidate_project_sync(payload.project_id)
+    _invalidate(response, payload.project_id, version)
     return cfg
 
 
 @router.get("/configs", response_model=list[FeatureConfig])
-def list_configs(session: Session = Depends(get_session)):
-    return session.exec(select(FeatureConfig)).all()
+def list_configs(
+    response: Response,
+    project_id: Optional[int] = None,
+    environment_id: Optional[int] = None,
+    page: Tuple[Optional[int], int] = Depends(_page_params),
+    session: Session = Depends(get_admin_session),
+):
+    query = select(FeatureConfig)
+    if project_id is not None:
+        query = query.where(FeatureConfig.project_id == project_id)
+    if environment_id is not None:
+        query = query.where(FeatureConfig.environment_id == environment_id)
+    return _page(session, query, FeatureConfig, response, *page)
+"""
+get/configs
+config'leri listeler.project_id ve environment_id ile filtrelenebilir (environment_id verilirse sadece o ortamın override'ları gelir),liste sayfalı (cursor,limit).
+"""
 
 
 @router.patch("/configs/{config_id}", response_model=FeatureConfig)
-def update_config(config_id: int, body: FeatureConfigUpdate, session: Session = Depends(get_session)):
+def update_config(config_id: int, body: FeatureConfigUpdate, response: Response, session: Session = Depends(get_admin_session)):
     cfg = session.get(FeatureConfig, config_id)
     if not cfg:
         raise HTTPException(status_code=404, detail="Config not found")
 
     cfg.value = body.value
     session.add(cfg)
+    version = record_change(session, cfg.project_id, CHANGE_CONFIG, cfg.key, cfg.environment_id)
+    materialize_snapshots(session, cfg.project_id, cfg.environment_id)
     session.commit()
     session.refresh(cfg)
 
-    invalidate_project_sync(cfg.project_id)
+    _invalidate(response, cfg.project_id, version)
     return cfg
 
 
 @router.delete("/configs/{config_id}")
-def delete_config(config_id: int, session: Session = Depends(get_session)):
+def delete_config(config_id: int, response: Response, session: Session = Depends(get_admin_session)):
     cfg = session.get(FeatureConfig, config_id)
     if not cfg:
         raise HTTPException(status_code=404, detail="Config not found")
 
     project_id = cfg.project_id
     session.delete(cfg)
+    version = record_change(session, project_id, CHANGE_CONFIG, cfg.key, cfg.environment_id)
+    materialize_snapshots(session, project_id, cfg.environment_id)
     session.commit()
 
-    invalidate_project_sync(project_id)
+    _invalidate(response, project_id, version)
     return {"ok": True}
 
+
+# ------- Bulk import/export -------
+class BulkVariant(BaseModel):
+    name: str
+    payload: dict = {}
+
+
+class BulkRule(BaseModel):
+    environment: str
+    priority: int = 1
+    predicate: dict
+    distribution: dict
+
+
+class BulkFlag(BaseModel):
+    key: str
+    on: bool = True
+    default_variant: str = "off"
+    status: str = "draft"
+    hash_version: int = 2
+    variants: List[BulkVariant] = []
+    rules: List[BulkRule] = []
+
+
+class BulkConfig(BaseModel):
+    key: str
+    environment: Optional[str] = None
+    value: Any = None
+
+
+class ProjectDocument(BaseModel):
+    flags: List[BulkFlag] = []
+    configs: List[BulkConfig] = []
+"""
+/projects/{project_id}/import endpointinin aldığı,/projects/{project_id}/export endpointinin de döndüğü proje dokümanı.variant ve kurallar flag'in içinde geliyor.
+kurallar ve env'e özel config'ler ortamı id ile değil isim (ör: "prod") ile gösteriyor,böylece bir ortamdan (ör: staging sunucusu) alınan export başka bir ortamdaki aynı isimli projeye olduğu gibi import edilebiliyor.
+"""
+
+
+def _validate_document(doc: ProjectDocument, env_ids: Dict[str, int]):
+    flag_keys = set()
+    for i, f in enumerate(doc.flags):
+        where = f"flags[{i}]"
+        if not f.key or f.key.strip() == "":
+            raise HTTPException(422, f"{where}: flag key is required")
+        if f.key in flag_keys:
+            raise HTTPException(422, f"{where}: duplicate flag key '{f.key}'")
+        flag_keys.add(f.key)
+        if f.status not in {"draft", "active", "published"}:
+            raise HTTPException(422, f"{where}: Invalid status")
+        if f.hash_version not in HASH_BUCKETS:
+            raise HTTPException(422, f"{where}: Invalid hash_version")
+
+        names = set()
+        for j, v in enumerate(f.variants):
+            if not v.name or v.name.strip() == "":
+                raise HTTPException(422, f"{where}.variants[{j}]: Variant name is required")
+            if v.name in names:
+                raise HTTPException(422, f"{where}.variants[{j}]: duplicate variant name '{v.name}'")
+            names.add(v.name)
+
+        allowed = names | {f.default_variant}
+        for j, r in enumerate(f.rules):
+            if r.environment not in env_ids:
+                raise HTTPException(422, f"{where}.rules[{j}]: unknown environment '{r.environment}'")
+            if r.priority < 1:
+                raise HTTPException(422, f"{where}.rules[{j}]: priority must be >= 1")
+            try:
+                _validate_predicate(r.predicate)
+                _validate_distribution(r.distribution, allowed)
+            except HTTPException as e:
+                raise HTTPException(e.status_code, f"{where}.rules[{j}]: {e.detail}")
+
+    scopes = set()
+    for i, c in enumerate(doc.configs):
+        if not c.key or c.key.strip() == "":
+            raise HTTPException(422, f"configs[{i}]: config key is required")
+        if c.environment is not None and c.environment not in env_ids:
+            raise HTTPException(422, f"configs[{i}]: unknown environment '{c.environment}'")
+        if (c.key, c.environment) in scopes:
+            raise HTTPException(422, f"configs[{i}]: duplicate config key '{c.key}' in this scope")
+        scopes.add((c.key, c.environment))
+"""
+import edilecek dokümanı DB'ye hiçbir şey yazmadan önce baştan sona doğrular.kurallar için tekil endpointlerdeki _validate_predicate ve _validate_distribution'ı kullanıyoruz,
+sadece hata mesajının başına hatanın dokümanın neresinde olduğunu (ör: flags[12].rules[0]) ekliyoruz ki binlerce flag'lik bir dokümanda hatalı satır bulunabilsin.
+"""
+
+
+@router.post("/projects/{project_id}/import")
+def import_project(project_id: int, doc: ProjectDocument, response: Response, replace: bool = False, session: Session = Depends(get_admin_session)):
+    if not session.get(Project, project_id):
+        raise HTTPException(404, "Project not found")
+    env_ids = {e.name: int(e.id) for e in session.exec(select(Environment).where(Environment.project_id == project_id)).all()}
+    _validate_document(doc, env_ids)
+
+    changes: List[Tuple[str, str, Optional[int]]] = []
+    project_flag_ids = select(FeatureFlag.id).where(FeatureFlag.project_id == project_id)
+    if replace:
+        # dokümanda olmayan flag/config'ler de silineceği için onları da değişiklik olarak kaydediyoruz (delta'da removed_* olarak gidiyorlar)
+        for key in session.exec(select(FeatureFlag.key).where(FeatureFlag.project_id == project_id)).all():
+            changes.append((CHANGE_FLAG, key, None))
+        for key, environment_id in session.exec(select(FeatureConfig.key, FeatureConfig.environment_id).where(FeatureConfig.project_id == project_id)).all():
+            changes.append((CHANGE_CONFIG, key, environment_id))
+        session.exec(delete(FeatureRule).where(FeatureRule.flag_id.in_(project_flag_ids)))
+        session.exec(delete(FeatureVariant).where(FeatureVariant.flag_id.in_(project_flag_ids)))
+        session.exec(delete(FeatureFlag).where(FeatureFlag.project_id == project_id))
+        session.exec(delete(FeatureConfig).where(FeatureConfig.project_id == project_id))
+    else:
+        existing = set(session.exec(select(FeatureFlag.key).where(FeatureFlag.project_id == project_id)).all())
+        clash = sorted(existing & {f.key for f in doc.flags})
+        if clash:
+            raise HTTPException(409, f"Flag keys already exist in this project: {clash[:20]}")
+        existing_cfg = {
+            (key, environment_id)
+            for key, environment_id in session.exec(select(FeatureConfig.key, FeatureConfig.environment_id).where(FeatureConfig.project_id == project_id)).all()
+        }
+        clash = sorted(c.key for c in doc.configs if (c.key, env_ids.get(c.environment)) in existing_cfg)
+        if clash:
+            raise HTTPException(409, f"Config keys already exist in this scope: {clash[:20]}")
+
+    flag_rows = [
+        {"project_id": project_id, "key": f.key, "on": f.on, "default_variant": f.default_variant, "status": f.status, "hash_version": f.hash_version}
+        for f in doc.flags
+    ]
+    config_rows = [
+        {"project_id": project_id, "environment_id": env_ids.get(c.environment), "key": c.key, "value": c.value}
+        for c in doc.configs
+    ]
+    changes.extend((CHANGE_FLAG, f.key, None) for f in doc.flags)
+    changes.extend((CHANGE_CONFIG, row["key"], row["environment_id"]) for row in config_rows)
+    if not changes:
+        return {"ok": True, "flags": 0, "variants": 0, "rules": 0, "configs": 0}
+
+    variant_rows: List[Dict[str, Any]] = []
+    rule_rows: List[Dict[str, Any]] = []
+    try:
+        if flag_rows:
+            session.exec(insert(FeatureFlag), params=flag_rows)
+            flag_ids = dict(session.exec(select(FeatureFlag.key, FeatureFlag.id).where(FeatureFlag.project_id == project_id)).all())
+            for f in doc.flags:
+                flag_id = flag_ids[f.key]
+                variant_rows.extend({"flag_id": flag_id, "name": v.name, "payload": v.payload} for v in f.variants)
+                rule_rows.extend(
+                    {"flag_id": flag_id, "environment_id": env_ids[r.environment], "priority": r.priority, "predicate": r.predicate, "distribution": r.distribution}
+                    for r in f.rules
+                )
+        if variant_rows:
+            session.exec(insert(FeatureVariant), params=variant_rows)
+        if rule_rows:
+            session.exec(insert(FeatureRule), params=rule_rows)
+        if config_rows:
+            session.exec(insert(FeatureConfig), params=config_rows)
+        version = record_changes(session, project_id, changes)
+        materialize_snapshots(session, project_id)
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(409, "Import conflicts with existing flags or configs")
+
+    _invalidate(response, project_id, version)
+    return {
+        "ok": True,
+        "version": version,
+        "flags": len(flag_rows),
+        "variants": len(variant_rows),
+        "rules": len(rule_rows),
+        "configs": len(config_rows),
+    }
+"""
+post/projects/{project_id}/import
+bir projenin flag'lerini (variant ve kurallarıyla birlikte) ve config'lerini tek istekte yazar.önceden bunun için her flag,variant,kural ve config için ayrı bir istek atılıyordu,
+her istek kendi commit'ini ve kendi cache invalidation'ını yapıyordu,birkaç bin flag taşımak dakikalar sürüyordu.
+-önce bütün doküman doğrulanıyor,hata varsa hiçbir şey yazılmadan 422 dönüyor.
+-replace=false (varsayılan) iken sadece yeni kayıt ekleniyor,projede zaten olan bir flag key'i ya da config scope'u varsa 409 dönüyor.replace=true iken projenin bütün flag,variant,kural ve
+config'leri silinip dokümandakiler yazılıyor,yani proje dokümanla birebir aynı hale geliyor.
+-her tablo tek bir INSERT ile (executemany) yazılıyor.variant ve kurallar için flag id'leri lazım olduğundan flag'leri yazdıktan sonra projenin key -> id eşlemesini tek sorgu ile okuyoruz
+(RETURNING her veritabanında yok).
+-bütün işlem tek transaction,herhangi bir adımda hata olursa hiçbir şey yazılmamış oluyor.değişiklik kayıtları record_changes ile tek versiyonda yazılıyor ve cache bir kez invalidate ediliyor.
+"""
+
+
+EXPORT_BATCH_SIZE = 500
+
+
+def _export_flags(project_id: int, env_names: Dict[int, str], after_id: int) -> Tuple[int, List[bytes]]:
+    with Session(engine) as session:
+        flags = session.exec(
+            select(FeatureFlag)
+            .where(FeatureFlag.project_id == project_id, FeatureFlag.id > after_id)
+            .order_by(FeatureFlag.id)
+            .limit(EXPORT_BATCH_SIZE)
+        ).all()
+        if not flags:
+            return after_id, []
+        flag_ids = [int(f.id) for f in flags]
+        variants = defaultdict(list)
+        for v in session.exec(select(FeatureVariant).where(FeatureVariant.flag_id.in_(flag_ids)).order_by(FeatureVariant.id)).all():
+            variants[v.flag_id].append({"name": v.name, "payload": v.payload or {}})
+        rules = defaultdict(list)
+        for r in session.exec(select(FeatureRule).where(FeatureRule.flag_id.in_(flag_ids)).order_by(FeatureRule.priority, FeatureRule.id)).all():
+            rules[r.flag_id].append({
+                "environment": env_names.get(r.environment_id),
+                "priority": r.priority,
+                "predicate": r.predicate or {},
+                "distribution": r.distribution or {},
+            })
+        return flag_ids[-1], [
+            dumps_bytes({
+                "key": f.key,
+                "on": f.on,
+                "default_variant": f.default_variant,
+                "status": f.status,
+                "hash_version": f.hash_version,
+                "variants": variants[f.id],
+                "rules": rules[f.id],
+            })
+            for f in flags
+        ]
+
+
+def _export_configs(project_id: int, env_names: Dict[int, str], after_id: int) -> Tuple[int, List[bytes]]:
+    with Session(engine) as session:
+        configs = session.exec(
+            select(FeatureConfig)
+            .where(FeatureConfig.project_id == project_id, FeatureConfig.id > after_id)
+            .order_by(FeatureConfig.id)
+            .limit(EXPORT_BATCH_SIZE)
+        ).all()
+        if not configs:
+            return after_id, []
+        return int(configs[-1].id), [
+            dumps_bytes({"key": c.key, "environment": env_names.get(c.environment_id), "value": c.value})
+            for c in configs
+        ]
+
+
+def _export_items(load, project_id: int, env_names: Dict[int, str]) -> Iterator[bytes]:
+    after_id, first = 0, True
+    while True:
+        after_id, items = load(project_id, env_names, after_id)
+        if not items:
+            return
+        yield (b"" if first else b",") + b",".join(items)
+        first = False
+
+
+def _export_document(project: Dict[str, Any], env_names: Dict[int, str]) -> Iterator[bytes]:
+    yield b'{"project":' + dumps_bytes(project) + b',"flags":['
+    yield from _export_items(_export_flags, project["id"], env_names)
+    yield b'],"configs":['
+    yield from _export_items(_export_configs, project["id"], env_names)
+    yield b"]}"
+
+
+@router.get("/projects/{project_id}/export")
+def export_project(project_id: int, session: Session = Depends(get_admin_session)):
+    project = session.get(Project, project_id)
+    if not project:
+        raise HTTPException(404, "Project not found")
+    env_names = {int(e.id): e.name for e in session.exec(select(Environment).where(Environment.project_id == project_id)).all()}
+    header = {"id": project_id, "name": project.name, "version": project.change_version}
+    return StreamingResponse(
+        _export_document(header, env_names),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="project-{project_id}.json"'},
+    )
+"""
+get/projects/{project_id}/export
+projenin bütün flag'lerini (variant ve kurallarıyla) ve config'lerini import endpointinin kabul ettiği formatta döner,yani bu cevap olduğu gibi başka bir projeye import edilebilir.
+-cevabı bellekte tek parça oluşturmak yerine StreamingResponse ile parça parça gönderiyoruz.flag ve config'ler id sırasıyla EXPORT_BATCH_SIZE'lık gruplar halinde (keyset,id > son id) okunuyor,
+her grubun variant ve kuralları da tek sorgu ile geliyor.
+-her grup için kısa ömürlü ayrı bir session açıyoruz,böylece yavaş okuyan bir istemci cevap bitene kadar bağlantı havuzundan bir bağlantıyı tutmuyor.bunun sonucu olarak export tek bir anlık görüntü
+değil,export sırasında yapılan bir admin değişikliği cevabın bir kısmına yansıyabilir.project.version export başladığı andaki versiyondur.
+"""
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    return {
+        "snapshot_l1": snapshot_cache.stats(),
+        "ruleset_l1": ruleset_cache.stats(),
+        "sdk_resolver": resolver_cache.stats(),
+        "invalidation": dict(invalidation_stats),
+        "single_flight": snapshot_flight.stats(),
+        "rebuild": snapshot_rebuilder.stats(),
+        "invalidation_queue": invalidation_queue.stats(),
+        "materialized": {result: int(cache_requests.value("materialized", result)) for result in ("hit", "miss")},
+    }
+"""
+get/cache/stats
+bu worker'ın process içi (L1) snapshot cache'inin boyutunu ve hit/miss sayılarını döner.her uvicorn worker'ının kendi L1 cache'i olduğu için değerler isteği karşılayan worker'a aittir.
+"""
+
+
+@router.get("/db/stats")
+def db_stats():
+    return pool_stats()
+"""
+get/db/stats
+bu worker'ın DB bağlantı havuzunun durumunu (kullanımdaki bağlantılar,overflow) ve bağlantı alma sürelerini (toplam/en uzun bekleme,histogram,timeout sayısı) döner,bkz. core/db.py.
+havuz boyutlarını (DB_POOL_*) deployment'a göre ayarlarken bakılacak yer.
+"""
@@ -0,0 +1,32 @@
+import os
+import time
+from fastapi import APIRouter, Response
+
+from app.core.cache import cache_report_metrics
+from app.core.metrics import collect, render
+from app.core.settings import settings
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    samples = collect()
+    reports = [(samples, True)]
+    if os.getenv("REDIS_ENABLED", "0") == "1":
+        workers = await cache_report_metrics(samples)
+        if workers is None:
+            # sadece bu worker'ın değerlerini dönmek toplamları geri götürür,Prometheus bunu sayaç sıfırlanması sanıyor.başarısız bir okuma olarak bırakıyoruz
+            return Response(content="metrics store unavailable\n", status_code=503, media_type="text/plain; charset=utf-8")
+        # gauge'lar sadece son birkaç rapor aralığında rapor vermiş worker'lardan toplanıyor
+        fresh_after = time.time() - 3 * settings.METRICS_REPORT_SECONDS
+        reports = [(worker_samples, reported_at >= fresh_after) for worker_samples, reported_at in workers]
+    return Response(content=render(reports), media_type="text/plain; version=0.0.4; charset=utf-8")
+"""
+GET /metrics
+Prometheus'un okuyacağı metrikleri text formatında döner (bkz. core/metrics.py).Redis açıksa bütün worker'ların değerleri toplanmış olarak dönüyor (bu worker'ınki güncel,diğerlerininki
+en fazla METRICS_REPORT_SECONDS eski),Redis kapalıysa sadece isteği alan worker'ın değerleri dönüyor.
+Güncelleme: Redis açık ama ulaşılamıyorsa 503 dönüyor.önceden sadece bu worker'ın değerleri dönüyordu,toplamlar geri gittiği için Prometheus rate()/increase()'de sıçrama görüyordu,
+başarısız okuma (scrape) ise sadece bir boşluk olarak görünüyor.
+/healthz gibi admin anahtarı istemiyor,içinde proje/ortam id'si ya da SDK key gibi bilgiler bulunmuyor.
+"""
@@ -1,18 +1,59 @@
-﻿from fastapi import APIRouter, Header, HTTPException, Query, Depends, Body
-from typing import Dict, Any, List
-from collections import defaultdict
+﻿from fastapi import APIRouter, Header, HTTPException, Query, Body, Response, Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, Any, Optional
+import asyncio
+import logging
 from sqlmodel import Session, select
-from app.core.db import get_session
-from app.core.cache import cache_get_json, cache_set_json, flags_cache_key
-from app.models import Environment, SDKKey, FeatureFlag, FeatureVariant, FeatureRule, FeatureConfig
-from app.core.eval import evaluate_one_flag
-from app.schemas import FlagsResponse, EvaluateUserIn, EvaluateResponse
+from app.core.db import run_db
+from app.core.changes import load_changes
+from app.core.cache import cache_get_json_gen, flags_cache_key, flags_etag_cache_key
+from app.core.serialization import ENCODINGS, pick_encoding
+from app.core.snapshots import load_snapshot, snapshot_content
+from app.core.local_cache import snapshot_cache, resolver_cache, ruleset_cache, snapshot_flight
+from app.core.log import log_event
+from app.core.metrics import evaluated_flags
+from app.core.stream import stream_notifier
+from app.core.settings import settings
+from app.models import Environment, SDKKey
+from app.core.eval import CompiledRuleset, compile_ruleset, evaluate_ruleset, run_evaluate_batch
+from app.schemas import FlagsResponse, EvaluateUserIn, EvaluateResponse, EvaluateBatchIn, EvaluateBatchResponse
 
 router = APIRouter()
 
-def _resolve_sdk_and_environment(session: Session, env: str, x_sdk_key: str):
+async def _resolve_sdk_and_environment(env: str, x_sdk_key: str):
     """
     aşağıdaki endpointlerde yaptığımız tekrarlı sdk ve environment doğrulama adımlarını tek bir metot içerisinde topladık.
+    Güncelleme: artık sonuç (project_id, environment_id) olarak dönüyor ve resolver_cache'de tutuluyor,böylece cache'den dönen isteklerde DB'ye hiç gidilmiyor.
+    """
+
+    cache_key = (x_sdk_key, env)
+    cached = resolver_cache.get(cache_key)
+    if cached is not None:
+        if cached[0] == "error":
+            raise HTTPException(status_code=cached[1], detail=cached[2])
+        return cached[1], cached[2]
+
+    try:
+        project_id, environment_id = await run_db(_resolve_sdk_and_environment_db, env=env, x_sdk_key=x_sdk_key)
+    except HTTPException as e:
+        resolver_cache.set(cache_key, ("error", e.status_code, e.detail), ttl_seconds=settings.SDK_KEY_NEGATIVE_TTL_SECONDS)
+        log_event("sdk.resolve_failed", logging.WARNING, env=env, status=e.status_code, detail=e.detail)
+        raise
+
+    resolver_cache.set(cache_key, ("ok", project_id, environment_id))
+    return project_id, environment_id
+"""
+yukarıdaki metot önce resolver_cache'e bakıyor,key + env ikilisi daha önce çözümlendiyse direkt project_id ve environment_id dönüyor.daha önce hata aldıysa (geçersiz key,bilinmeyen ortam gibi)
+aynı hatayı DB'ye gitmeden tekrar fırlatıyor.cache'de yoksa aşağıdaki _resolve_sdk_and_environment_db metotu ile DB'den çözümleyip sonucu cache'e yazıyor.
+DB sorgusu run_db ile thread havuzunda çalıştığı için bu metot async,böylece çözümleme sırasında event loop kilitlenmiyor.
+hatalı sonuçları SDK_KEY_NEGATIVE_TTL_SECONDS gibi kısa bir süre tutuyoruz (DB'den hatalı dönen her çözümleme sdk.resolve_failed olarak loglanıyor,key'in kendisi loglanmıyor),yeni bir key veya env eklendiğinde de admin tarafı invalidate_sdk_resolution_sync() ile bu cache'i temizliyor.
+"""
+
+
+def _resolve_sdk_and_environment_db(session: Session, env: str, x_sdk_key: str):
+    """
+    aşağıdaki endpointlerde yaptığımız tekrarlı sdk ve environment doğrulama adımlarını tek bir metot içerisinde topladık.
+    Güncelleme: bu metot artık yalnızca cache'de sonuç olmadığında _resolve_sdk_and_environment tarafından çağrılıyor.
     """
     
     sdk = session.exec(select(SDKKey).where(SDKKey.key == x_sdk_key)).first()
@@ -45,158 +86,259 @@ def _resolve_sdk_and_environment(session: Session, env: str, x_sdk_key: str):
     yapmıyordum,artık bu doğrulama ile aynı keye sahip olup farklı env'deki bir flag bu endpointleri çalıştıramayacak.
     """
 
-    return sdk, environment
+    return int(sdk.project_id), int(environment.id)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str, accept_encoding: Optional[str]) -> Optional[str]:
+    if not if_none_match:
+        return None
+    for candidate in if_none_match.split(","):
+        # If-None-Match zayıf karşılaştırma kullanır,W/ önekini yok sayıyoruz
+        candidate = candidate.strip().removeprefix("W/")
+        if candidate == "*":
+            return "identity"
+        encoding = "identity"
+        for name in ENCODINGS:
+            # sıkıştırılmış hallerin ETag'i "<etag>-br" gibi,aynı snapshot'a ait oldukları için eşleşmiş sayıyoruz
+            if candidate.endswith(f'-{name}"'):
+                candidate = candidate[: -len(name) - 2] + '"'
+                encoding = name
+        if candidate != etag:
+            continue
+        # istemci elindeki sıkıştırılmış hali artık kabul etmiyorsa (Accept-Encoding değiştiyse) bu ETag'i eşleşmiş saymıyoruz
+        if encoding == "identity" or pick_encoding(accept_encoding, {encoding: b""}) == encoding:
+            return encoding
+    return None
+
+
+def _encoded_etag(etag: str, encoding: str) -> str:
+    return etag if encoding == "identity" else f'{etag[:-1]}-{encoding}"'
+"""
+-_etag_matches istemcinin gönderdiği If-None-Match header'ını bizim ETag'imizle karşılaştırır.header birden fazla ETag içerebilir (virgülle ayrılmış) ya da * olabilir.
+Güncelleme: eşleşen ETag'in hangi hale (identity,gzip,br) ait olduğunu dönüyor (eşleşme yoksa None).304 cevabı istemcinin elindeki halin ETag'ini taşımalı,
+yoksa br gövdesini tutan bir HTTP cache'i 304'teki "<etag>" ile bu gövdeyi identity hali olarak etiketliyor.
+-_encoded_etag: aynı snapshot'ın gzip/br hali farklı byte'lar olduğu için farklı bir ETag ile gönderiliyor ("<etag>-gzip" gibi),böylece araya giren cache'ler iki hali karıştırmıyor.
+"""
+
+
+async def _load_etag(project_id: int, environment_id: int) -> Optional[str]:
+    local = snapshot_cache.get(flags_cache_key(project_id, environment_id))
+    if local is not None:
+        return local.get("etag")
+    _, etag = await cache_get_json_gen(project_id, flags_etag_cache_key(project_id, environment_id))
+    return etag
+"""
+If-None-Match ile gelen isteklerde snapshot'ın kendisini yüklemeden sadece ETag'ini bulur.L1'de snapshot varsa ETag zaten içinde duruyor,yoksa Redis'te snapshot'tan ayrı tuttuğumuz küçük ETag key'ine bakıyoruz,
+böylece 304 dönülecek isteklerde büyük json'u Redis'ten çekip parse etmek gerekmiyor.ETag bulunamazsa None dönüyor ve istek normal yoldan devam ediyor.
+"""
+
+
+
+
+async def _load_ruleset(env: str, project_id: int, environment_id: int) -> CompiledRuleset:
+    cache_key = flags_cache_key(project_id, environment_id)
+    ruleset = ruleset_cache.get(cache_key)
+    if ruleset is not None:
+        return ruleset
+
+    async def compile_snapshot() -> CompiledRuleset:
+        snapshot = snapshot_content(await load_snapshot(env, project_id, environment_id))
+        compiled = compile_ruleset(project_id, snapshot.get("flags") or [])
+        if snapshot_flight.still_current(ruleset_key):
+            ruleset_cache.set(cache_key, compiled)
+        return compiled
+
+    ruleset_key = f"{cache_key}:ruleset"
+    return await snapshot_flight.run(ruleset_key, compile_snapshot)
+"""
+bir (project, environment) snapshot'ının derlenmiş kurallarını döner.derlenmiş hali ruleset_cache'de snapshot ile aynı key altında tutuyoruz ve invalidate_project_sync ikisini birlikte
+temizliyor,yani kurallar her snapshot için yalnızca bir kere derleniyor.
+Güncelleme: derleme işi de snapshot_flight üzerinden yapılıyor,cache boşken aynı anda gelen /evaluate istekleri kuralları tek tek derlemek yerine tek bir derlemenin sonucunu bekliyor.
+"""
+
+
+async def _load_delta(snapshot: Dict[str, Any], project_id: int, environment_id: int, since: int) -> Dict[str, Any]:
+    version = int(snapshot.get("version", 0))
+    if since > version:
+        return snapshot
+
+    cache_key = f"{flags_cache_key(project_id, environment_id)}:delta:{since}:{version}"
+    delta = snapshot_cache.get(cache_key)
+    if delta is not None:
+        return delta
+
+    if since == version:
+        flag_keys, config_keys = set(), set()
+    else:
+        changes = await run_db(load_changes, project_id, environment_id, since, version)
+        if changes is None:
+            return snapshot
+        flag_keys, config_keys = changes
+
+    snapshot_content(snapshot)
+    flags_by_key = {f["key"]: f for f in snapshot.get("flags") or []}
+    configs = snapshot.get("configs") or {}
+    delta = {
+        "env": snapshot["env"],
+        "project_id": project_id,
+        "version": version,
+        "full": False,
+        "configs": {k: configs[k] for k in sorted(config_keys) if k in configs},
+        "flags": [flags_by_key[k] for k in sorted(flag_keys) if k in flags_by_key],
+        "removed_flags": sorted(k for k in flag_keys if k not in flags_by_key),
+        "removed_configs": sorted(k for k in config_keys if k not in configs),
+    }
+    snapshot_cache.set(cache_key, delta)
+    return delta
+"""
+-istemcinin since ile gönderdiği versiyondan snapshot'ın versiyonuna kadar değişen flag ve config'leri döner.değişen keyleri change log'dan (core/changes.py) alıyoruz,içerikleri ise
+zaten cache'de duran snapshot'tan alıyoruz,yani delta için flag/variant/kural tablolarına hiç gitmiyoruz.snapshot'ta artık bulunmayan keyler (silinen config,draft'a çekilen flag gibi) removed_* listelerine giriyor.
+-since snapshot'ın versiyonuna eşitse istemci günceldir ve DB'ye gitmeden boş delta dönüyoruz,SDK'ların büyük çoğunluğu bu durumda olacak.
+-istemci change log'un tuttuğundan daha geride kaldıysa ya da since snapshot'tan büyükse (ör: DB sıfırlandıysa) tam snapshot dönüyoruz.
+-oluşturulan delta aynı versiyondan gelen diğer istemciler için L1 cache'de tutuluyor.key'i flags_cache_key ile başladığı için invalidate_project_sync snapshot ile birlikte bunları da siliyor.
+"""
+
 
 @router.get("/flags", response_model=FlagsResponse)
 async def get_flags(
+    response: Response,
     env: str = Query(..., description="Hedef ortam (örn: prod, dev, staging)"),
     x_sdk_key: str = Header(alias="X-SDK-Key"),
-    session: Session = Depends(get_session),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    accept_encoding: Optional[str] = Header(None, alias="Accept-Encoding"),
+    since: Optional[int] = Query(None, ge=0, description="SDK'nın elindeki son versiyon,verilirse sadece değişenler döner"),
 ):
     """
     GET /sdk/v1/flags    
     yukarıdaki kod yapısında diyoruz ki env ile query string'ten gelen bilgiyi al(env=prod gibi)
     x_sdk_key ile de header'den gelen veriyi al(ör: X-SDK-Key: demo)
     session: get_session sayesinde bize verilen veritabanı oturumunu alıyoruz.
+    Güncelleme: endpoint artık session almıyor,DB'ye gitmesi gereken işler (sdk key çözümleme,snapshot oluşturma) kendi session'ları ile run_db üzerinden thread havuzunda çalışıyor.
+    böylece bir istek DB'yi beklerken aynı worker'daki cache'den dönen istekler beklemeden cevaplanıyor.
+    Güncelleme2: cevapla birlikte snapshot'ın ETag'i de dönüyor.SDK bir sonraki isteğinde bu değeri If-None-Match header'ı ile gönderirse ve snapshot değişmediyse gövdesiz 304 Not Modified dönüyoruz,
+    bu durumda snapshot ne yükleniyor ne de json'a çevriliyor.
+    Güncelleme3: since parametresi eklendi (delta sync).SDK en son aldığı cevaptaki version değerini since olarak gönderirse sadece o versiyondan sonra değişen flag ve config'ler dönüyor (full=False).
+    since verilmezse ya da SDK çok geride kaldıysa eskisi gibi tam snapshot dönüyor (full=True).
+    Güncelleme4: tam snapshot dönen isteklerde snapshot'ın hazır gövdesi (body) direkt Response olarak dönüyor.önceden her istekte dict FlagsResponse ile tekrar doğrulanıp json'a çevriliyordu,
+    artık bu iş snapshot oluşturulurken bir kere yapılıyor.delta cevapları küçük olduğu için eskisi gibi response_model üzerinden dönüyor.
+    Güncelleme5: snapshot'ın gzip/br halleri de oluşturulurken bir kere üretiliyor,istemcinin Accept-Encoding header'ına göre uygun olan hal Content-Encoding ile direkt gönderiliyor.
     """
 
-    sdk, environment = _resolve_sdk_and_environment(session=session, env=env, x_sdk_key=x_sdk_key)
-
-        # ✅ Remote Config: global + env override configs topla
-    cfg_rows = session.exec(
-        select(FeatureConfig).where(
-            FeatureConfig.project_id == sdk.project_id,
-            (FeatureConfig.environment_id == None) | (FeatureConfig.environment_id == environment.id),
-        )
-    ).all()
-
-    configs: Dict[str, Any] = {}
-
-    # 1) önce global (environment_id=None)
-    for c in cfg_rows:
-        if c.environment_id is None:
-            configs[c.key] = c.value
-
-    # 2) sonra env override (aynı key varsa üzerine yazar)
-    for c in cfg_rows:
-        if c.environment_id == environment.id:
-            configs[c.key] = c.value
-
-
-    cache_key = flags_cache_key(sdk.project_id, environment.id)
-    cached = await cache_get_json(cache_key)
-    if cached:
-        print(f"[CACHE HIT] {cache_key}")
-        return cached
-
-    print(f"[CACHE MISS] {cache_key}")
-
-    """
-    yukarıda eklediğim Redis cache sayesinde önceden çektiğim bilgileri tekrardan kullancaksam db'ye gitmeme gerek kalmadan bellek üzerinden çekmemi sağlayacak.Bu da perfonmans kazandırır.
-    kod satırını yorumlarsak,ilk satırdaki cache_key daha önceden çekip cache'ye eklediğim verinin bir anahtarının olmasını sağlar.Bu sayede istenilen bilgiler uyuşursa bu bilgiye erişilir.
-    bu cache_key'in eşitliğini yorumlarsak: ff:flags bu bilginin bir feature flags flags'i cevabı olduğunu belirtir,yani prefix bir ifadedir,geri kalan bilgiler ise proje id'si ve env id'sidir.
-    diğer satırdaki cached_get_json() ise parametre olarak cache_key'in bilgisini cache'den çekip cached'a atmaktadır.Cevaba göre işlem yapılacağı için await olarak tanımlama yaptık.
-    3. satırda ise eğer ki bu cached dolu ise bilgiyi döndür diyoruz.
-    Güncelleme:cache_keylerin cache.py dosyasından oluşturulup alınması sağlandı,böylece cache'leri yanlış yazma derdi ortadan kalktı.  
-    """
-
-        # ✅ Remote Config: (global + env override) configs topla
-    cfg_rows = session.exec(
-        select(FeatureConfig).where(
-            FeatureConfig.project_id == sdk.project_id,
-            (FeatureConfig.environment_id == None) | (FeatureConfig.environment_id == environment.id),
-        )
-    ).all()
-
-    configs: Dict[str, Any] = {}
-
-    # 1) önce global (environment_id=None)
-    for c in cfg_rows:
-        if c.environment_id is None:
-            configs[c.key] = c.value
-
-    # 2) sonra env override (aynı key varsa üzerine yazar)
-    for c in cfg_rows:
-        if c.environment_id == environment.id:
-            configs[c.key] = c.value
-
-
-    #Bu projenin flag'lerini getir
-    flags = session.exec(
-        select(FeatureFlag).where(
-            FeatureFlag.project_id == sdk.project_id,
-            FeatureFlag.status.in_(["active", "published"]),
-        )
-    ).all()
-    if not flags:
-        resp = {"env": env, "project_id": sdk.project_id,"configs": configs, "flags": []}
-        await cache_set_json(cache_key, resp, ttl_seconds=120)  # ✅ B6: Cache SET
-        return resp
-    
-    flag_ids = [int(f.id) for f in flags if f.id is not None]
-    """
-    yukarıda değerini aldığımız sdk'nin id'sine sahip olan tüm flag yapıların getiriyoruz.
-    Güncelleme:
-    -ek olarak sorguya status yapısı eklendi.böylece artık draft gibi flagler sdk'ya yönlendirilmeyecek.
-    Güncelleme2:
-    -eğer ki herhangi bir flag yapısı yok ise geriye flag'i boş bir yapı olarak dönderip flag yapısının olmadığını gösteriyorum.
-    -flag_ids kısmında bütün flagleri id'leri topluyoruz.
-    -Güncelleme: sdk üzerinden veri çekileceği zaman flag türü "active" ve "published" olanların verilerinin çekilmesine izin verildi.  
-    -Güncelleme2: if not flags bloğunun içi değiştirildi,artık flag değeri olmadığı zaman bu bilginin kendiside cache'ye yazıldı.
-    """
-
-    variants = session.exec(
-        select(FeatureVariant).where(FeatureVariant.flag_id.in_(flag_ids))
-    ).all()
-    """
-    burda önceki kod yapısında her bir sorgu için gidip database'i komple dolaşıp n+n+1 sorunu ile karşılaşma sorununu çözüyoruz,önce bu flag_ids'de tutulan tüm id'leri alıyoruz,sonrasında ise bu bilgiler ile bütün featureVariant'ları çekiyoruz.
-    """
-    variants_by_flag: Dict[int, Dict[str, Dict[str, Any]]] = defaultdict(dict)
-    for v in variants:
-        variants_by_flag[int(v.flag_id)][v.name] = v.payload or {}
+    project_id, environment_id = await _resolve_sdk_and_environment(env=env, x_sdk_key=x_sdk_key)
+
+    if if_none_match:
+        etag = await _load_etag(project_id, environment_id)
+        matched = _etag_matches(if_none_match, etag, accept_encoding) if etag else None
+        if matched is not None:
+            return Response(status_code=304, headers={"ETag": _encoded_etag(etag, matched), "Vary": "Accept-Encoding"})
+
+    snapshot = await load_snapshot(env, project_id, environment_id)
+    if since is not None:
+        payload = await _load_delta(snapshot, project_id, environment_id, since)
+        if payload is not snapshot:
+            response.headers["ETag"] = snapshot["etag"]
+            return payload
+
+    encoded = snapshot.get("encoded") or {}
+    encoding = pick_encoding(accept_encoding, encoded)
+    headers = {"ETag": _encoded_etag(snapshot["etag"], encoding), "Vary": "Accept-Encoding"}
+    if encoding == "identity":
+        return Response(content=snapshot["body"], media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=encoded[encoding], media_type="application/json", headers=headers)
+
+def _sse_event(event: str, cache_key: str, version: int, payload: Dict[str, Any]) -> str:
+    encoded = snapshot_cache.get(cache_key)
+    if encoded is None:
+        body = payload.get("body")
+        data = body.decode("utf-8") if body is not None else FlagsResponse.model_validate(payload).model_dump_json()
+        encoded = f"id: {version}\nevent: {event}\ndata: {data}\n\n"
+        snapshot_cache.set(cache_key, encoded)
+    return encoded
+"""
+SSE formatında bir olay (event) metni oluşturur.id alanına snapshot'ın versiyonunu yazıyoruz,tarayıcılar ve SSE istemcileri bağlantı koptuğunda bu değeri Last-Event-ID header'ı ile geri gönderiyor.
+aynı projeyi dinleyen bütün bağlantılara aynı metin gideceği için json'a çevirme işini bir kere yapıp L1'de tutuyoruz,tam snapshot olaylarında snapshot'ın hazır gövdesini kullanıyoruz.cache_key flags_cache_key ile başladığı için invalidate_project_sync bunları da temizliyor.
+"""
+
+
+async def _stream_events(
+    request: Request,
+    env: str,
+    project_id: int,
+    environment_id: int,
+    since: Optional[int],
+) -> AsyncIterator[str]:
+    base_key = flags_cache_key(project_id, environment_id)
+    stream_notifier.subscribe(project_id)
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+        while True:
+            changed = stream_notifier.current(project_id)
+            snapshot = await load_snapshot(env, project_id, environment_id)
+            version = int(snapshot.get("version", 0))
+
+            if since is None:
+                yield _sse_event("snapshot", f"{base_key}:sse:{version}", version, snapshot)
+            elif since != version:
+                payload = await _load_delta(snapshot, project_id, environment_id, since)
+                if payload.get("full", True):
+                    yield _sse_event("snapshot", f"{base_key}:sse:{version}", version, payload)
+                else:
+                    yield _sse_event("delta", f"{base_key}:sse:{since}:{version}", version, payload)
+            since = version
+
+            while not changed.is_set():
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": ping\n\n"
+    finally:
+        stream_notifier.unsubscribe(project_id)
+"""
+-bir SSE bağlantısının gönderdiği olayları üreten async generator.bağlantı açılınca önce retry satırını (koparsa kaç ms sonra tekrar bağlanılacağı),sonra tam snapshot'ı "snapshot" olayı olarak gönderiyoruz.
+-istemci Last-Event-ID ile bağlandıysa tam snapshot yerine o versiyondan sonraki değişiklikleri "delta" olayı olarak gönderiyoruz (delta sync ile aynı mantık),istemci çok geride kaldıysa yine "snapshot" gidiyor.
+-sonra projede bir değişiklik olana kadar bekliyoruz.bu sürede SSE_HEARTBEAT_SECONDS'ta bir ": ping" yorum satırı gönderiyoruz ki araya giren proxy'ler boşta duran bağlantıyı kapatmasın,
+bu sırada istemcinin bağlantıyı kapatıp kapatmadığını da kontrol ediyoruz.
+-değişiklik olduğunda snapshot'ı tekrar yükleyip son gönderdiğimiz versiyondan sonraki değişiklikleri gönderiyoruz.versiyon değişmediyse (ör: yeni bir env eklendiyse) hiçbir şey göndermiyoruz.
+"""
+
+
+@router.get("/stream")
+async def stream_flags(
+    request: Request,
+    env: str = Query(..., description="Hedef ortam (örn: prod, dev, staging)"),
+    x_sdk_key: str = Header(alias="X-SDK-Key"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
     """
-    yukarıdkai kod satırları flag_id --> variant_name --> payload şeklinde 3 katmanlı bir sözlük oluşturup tüm varyantları tek seferde gruplayıp,her flag için hızlıca variants alanını doldurabilmemizi sağlar.
+    GET /sdk/v1/stream
+    /sdk/v1/flags'i sürekli sorgulamak (polling) yerine SDK'lar bu endpointe bir kere bağlanıp açık tutuyor,değişiklikler olduğu anda Server-Sent Events olarak bağlantıya yazılıyor.
+    sdk key ve ortam doğrulaması /flags ile aynı,hatalı key'de bağlantı açılmadan 401/404 dönüyor.
     """
 
-    rules = session.exec(
-        select(FeatureRule)
-        .where(
-            FeatureRule.flag_id.in_(flag_ids),
-            FeatureRule.environment_id == environment.id,
-        )
-        .order_by(FeatureRule.priority)
-    ).all()
-
-    rules_by_flag: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
-    for r in rules:
-        rules_by_flag[int(r.flag_id)].append({
-            "priority": r.priority,
-            "predicate": r.predicate or {},
-            "distribution": r.distribution or {},
-        })
-    
-    out_flags: List[Dict[str, Any]] = []
-    for f in flags:
-        out_flags.append({
-            "key": f.key,
-            "on": f.on,
-            "default_variant": f.default_variant,
-            "variants": variants_by_flag.get(int(f.id), {}),
-            "rules": rules_by_flag.get(int(f.id), []),
-        })
+    project_id, environment_id = await _resolve_sdk_and_environment(env=env, x_sdk_key=x_sdk_key)
 
+    since: Optional[int] = None
+    if last_event_id:
+        try:
+            since = max(0, int(last_event_id))
+        except ValueError:
+            since = None
 
-    resp = {"env": env, "project_id": sdk.project_id, "configs": configs, "flags": out_flags}
+    return StreamingResponse(
+        _stream_events(request, env, project_id, environment_id, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    await cache_set_json(cache_key, resp, ttl_seconds=120)
-    return resp
 
 @router.post("/evaluate", response_model=EvaluateResponse)
 async def evaluate_flags(
     env: str = Query(..., description="Hedef ortam (örn: prod, dev, staging)"),
     x_sdk_key: str = Header(alias="X-SDK-Key"),
     user_in: EvaluateUserIn = Body(...),
-    session: Session = Depends(get_session),
 ):
     """
     main kısmında topladığımız endpointler admin endpointleridir,yani bilgi ekleme değiştirme gibi özellikleri bulunmaktadır,client(yani mobil,swagger) istemcilerden gelen get isteklerini ise ayrı bir sayfada toplamak istedik,
@@ -221,79 +363,48 @@ async def evaluate_flags(
     session ile de Db bağlantısı kurabilmek için FastAPI'nin bize verdiği bağlantı havuzundan bir tane db bağlantısını alıyoruz.
     Güncelleme:önceden kullanıcıdan aldığımız verileri dict ifadesi ile alıyorduk ama artık EvaluateUserIn class'ını kullanarak model şeklinde alıyoruz,ayriyeten artık embed'in true olmasına gerek kalmadı çünkü bu modelimizin kendisi
     user tagını verilerimizin önüne ekliyor,biz ekstra embed=true yaparsak içiçe iki tane user görüneceğinden çirkin bir görüntü ortaya çıkar.  
+    Güncelleme2: bu endpoint de artık session almıyor,/flags'te olduğu gibi DB işleri run_db ile thread havuzunda çalışıyor.
     """
 
-    sdk, environment = _resolve_sdk_and_environment(session=session, env=env, x_sdk_key=x_sdk_key)
+    project_id, environment_id = await _resolve_sdk_and_environment(env=env, x_sdk_key=x_sdk_key)
     
-    flags = session.exec(
-        select(FeatureFlag).where(
-            FeatureFlag.project_id == sdk.project_id,
-            FeatureFlag.status.in_(["active", "published"]),
-        )
-    ).all()
-    if not flags:
-        return {"env": env, "project_id": sdk.project_id, "variants": {}}
-
-    flag_ids = [int(f.id) for f in flags if f.id is not None]
+    ruleset = await _load_ruleset(env, project_id, environment_id)
+    decided = evaluate_ruleset(ruleset, user_in.user)
+    evaluated_flags.observe(len(decided), "evaluate")
     """
-    burda flags içerisindeki verilerin id'sini toplayıp flag_ids adlı listeye atıyoruzki sürekli db'ye gitmeyelim.
-    güncelleme:status şartı eklendi.
+    her flag için bir variant seçip decided adlı sözlükte {flag_key: variant} şeklinde tutuyoruz.
+    Güncelleme:önceden bu endpoint her istekte flag,variant ve rule tablolarına ayrı ayrı sorgu atıp kural dict'lerini her kullanıcı için baştan yorumluyordu.artık /flags ile aynı
+    snapshot'ı kullanıyoruz (L1 -> Redis -> DB) ve bu snapshot'ın derlenmiş halini (CompiledRuleset) ruleset_cache'den alıyoruz.kapalı flagler derleme sırasında sabit olarak default_variant'a
+    bağlandığı için ayrıca kontrol etmemize gerek kalmadı.
     """
 
-    variants = session.exec(
-        select(FeatureVariant).where(FeatureVariant.flag_id.in_(flag_ids))
-    ).all()
-    variants_by_flag: Dict[int, Dict[str, Dict[str, Any]]] = defaultdict(dict)
-    for v in variants:
-        variants_by_flag[int(v.flag_id)][v.name] = v.payload or {}
-    """
-    bu kod yapısı yukarıda oluşturduğumuz flag_ids liste yapısının içerisindeki tüm flag_id'lerin FeatueVariant adlı tablodan bilgilerini getirir.
-    sonrasında bu bilgileri bir dict'te tutalım diyoruz,bu tuttuğumuz dict ifadesinin ilk parametresi flag_id,ikinci içerdeki dict'in ilk parametresi variant ismini,içerdeki dict'in ilk parametresi ise payload'u tutsun dedik.eğer ki
-    ardından bu variants bilgilerini dolaşarak variants_by_flag adlı sözlüğüme bu bilgileri yolluyorum.ör: flag_id=10, name="dark", payload={"btnColor":"green","font":"large"} diye bir tane db'den bilgi aldık diyelim,buna göre bu sözlük
-    variants_by_flag(10)["dark"]="btnColor":"green","font":"large"} şeklinde bilgileri almış oluyor.
-    """
+    return {"env": env, "project_id": project_id, "variants": decided}
+    #en sonda da bu bilgileri toplu olarak geri dönderiyoruz.
 
-    rules = session.exec(
-        select(FeatureRule)
-        .where(
-            FeatureRule.flag_id.in_(flag_ids),
-            FeatureRule.environment_id == environment.id,
-        )
-        .order_by(FeatureRule.priority)
-    ).all()
-    rules_by_flag: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
-    for r in rules:
-        rules_by_flag[int(r.flag_id)].append({
-            "priority": r.priority,
-            "predicate": r.predicate or {},
-            "distribution": r.distribution or {},
-        })
 
+@router.post("/evaluate/batch", response_model=EvaluateBatchResponse)
+async def evaluate_flags_batch(
+    env: str = Query(..., description="Hedef ortam (örn: prod, dev, staging)"),
+    x_sdk_key: str = Header(alias="X-SDK-Key"),
+    batch_in: EvaluateBatchIn = Body(...),
+):
     """
-    yukarıdaki ifade her bir flag_id için ve environment_id için kurallar ekliyor.bu kuralları rules_by_flag dict'inde toplayalım dedik ve rules içersiindeki bilgileri tek tek bu dict'e ekledik.
+    POST /sdk/v1/evaluate/batch
+    bildirim gönderimi,e-posta kampanyası gibi binlerce kullanıcı için flag değerlendirmesi yapan backend servislerimiz her kullanıcı için ayrı ayrı /evaluate çağırmak yerine
+    bu endpointi kullanır.body'de users listesi (her biri /evaluate'teki user gibi) ve opsiyonel olarak flag_keys listesi alıyoruz.
+    sdk key çözümlemesi ve kuralların derlenmesi istek başına bir kere yapılıyor,sonra aynı derlenmiş ruleset bütün kullanıcılar için kullanılıyor.
+    results listesi users listesi ile aynı sırada döner.kullanıcı sayısını EVALUATE_BATCH_MAX_USERS ile sınırlıyoruz.
+    Güncelleme: değerlendirme run_evaluate_batch ile event loop dışında ayrı bir thread havuzunda yapılıyor,batch sürerken aynı worker diğer istekleri ve SSE heartbeat'lerini işlemeye devam ediyor.
+    sınır loop'u korumak için değil,tek bir isteğin harcayabileceği CPU süresini ve yanıt boyutunu sınırlamak için: 2000 kullanıcı x 50 flag hash_version=1'de ~0.2 sn,hash_version=2'de ~0.1 sn sürüyor.
     """
 
-    # 4) Her flag için tek bir varyant seç
-    decided: Dict[str, str] = {}
-    for f in flags:
-        if not f.on:
-            decided[f.key] = f.default_variant
-            continue
-        chosen = evaluate_one_flag(
-            project_id=sdk.project_id,
-            flag_key=f.key,
-            default_variant=f.default_variant,
-            rules=rules_by_flag.get(int(f.id), []),
-            user=user_in.user,
-        )
-        decided[f.key] = chosen
-    """
-    yukarıdaki kod yapısı her flag için bir variant oluşturmamızı sağlıyor.bu variant'ları decided adlı bir sözlükte key,variant şeklinde bir key value ilişkisine göre tutacağız.
-    ikinci satırda ise yukarıda aldığımız flags değerlerini tek tek dolaşıyoruz ve eval.py dosyasındaki evaluate_one_flag metotu ile flag değerine bir tane variant atıyoruz,sonrasında da bu variant'ı flag'in keyi ile birleştiriyoruz
-    ve decided adlı sözlüğe yolluyoruz.
-    Güncelleme:artık user ifadesini bir dict olarak değil de model olarak tuttuğumuz için model'ın adresini veriyorum.  
-    Güncelleme2:eğer ki flag aktif değilse varsayılan varyantı ver ve de döngüden çık diyoruz.    
-    """
+    if len(batch_in.users) > settings.EVALUATE_BATCH_MAX_USERS:
+        raise HTTPException(status_code=422, detail=f"users must contain at most {settings.EVALUATE_BATCH_MAX_USERS} items")
+
+    project_id, environment_id = await _resolve_sdk_and_environment(env=env, x_sdk_key=x_sdk_key)
+
+    ruleset = await _load_ruleset(env, project_id, environment_id)
+    results = await run_evaluate_batch(ruleset, batch_in.users, batch_in.flag_keys)
+    evaluated_flags.observe(sum(len(result) for result in results), "batch")
 
-    return {"env": env, "project_id": sdk.project_id, "variants": decided}
-    #en sonda da bu bilgileri toplu olarak geri dönderiyoruz.
\ No newline at end of file
+    return {"env": env, "project_id": project_id, "results": results}
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 """
 bu dosya yapım istemcinin API'ye hangi formatta veri göndereceğini,API'nin istemciye hangi formatta veri göndereceği gibi bilgileri taşımaktadır.
@@ -23,15 +23,21 @@ class FeatureFlagOut(BaseModel):
     key: str
     on: bool
     default_variant: str
+    hash_version: int = 1
     variants: Dict[str, Dict[str, Any]]
     rules: List[FeatureRuleOut]
 
 class FlagsResponse(BaseModel):
     env: str
     project_id: int
+    version: int = 0
+    full: bool = True
     configs: Dict[str, Any] = Field(default_factory=dict)
     flags: List[FeatureFlagOut]
+    removed_flags: List[str] = Field(default_factory=list)
+    removed_configs: List[str] = Field(default_factory=list)
 #FeatureFlagOut class'ı /sdk/v1/flags endpointinin içindeki Flags nesnesini düzenlerken,FlagsResponse class'ı ise komple /sdk/v1/flags endpointini düzenler.
+#Güncelleme: delta sync alanları eklendi.version snapshot'ın proje versiyonudur,full=False ise cevap sadece since'ten sonra değişen flag/config'leri içerir,silinenler removed_* listelerinde gelir.
 
 class EvaluateUserIn(BaseModel):
     user: Dict[str, Any]
@@ -42,3 +48,14 @@ class EvaluateResponse(BaseModel):
     project_id: int
     variants: Dict[str, str]
 #bu class ise POST /sdk/v1/evaluate endpointinin döndüğü veriyi düzenler.
+
+class EvaluateBatchIn(BaseModel):
+    users: List[Dict[str, Any]]
+    flag_keys: Optional[List[str]] = None
+#bu class POST /sdk/v1/evaluate/batch endpointinin request body'sini düzenler.users listesindeki her eleman /evaluate'teki user ile aynı formattadır,flag_keys verilirse sadece bu flagler değerlendirilir.
+
+class EvaluateBatchResponse(BaseModel):
+    env: str
+    project_id: int
+    results: List[Dict[str, str]]
+#bu class POST /sdk/v1/evaluate/batch endpointinin döndüğü veriyi düzenler.results listesi users listesi ile aynı sıradadır,her eleman o kullanıcının {flag_key: variant} sözlüğüdür.
@@ -21,7 +21,7 @@ function escapeHtml(str) {
     .replaceAll("'", "&#039;");
 }
 
-async function apiFetch(path, { method = "GET", body, headers = {} } = {}) {
+async function apiRequest(path, { method = "GET", body, headers = {} } = {}) {
   const opts = { method, headers: { ...headers } };
 
   // ✅ Admin key (localStorage’dan)
@@ -43,9 +43,81 @@ async function apiFetch(path, { method = "GET", body, headers = {} } = {}) {
     const detail = (data && data.detail) ? data.detail : data;
     throw new Error(`${res.status} ${res.statusText} — ${typeof detail === "string" ? detail : JSON.stringify(detail)}`);
   }
+  return { data, res };
+}
+
+async function apiFetch(path, opts) {
+  const { data } = await apiRequest(path, opts);
   return data;
 }
 
+// Liste endpointleri sayfalı: bir sonraki sayfanın cursor'u X-Next-Cursor header'ında geliyor (yoksa son sayfa)
+function withQuery(path, params = {}) {
+  const q = new URLSearchParams();
+  for (const [k, v] of Object.entries(params)) {
+    if (v !== undefined && v !== null && v !== "") q.set(k, v);
+  }
+  const qs = q.toString();
+  return qs ? `${path}?${qs}` : path;
+}
+
+async function apiFetchPage(path, params = {}) {
+  const { data, res } = await apiRequest(withQuery(path, params));
+  return { items: data || [], next: res.headers.get("X-Next-Cursor") };
+}
+
+// dropdown'lar gibi listenin tamamı gereken yerler için bütün sayfaları sırayla çeker (filtreli kullanın)
+async function apiFetchAll(path, params = {}) {
+  let items = [];
+  let cursor;
+  do {
+    const page = await apiFetchPage(path, { ...params, cursor, limit: 1000 });
+    items = items.concat(page.items);
+    cursor = page.next;
+  } while (cursor);
+  return items;
+}
+
+// proje dropdown'ları: bütün projeleri çekmek yerine ilk sayfayı gösterip üstüne eklenen arama kutusu ile isme göre filtreliyoruz (çok projeli kurulumlarda liste binlerce satır olabiliyor)
+const PROJECT_OPTIONS_LIMIT = 100;
+
+async function loadProjectOptions($select) {
+  let $search = $select.previousElementSibling;
+  if (!$search || !$search.dataset.projectSearch) {
+    $search = document.createElement("input");
+    $search.className = "form-control form-control-sm mb-1";
+    $search.placeholder = "Search projects by name";
+    $search.dataset.projectSearch = "1";
+    $select.before($search);
+    let timer;
+    $search.oninput = () => {
+      clearTimeout(timer);
+      timer = setTimeout(async () => {
+        try {
+          await loadProjectOptions($select);
+          $select.dispatchEvent(new Event("change"));
+        } catch (e) {
+          showAlert(e.message, "danger");
+        }
+      }, 250);
+    };
+  }
+
+  const name = $search.value.trim();
+  const page = await apiFetchPage("/admin/v1/projects", { name, limit: PROJECT_OPTIONS_LIMIT });
+  if (page.items.length === 0) {
+    $select.innerHTML = `<option value="">${name ? "(no matching projects)" : "(no projects)"}</option>`;
+    return;
+  }
+  $select.innerHTML = page.items
+    .map(p => `<option value="${p.id}">${escapeHtml(p.name)} (#${p.id})</option>`)
+    .join("") + (page.next ? `<option value="" disabled>(more projects, search by name)</option>` : "");
+}
+
+function loadMoreButton(id, next) {
+  return next ? `<div class="d-grid"><button id="${id}" class="btn btn-sm btn-outline-secondary">Load more</button></div>` : "";
+}
+
 // ---------- Views ----------
 async function renderProjects() {
   $alerts.innerHTML = "";
@@ -83,9 +155,14 @@ async function renderProjects() {
   `;
 
 
-  async function load() {
-    const list = await apiFetch("/admin/v1/projects");
-    const rows = (list || []).map(p => `
+  let list = [];
+  let nextCursor = null;
+
+  async function load(more = false) {
+    const page = await apiFetchPage("/admin/v1/projects", { cursor: more ? nextCursor : undefined });
+    list = more ? list.concat(page.items) : page.items;
+    nextCursor = page.next;
+    const rows = list.map(p => `
       <tr>
         <td>${p.id ?? ""}</td>
         <td>${escapeHtml(p.name ?? "")}</td>
@@ -97,7 +174,10 @@ async function renderProjects() {
         <thead><tr><th style="width:120px">ID</th><th>Name</th></tr></thead>
         <tbody>${rows || `<tr><td colspan="2" class="text-muted">No projects</td></tr>`}</tbody>
       </table>
+      ${loadMoreButton("projectsMore", nextCursor)}
     `;
+    const $more = document.getElementById("projectsMore");
+    if ($more) $more.onclick = () => load(true).catch(e => showAlert(e.message));
   }
 
   document.getElementById("refreshProjects").onclick = () => load().catch(e => showAlert(e.message));
@@ -162,14 +242,7 @@ async function renderEnvs() {
   const $project = document.getElementById("envProjectSelect");
 
   async function loadProjects() {
-    const projects = await apiFetch("/admin/v1/projects");
-    if (!projects || projects.length === 0) {
-      $project.innerHTML = `<option value="">(no projects)</option>`;
-      return;
-    }
-    $project.innerHTML = projects
-      .map(p => `<option value="${p.id}">${escapeHtml(p.name)} (#${p.id})</option>`)
-      .join("");
+    await loadProjectOptions($project);
   }
 
   async function loadEnvs() {
@@ -180,9 +253,7 @@ async function renderEnvs() {
       return;
     }
 
-    // Backend: GET /envs tüm env'leri döndürüyor → burada filtreliyoruz
-    const allEnvs = await apiFetch("/admin/v1/envs");
-    const envs = (allEnvs || []).filter(e => Number(e.project_id) === projectId);
+    const envs = await apiFetchAll("/admin/v1/envs", { project_id: projectId });
 
     const rows = envs.map(e => `
       <tr>
@@ -246,7 +317,7 @@ async function renderKeys() {
           <div class="card-body">
             <label class="form-label">Environment</label>
             <select id="keyEnvSelect" class="form-select"></select>
-            <div class="form-text mt-2">GET /admin/v1/envs (client-side filter)</div>
+            <div class="form-text mt-2">GET /admin/v1/envs?project_id=…</div>
           </div>
         </div>
       </div>
@@ -282,14 +353,7 @@ async function renderKeys() {
   const $env = document.getElementById("keyEnvSelect");
 
   async function loadProjects() {
-    const projects = await apiFetch("/admin/v1/projects");
-    if (!projects || projects.length === 0) {
-      $project.innerHTML = `<option value="">(no projects)</option>`;
-      return;
-    }
-    $project.innerHTML = projects
-      .map(p => `<option value="${p.id}">${escapeHtml(p.name)} (#${p.id})</option>`)
-      .join("");
+    await loadProjectOptions($project);
   }
 
   async function loadEnvsForProject() {
@@ -299,8 +363,7 @@ async function renderKeys() {
       return;
     }
 
-    const allEnvs = await apiFetch("/admin/v1/envs");
-    const envs = (allEnvs || []).filter(e => Number(e.project_id) === projectId);
+    const envs = await apiFetchAll("/admin/v1/envs", { project_id: projectId });
 
     if (envs.length === 0) {
       $env.innerHTML = `<option value="">(no envs for this project)</option>`;
@@ -316,12 +379,11 @@ async function renderKeys() {
     const projectId = Number($project.value);
     const envId = Number($env.value);
 
-    const allKeys = await apiFetch("/admin/v1/keys");
-
     // Backend key obj: {id, key, project_id, environment_id}
-    let keys = allKeys || [];
-    if (projectId) keys = keys.filter(k => Number(k.project_id) === projectId);
-    if (envId) keys = keys.filter(k => Number(k.environment_id) === envId);
+    const keys = await apiFetchAll("/admin/v1/keys", {
+      project_id: projectId || undefined,
+      environment_id: envId || undefined,
+    });
 
     const rows = keys.map(k => `
       <tr>
@@ -449,17 +511,13 @@ async function renderFlags() {
   const $project = document.getElementById("flagProjectSelect");
 
   async function loadProjects() {
-    const projects = await apiFetch("/admin/v1/projects");
-    if (!projects || projects.length === 0) {
-      $project.innerHTML = `<option value="">(no projects)</option>`;
-      return;
-    }
-    $project.innerHTML = projects
-      .map(p => `<option value="${p.id}">${escapeHtml(p.name)} (#${p.id})</option>`)
-      .join("");
+    await loadProjectOptions($project);
   }
 
-  async function loadFlags() {
+  let flags = [];
+  let nextCursor = null;
+
+  async function loadFlags(more = false) {
     const projectId = Number($project.value);
     if (!projectId) {
       document.getElementById("flagsTableWrap").innerHTML =
@@ -467,8 +525,9 @@ async function renderFlags() {
       return;
     }
 
-    const allFlags = await apiFetch("/admin/v1/flags");
-    const flags = (allFlags || []).filter(f => Number(f.project_id) === projectId);
+    const page = await apiFetchPage("/admin/v1/flags", { project_id: projectId, cursor: more ? nextCursor : undefined });
+    flags = more ? flags.concat(page.items) : page.items;
+    nextCursor = page.next;
 
     const rows = flags.map(f => `
       <tr>
@@ -497,7 +556,10 @@ async function renderFlags() {
         </tr></thead>
         <tbody>${rows || `<tr><td colspan="6" class="text-muted">No flags</td></tr>`}</tbody>
       </table>
+      ${loadMoreButton("flagsMore", nextCursor)}
     `;
+    const $more = document.getElementById("flagsMore");
+    if ($more) $more.onclick = () => loadFlags(true).catch(e => showAlert(e.message));
 
     document.querySelectorAll('button[data-action="manage"]').forEach(btn => {
         btn.onclick = () => {
@@ -651,14 +713,7 @@ async function renderConfigs() {
   }
 
   async function loadProjects() {
-    const projects = await apiFetch("/admin/v1/projects");
-    if (!projects || projects.length === 0) {
-      $project.innerHTML = `<option value="">(no projects)</option>`;
-      return;
-    }
-    $project.innerHTML = projects
-      .map(p => `<option value="${p.id}">${escapeHtml(p.name)} (#${p.id})</option>`)
-      .join("");
+    await loadProjectOptions($project);
   }
 
   async function loadEnvsForProject() {
@@ -668,8 +723,7 @@ async function renderConfigs() {
       return;
     }
 
-    const allEnvs = await apiFetch("/admin/v1/envs");
-    const envs = (allEnvs || []).filter(e => Number(e.project_id) === projectId);
+    const envs = await apiFetchAll("/admin/v1/envs", { project_id: projectId });
 
     // GLOBAL seçeneği en üstte
     const opts = [`<option value="">GLOBAL (environment_id = null)</option>`]
@@ -678,7 +732,10 @@ async function renderConfigs() {
     $env.innerHTML = opts.join("");
   }
 
-  async function loadConfigs() {
+  let cfgs = [];
+  let nextCursor = null;
+
+  async function loadConfigs(more = false) {
     const projectId = Number($project.value);
     if (!projectId) {
       document.getElementById("cfgTableWrap").innerHTML =
@@ -686,8 +743,9 @@ async function renderConfigs() {
       return;
     }
 
-    const all = await apiFetch("/admin/v1/configs");
-    const cfgs = (all || []).filter(c => Number(c.project_id) === projectId);
+    const page = await apiFetchPage("/admin/v1/configs", { project_id: projectId, cursor: more ? nextCursor : undefined });
+    cfgs = more ? cfgs.concat(page.items) : page.items;
+    nextCursor = page.next;
 
     const rows = cfgs.map(c => {
       const scope = (c.environment_id == null)
@@ -721,7 +779,10 @@ async function renderConfigs() {
         </thead>
         <tbody>${rows || `<tr><td colspan="5" class="text-muted">No configs</td></tr>`}</tbody>
       </table>
+      ${loadMoreButton("cfgMore", nextCursor)}
     `;
+    const $more = document.getElementById("cfgMore");
+    if ($more) $more.onclick = () => loadConfigs(true).catch(e => showAlert(e.message));
 
     // Edit/Delete button actions
     const mapById = new Map(cfgs.map(x => [Number(x.id), x]));
@@ -828,7 +889,7 @@ async function renderSdkPreview() {
           <div class="card-body">
             <label class="form-label">Environment</label>
             <select id="prevEnv" class="form-select"></select>
-            <div class="form-text mt-2">GET /admin/v1/envs (filter by project)</div>
+            <div class="form-text mt-2">GET /admin/v1/envs?project_id=…</div>
           </div>
         </div>
       </div>
@@ -838,7 +899,7 @@ async function renderSdkPreview() {
           <div class="card-body">
             <label class="form-label">SDK Key</label>
             <select id="prevKey" class="form-select"></select>
-            <div class="form-text mt-2">GET /admin/v1/keys (filter by env)</div>
+            <div class="form-text mt-2">GET /admin/v1/keys?environment_id=…</div>
           </div>
         </div>
       </div>
@@ -876,20 +937,12 @@ async function renderSdkPreview() {
   }
 
   async function loadProjects() {
-    const projects = await apiFetch("/admin/v1/projects");
-    if (!projects || projects.length === 0) {
-      $project.innerHTML = `<option value="">(no projects)</option>`;
-      return;
-    }
-    $project.innerHTML = projects
-      .map(p => `<option value="${p.id}">${escapeHtml(p.name)} (#${p.id})</option>`)
-      .join("");
+    await loadProjectOptions($project);
   }
 
   async function loadEnvsForProject() {
     const projectId = Number($project.value);
-    const allEnvs = await apiFetch("/admin/v1/envs");
-    const envs = (allEnvs || []).filter(e => Number(e.project_id) === projectId);
+    const envs = await apiFetchAll("/admin/v1/envs", { project_id: projectId });
 
     if (envs.length === 0) {
       $env.innerHTML = `<option value="">(no envs)</option>`;
@@ -904,10 +957,7 @@ async function renderSdkPreview() {
     const projectId = Number($project.value);
     const envId = Number($env.value);
 
-    const allKeys = await apiFetch("/admin/v1/keys");
-    const keys = (allKeys || [])
-      .filter(k => Number(k.project_id) === projectId)
-      .filter(k => Number(k.environment_id) === envId);
+    const keys = await apiFetchAll("/admin/v1/keys", { project_id: projectId, environment_id: envId });
 
     if (keys.length === 0) {
       $key.innerHTML = `<option value="">(no keys for this env)</option>`;
@@ -1047,20 +1097,12 @@ async function renderEvaluate() {
   }
 
   async function loadProjects() {
-    const projects = await apiFetch("/admin/v1/projects");
-    if (!projects || projects.length === 0) {
-      $project.innerHTML = `<option value="">(no projects)</option>`;
-      return;
-    }
-    $project.innerHTML = projects
-      .map(p => `<option value="${p.id}">${escapeHtml(p.name)} (#${p.id})</option>`)
-      .join("");
+    await loadProjectOptions($project);
   }
 
   async function loadEnvsForProject() {
     const projectId = Number($project.value);
-    const allEnvs = await apiFetch("/admin/v1/envs");
-    const envs = (allEnvs || []).filter(e => Number(e.project_id) === projectId);
+    const envs = await apiFetchAll("/admin/v1/envs", { project_id: projectId });
 
     if (envs.length === 0) {
       $env.innerHTML = `<option value="">(no envs)</option>`;
@@ -1075,10 +1117,7 @@ async function renderEvaluate() {
     const projectId = Number($project.value);
     const envId = Number($env.value);
 
-    const allKeys = await apiFetch("/admin/v1/keys");
-    const keys = (allKeys || [])
-      .filter(k => Number(k.project_id) === projectId)
-      .filter(k => Number(k.environment_id) === envId);
+    const keys = await apiFetchAll("/admin/v1/keys", { project_id: projectId, environment_id: envId });
 
     if (keys.length === 0) {
       $key.innerHTML = `<option value="">(no keys for this env)</option>`;
@@ -1154,9 +1193,12 @@ async function renderFlagManage(flagId) {
   $alerts.innerHTML = "";
   $view.innerHTML = `<div class="text-muted">Loading...</div>`;
 
-  // Flag'ı tek endpoint ile çekemiyoruz → listeden buluyoruz
-  const allFlags = await apiFetch("/admin/v1/flags");
-  const flag = (allFlags || []).find(f => Number(f.id) === Number(flagId));
+  let flag = null;
+  try {
+    flag = await apiFetch(`/admin/v1/flags/${flagId}`);
+  } catch (e) {
+    flag = null;
+  }
 
   if (!flag) {
     showAlert(`Flag not found: id=${flagId}`, "danger");
@@ -1356,8 +1398,7 @@ async function renderFlagManage(flagId) {
 
   // ---- Load envs for rule env dropdown (filter by project_id)
   async function loadRuleEnvs() {
-    const allEnvs = await apiFetch("/admin/v1/envs");
-    const envs = (allEnvs || []).filter(e => Number(e.project_id) === Number(flag.project_id));
+    const envs = await apiFetchAll("/admin/v1/envs", { project_id: flag.project_id });
     window.__ruleEnvsById = Object.fromEntries(envs.map(e => [Number(e.id), e]));
     const $ruleEnv = document.getElementById("ruleEnv");
 
@@ -1371,7 +1412,7 @@ async function renderFlagManage(flagId) {
 
   // ---- Variants
   async function loadVariants() {
-  const variants = await apiFetch(`/admin/v1/flags/${flagId}/variants`);
+  const variants = await apiFetchAll(`/admin/v1/flags/${flagId}/variants`);
 
   const rows = (variants || []).map(v => `
     <tr>
@@ -1427,7 +1468,7 @@ document.getElementById("refreshVariants").onclick =
 document.getElementById("deleteAllVariants").onclick = async () => {
   try {
     // 1) Önce rule var mı bak → varsa variant silmeyelim (409 yememek için)
-    const rules = await apiFetch(`/admin/v1/flags/${flagId}/rules`);
+    const rules = await apiFetchAll(`/admin/v1/flags/${flagId}/rules`);
     if (rules && rules.length > 0) {
       return showAlert(
         `Bu flag için ${rules.length} rule var. Önce Rules bölümünden "Delete All" yap, sonra variantları silebilirsin.`,
@@ -1436,7 +1477,7 @@ document.getElementById("deleteAllVariants").onclick = async () => {
     }
 
     // 2) Variantları çek
-    const variants = await apiFetch(`/admin/v1/flags/${flagId}/variants`);
+    const variants = await apiFetchAll(`/admin/v1/flags/${flagId}/variants`);
     if (!variants || variants.length === 0) return showAlert("No variants to delete.", "info");
 
     if (!confirm(`Delete ALL variants for flag_id=${flagId}? (${variants.length} items)`)) return;
@@ -1478,7 +1519,7 @@ document.getElementById("deleteAllVariants").onclick = async () => {
   // ---- Rules
   async function loadRules() {
 
-  const rules = await apiFetch(`/admin/v1/flags/${flagId}/rules`);
+  const rules = await apiFetchAll(`/admin/v1/flags/${flagId}/rules`);
 
   const selectedEnvId = Number(document.getElementById("ruleEnv").value || 0);
   let filtered = rules || [];
@@ -1575,7 +1616,7 @@ document.getElementById("deleteAllVariants").onclick = async () => {
             const selectedEnvId = Number(document.getElementById("ruleEnv").value || 0);
             if (!selectedEnvId) return showAlert("Select an environment first.", "warning");
 
-            const rules = await apiFetch(`/admin/v1/flags/${flagId}/rules`);
+            const rules = await apiFetchAll(`/admin/v1/flags/${flagId}/rules`);
             const envRules = (rules || []).filter(r => Number(r.environment_id) === selectedEnvId);
 
             if (envRules.length === 0) {
@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+"""
+cache'den dönen isteklerin,aynı worker'da yavaş bir DB sorgusu (cache miss) beklenirken de akmaya devam ettiğini gösteren script.
+uygulamayı process içinde (httpx.ASGITransport ile) çalıştırır,DB olarak geçici bir sqlite dosyası kullanır ve yavaş bir MariaDB sorgusunu taklit etmek için snapshot oluşturma
+adımına --db-delay kadar bekleme ekler.iki mod karşılaştırılır:
+- blocking: eski davranış,DB işi async endpoint'in içinde senkron çalışıyor (run_db yerine direkt çağrı)
+- threadpool: yeni davranış,DB işi run_db ile thread havuzunda çalışıyor
+miss sürdüğü boyunca --clients kadar istemci durmadan cache hit isteği gönderir.blocking modda miss süresince hiçbir hit cevaplanamadığı için hit'siz geçen en uzun süre (longest stall)
+db-delay kadar uzar ve saniyedeki hit sayısı düşer,threadpool modda hit'ler miss'ten etkilenmez.
+kullanım: python scripts/bench_concurrency.py --clients 20 --db-delay 0.5
+"""
+
+
+def _seed(n_projects: int):
+    from sqlmodel import Session
+    from app.core.db import engine
+    from app.models import Project, Environment, SDKKey, FeatureFlag
+
+    with Session(engine) as session:
+        for i in range(n_projects):
+            p = Project(name=f"bench_{i}")
+            session.add(p)
+            session.commit()
+            session.refresh(p)
+            env = Environment(name="prod", project_id=p.id)
+            session.add(env)
+            session.commit()
+            session.refresh(env)
+            session.add(SDKKey(key=f"bench-key-{i}", environment_id=env.id, project_id=p.id))
+            session.add(FeatureFlag(key="enable_dark_mode", status="active", project_id=p.id))
+            session.commit()
+
+
+async def _run(mode: str, clients: int, db_delay: float):
+    import httpx
+    from app.main import app
+    from app.core import snapshots
+    from app.core.db import run_db
+    from app.core.cache import invalidate_project_sync
+
+    original_build = snapshots.build_snapshot
+
+    def slow_build(session, *args, **kwargs):
+        time.sleep(db_delay)
+        return original_build(session, *args, **kwargs)
+
+    async def inline_db(fn, *args, **kwargs):
+        from sqlmodel import Session
+        from app.core.db import engine
+        with Session(engine) as session:
+            return fn(session, *args, **kwargs)
+
+    snapshots.build_snapshot = slow_build
+    snapshots.run_db = run_db if mode == "threadpool" else inline_db
+    invalidate_project_sync(1)
+    invalidate_project_sync(2)
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            hot = {"X-SDK-Key": "bench-key-0"}
+            cold = {"X-SDK-Key": "bench-key-1"}
+            # proje 0'ı ısıt (L1 cache'e girsin),proje 1 soğuk kalsın
+            await client.get("/sdk/v1/flags", params={"env": "prod"}, headers=hot)
+            await client.get("/sdk/v1/flags", params={"env": "prod"}, headers=cold)
+            invalidate_project_sync(2)
+
+            async def hit_loop(stop: asyncio.Event, latencies: list, done_at: list):
+                # miss devam ettiği sürece sürekli hit gönderen bir istemci
+                while not stop.is_set():
+                    t0 = time.perf_counter()
+                    r = await client.get("/sdk/v1/flags", params={"env": "prod"}, headers=hot)
+                    r.raise_for_status()
+                    latencies.append(time.perf_counter() - t0)
+                    done_at.append(time.perf_counter())
+                    await asyncio.sleep(0)  # L1 hit'i hiç await etmeden dönebilir,diğer görevlere sıra ver
+
+            async def one_miss(stop: asyncio.Event):
+                await asyncio.sleep(0.05)  # hit istemcileri çalışmaya başlasın
+                t0 = time.perf_counter()
+                r = await client.get("/sdk/v1/flags", params={"env": "prod"}, headers=cold)
+                r.raise_for_status()
+                elapsed = time.perf_counter() - t0
+                await asyncio.sleep(0.05)
+                stop.set()
+                return elapsed
+
+            stop = asyncio.Event()
+            latencies: list = []
+            done_at: list = []
+            t0 = time.perf_counter()
+            results = await asyncio.gather(one_miss(stop), *(hit_loop(stop, latencies, done_at) for _ in range(clients)))
+            total = time.perf_counter() - t0
+            miss_elapsed = results[0]
+    finally:
+        snapshots.build_snapshot = original_build
+        snapshots.run_db = run_db
+
+    latencies = sorted(latencies)
+    # hiç hit cevaplanamayan en uzun aralık: event loop bloklanırsa db-delay'e yaklaşır
+    done_at = sorted(done_at)
+    max_gap = max((b - a for a, b in zip(done_at, done_at[1:])), default=0.0)
+    p50 = statistics.median(latencies)
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    print(
+        f"{mode:<10} | hits={len(latencies):6d} ({len(latencies) / total:7.0f} req/s) "
+        f"| hit p50={p50 * 1000:6.1f} ms p99={p99 * 1000:6.1f} ms max={latencies[-1] * 1000:6.1f} ms "
+        f"| longest stall={max_gap * 1000:6.1f} ms | miss={miss_elapsed * 1000:6.1f} ms"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=20, help="aynı anda hit gönderen istemci sayısı")
+    ap.add_argument("--db-delay", type=float, default=0.5, help="yavaş DB sorgusunu taklit eden bekleme (sn)")
+    args = ap.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        db_path = os.path.join(tempfile.mkdtemp(prefix="ff-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        raise SystemExit("httpx is required for this benchmark: pip install httpx")
+
+    import app.models  # noqa: F401  (tabloların metadata'ya kaydolması için)
+    from app.core.db import init_db
+    init_db()
+    _seed(2)
+
+    print(f"== Concurrency benchmark: 1 slow miss ({args.db_delay * 1000:.0f} ms) + {args.clients} clients sending cache hits ==")
+    for mode in ("blocking", "threadpool"):
+        asyncio.run(_run(mode, args.clients, args.db_delay))
+
+
+if __name__ == "__main__":
+    main()
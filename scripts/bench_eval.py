@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import eval as ev
+
+
+def _flags(n_flags: int, hash_version: int):
+    return [
+        {
+            "key": f"flag_{i}",
+            "on": True,
+            "default_variant": "off",
+            "hash_version": hash_version,
+            "rules": [
+                {"predicate": {"attr": "country", "op": "==", "value": "TR"}, "distribution": {"dark": 30, "off": 70}},
+            ],
+        }
+        for i in range(n_flags)
+    ]
+
+
+def _bench(ruleset, users, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for u in users:
+            ev.evaluate_ruleset(ruleset, u)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _legacy(flags, users, repeat: int) -> float:
+    # eski (derlenmemiş) yol: her flag için seed string'i kurup _hash_to_bucket ile sha256 hexdigest
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for u in users:
+            uid = u.get("user_id") or str(u)
+            for f in flags:
+                ev._pick_variant(f["rules"][0]["distribution"], f"1:{f['key']}:{uid}")
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n-flags", type=int, default=50)
+    ap.add_argument("--n-users", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    users = [{"user_id": f"user-{i}", "country": "TR"} for i in range(args.n_users)]
+    evaluations = args.n_flags * args.n_users
+
+    print(f"== Evaluate benchmark: {args.n_flags} flags x {args.n_users} users (best of {args.repeat}) ==")
+    legacy = _legacy(_flags(args.n_flags, 1), users, args.repeat)
+    print(f"legacy (per-flag sha256 + re-normalize): {legacy * 1e9 / evaluations:8.0f} ns/flag")
+
+    for version, label in ((1, "v1 sha256"), (2, "v2 fast64")):
+        ruleset = ev.compile_ruleset(1, _flags(args.n_flags, version))
+        elapsed = _bench(ruleset, users, args.repeat)
+        print(f"compiled {label:<30}: {elapsed * 1e9 / evaluations:8.0f} ns/flag")
+
+    if ev.np is not None:
+        for version, label in ((1, "v1 sha256"), (2, "v2 fast64")):
+            ruleset = ev.compile_ruleset(1, _flags(args.n_flags, version))
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                ev.evaluate_batch(ruleset, users)
+                best = min(best, time.perf_counter() - t0)
+            print(f"batch/numpy {label:<27}: {best * 1e9 / evaluations:8.0f} ns/flag")
+
+    # v2 dağılımının da beklenen oranda (30/70) olduğunu gösterelim
+    ruleset = ev.compile_ruleset(1, _flags(1, 2))
+    dark = sum(1 for u in users if ev.evaluate_ruleset(ruleset, u)["flag_0"] == "dark")
+    print(f"v2 distribution check: dark={dark / len(users) * 100:.1f}% (expected ~30%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+"""
+invalidate_project_sync'in eski SCAN + DEL yolu ile yeni generation (INCR) yolunu karşılaştıran benchmark.
+yerel bir Redis gerektirir.Redis'i --keys kadar ff:flags:{project_id}:{environment_id} key'i ile doldurup iki yolu da aynı projeler üzerinde ölçer,
+ayrıca okuma tarafında düz GET ile generation + değeri tek round-trip'te okuyan Lua script'ini karşılaştırır.
+script verilen DB'yi (varsayılan 15) boş değilse kullanmaz,sonunda da bu DB'yi temizler.
+kullanım: python scripts/bench_invalidation.py --keys 100000 --projects 2000 --repeat 50
+"""
+
+
+def _ms(samples):
+    samples = sorted(samples)
+    p99 = samples[max(0, int(len(samples) * 0.99) - 1)]
+    return f"mean={statistics.mean(samples) * 1000:8.3f} ms  p50={statistics.median(samples) * 1000:8.3f} ms  p99={p99 * 1000:8.3f} ms"
+
+
+def _populate(r, n_keys: int, n_projects: int, payload: str):
+    pipe = r.pipeline(transaction=False)
+    for i in range(n_keys):
+        project_id = i % n_projects
+        environment_id = i // n_projects
+        pipe.setex(f"ff:flags:{project_id}:{environment_id}", 3600, payload)
+        if i % 5000 == 4999:
+            pipe.execute()
+    pipe.execute()
+
+
+def _invalidate_scan(r, project_id: int):
+    # eski invalidate_project_sync'in Redis kısmı: projenin key'lerini SCAN ile bulup DEL
+    pipe = r.pipeline()
+    found_any = False
+    for pattern in (f"ff:flags:{project_id}:*", f"ff:cfg:{project_id}:*"):
+        for k in r.scan_iter(match=pattern):
+            pipe.delete(k)
+            found_any = True
+    if found_any:
+        pipe.execute()
+
+
+def _invalidate_gen(r, project_id: int):
+    from app.core.cache import project_gen_key
+    pipe = r.pipeline()
+    pipe.incr(project_gen_key(project_id))
+    pipe.execute()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379"))
+    ap.add_argument("--db", type=int, default=15, help="benchmark için kullanılacak (boş) Redis DB numarası")
+    ap.add_argument("--keys", type=int, default=100_000)
+    ap.add_argument("--projects", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--reads", type=int, default=5000)
+    ap.add_argument("--payload-bytes", type=int, default=512)
+    args = ap.parse_args()
+
+    from redis import Redis
+    from app.core.cache import _GET_WITH_GEN_LUA, project_gen_key, generational_key
+
+    r = Redis.from_url(args.redis_url, db=args.db, decode_responses=True, socket_connect_timeout=2)
+    try:
+        r.ping()
+    except Exception as e:
+        raise SystemExit(f"Redis is not reachable at {args.redis_url} (db {args.db}): {e}")
+    if r.dbsize():
+        raise SystemExit(f"Redis db {args.db} is not empty, refusing to run (pick another one with --db)")
+
+    payload = "x" * args.payload_bytes
+    try:
+        print(f"== Invalidation benchmark: {args.keys} keys, {args.projects} projects, {args.repeat} invalidations ==")
+        t0 = time.perf_counter()
+        _populate(r, args.keys, args.projects, payload)
+        print(f"populated {r.dbsize()} keys in {time.perf_counter() - t0:.1f}s")
+
+        projects = random.sample(range(args.projects), min(args.repeat, args.projects))
+
+        scan_samples = []
+        for project_id in projects:
+            keys = [k for k in r.scan_iter(match=f"ff:flags:{project_id}:*")]
+            t0 = time.perf_counter()
+            _invalidate_scan(r, project_id)
+            scan_samples.append(time.perf_counter() - t0)
+            # keyspace boyutu sabit kalsın diye silinen key'leri geri yaz (ölçüme dahil değil)
+            pipe = r.pipeline(transaction=False)
+            for k in keys:
+                pipe.setex(k, 3600, payload)
+            pipe.execute()
+
+        gen_samples = []
+        for project_id in projects:
+            t0 = time.perf_counter()
+            _invalidate_gen(r, project_id)
+            gen_samples.append(time.perf_counter() - t0)
+
+        print(f"SCAN + DEL (old): {_ms(scan_samples)}")
+        print(f"INCR gen   (new): {_ms(gen_samples)}")
+        print(f"speedup (mean): {statistics.mean(scan_samples) / statistics.mean(gen_samples):.0f}x")
+
+        # okuma tarafı: düz GET ile generation + değer okuyan tek Lua çağrısı
+        for project_id in projects:
+            gen = int(r.get(project_gen_key(project_id)) or 0)
+            r.setex(generational_key(f"ff:flags:{project_id}:0", gen), 3600, payload)
+
+        get_with_gen = r.register_script(_GET_WITH_GEN_LUA)
+        plain, lua = [], []
+        for i in range(args.reads):
+            project_id = projects[i % len(projects)]
+            key = f"ff:flags:{project_id}:0"
+            t0 = time.perf_counter()
+            r.get(key)
+            plain.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            gen, value = get_with_gen(keys=[project_gen_key(project_id)], args=[key])
+            lua.append(time.perf_counter() - t0)
+            assert value is not None
+        print(f"read GET        : {_ms(plain)}")
+        print(f"read gen + GET  : {_ms(lua)}  (one round-trip)")
+    finally:
+        r.flushdb()
+
+
+if __name__ == "__main__":
+    main()
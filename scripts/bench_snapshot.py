@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+"""
+snapshot'ın DB'den okunmasını (cache miss yolu) eski 5 sorguluk build_snapshot ile yeni 2 sorguluk fetch_snapshot (core/snapshot_loader.py) arasında karşılaştıran benchmark.
+--flags kadar flag'i olan (her flag'in --variants kadar variant'ı ve her ortamda --rules kadar kuralı var) bir proje oluşturup iki yolun da sorgu sayısını ve süresini ölçer,
+ayrıca iki yolun aynı snapshot'ı ürettiğini kontrol eder.
+DATABASE_URL verilmezse geçici bir sqlite dosyası kullanır,verilirse (ör: MariaDB) o veritabanında yeni bir proje oluşturup sonunda siler.
+kullanım: python scripts/bench_snapshot.py --flags 5000 --repeat 20
+"""
+
+
+def _ms(samples):
+    samples = sorted(samples)
+    p99 = samples[max(0, int(len(samples) * 0.99) - 1)]
+    return f"mean={statistics.mean(samples) * 1000:8.2f} ms  p50={statistics.median(samples) * 1000:8.2f} ms  p99={p99 * 1000:8.2f} ms"
+
+
+def _legacy_build(session, env, project_id, environment_id):
+    # eski build_snapshot: versiyon,config,flag,variant (IN listesi) ve kural için ayrı sorgular
+    from sqlmodel import select
+    from app.core.changes import current_version
+    from app.models import FeatureFlag, FeatureVariant, FeatureRule, FeatureConfig
+
+    version = current_version(session, project_id)
+    cfg_rows = session.exec(
+        select(FeatureConfig).where(
+            FeatureConfig.project_id == project_id,
+            (FeatureConfig.environment_id == None) | (FeatureConfig.environment_id == environment_id),
+        )
+    ).all()
+    configs = {}
+    for c in cfg_rows:
+        if c.environment_id is None:
+            configs[c.key] = c.value
+    for c in cfg_rows:
+        if c.environment_id == environment_id:
+            configs[c.key] = c.value
+
+    flags = session.exec(
+        select(FeatureFlag).where(FeatureFlag.project_id == project_id, FeatureFlag.status.in_(["active", "published"]))
+    ).all()
+    if not flags:
+        return {"env": env, "project_id": project_id, "version": version, "configs": configs, "flags": []}
+    flag_ids = [int(f.id) for f in flags if f.id is not None]
+
+    variants_by_flag = defaultdict(dict)
+    for v in session.exec(select(FeatureVariant).where(FeatureVariant.flag_id.in_(flag_ids))).all():
+        variants_by_flag[int(v.flag_id)][v.name] = v.payload or {}
+
+    rules_by_flag = defaultdict(list)
+    rules = session.exec(
+        select(FeatureRule)
+        .where(FeatureRule.flag_id.in_(flag_ids), FeatureRule.environment_id == environment_id)
+        .order_by(FeatureRule.priority)
+    ).all()
+    for r in rules:
+        rules_by_flag[int(r.flag_id)].append({"priority": r.priority, "predicate": r.predicate or {}, "distribution": r.distribution or {}})
+
+    out_flags = [
+        {
+            "key": f.key,
+            "on": f.on,
+            "default_variant": f.default_variant,
+            "hash_version": f.hash_version,
+            "variants": variants_by_flag.get(int(f.id), {}),
+            "rules": rules_by_flag.get(int(f.id), []),
+        }
+        for f in flags
+    ]
+    return {"env": env, "project_id": project_id, "version": version, "configs": configs, "flags": out_flags}
+
+
+def _seed(args):
+    from sqlalchemy import insert, select
+    from sqlmodel import Session
+    from app.core.db import engine
+    from app.models import Project, Environment, FeatureFlag, FeatureVariant, FeatureRule, FeatureConfig
+
+    with Session(engine) as session:
+        project = Project(name=f"bench_snapshot_{int(time.time())}", change_version=1)
+        session.add(project)
+        session.commit()
+        session.refresh(project)
+        project_id = int(project.id)
+
+        session.exec(insert(Environment), params=[{"name": f"env{i}", "project_id": project_id} for i in range(args.envs)])
+        env_ids = list(session.exec(select(Environment.id).where(Environment.project_id == project_id).order_by(Environment.id)).scalars())
+
+        session.exec(insert(FeatureFlag), params=[
+            {"project_id": project_id, "key": f"flag_{i}", "on": True, "default_variant": "off",
+             # her 10 flag'den biri draft,snapshot'a girmiyor
+             "status": "draft" if i % 10 == 9 else "active", "hash_version": 2}
+            for i in range(args.flags)
+        ])
+        flag_ids = list(session.exec(select(FeatureFlag.id).where(FeatureFlag.project_id == project_id)).scalars())
+
+        names = [f"v{j}" for j in range(args.variants)]
+        session.exec(insert(FeatureVariant), params=[
+            {"flag_id": fid, "name": name, "payload": {"theme": name, "flag": fid}}
+            for fid in flag_ids for name in names
+        ])
+        share = 100 // (len(names) + 1)
+        distribution = {name: share for name in names}
+        distribution["off"] = 100 - share * len(names)
+        session.exec(insert(FeatureRule), params=[
+            {"flag_id": fid, "environment_id": eid, "priority": p + 1,
+             "predicate": {"attr": "country", "op": "in", "value": ["TR", "DE"]}, "distribution": distribution}
+            for fid in flag_ids for eid in env_ids for p in range(args.rules)
+        ])
+        session.exec(insert(FeatureConfig), params=[
+            {"project_id": project_id, "environment_id": None if i % 4 else env_ids[0], "key": f"cfg_{i // 2}", "value": {"i": i}}
+            for i in range(args.configs)
+        ])
+        session.commit()
+    return project_id, env_ids[0]
+
+
+def _cleanup(project_id: int):
+    from sqlalchemy import delete, select
+    from sqlmodel import Session
+    from app.core.db import engine
+    from app.models import Project, Environment, FeatureFlag, FeatureVariant, FeatureRule, FeatureConfig
+
+    flag_ids = select(FeatureFlag.id).where(FeatureFlag.project_id == project_id)
+    with Session(engine) as session:
+        session.exec(delete(FeatureRule).where(FeatureRule.flag_id.in_(flag_ids)))
+        session.exec(delete(FeatureVariant).where(FeatureVariant.flag_id.in_(flag_ids)))
+        session.exec(delete(FeatureFlag).where(FeatureFlag.project_id == project_id))
+        session.exec(delete(FeatureConfig).where(FeatureConfig.project_id == project_id))
+        session.exec(delete(Environment).where(Environment.project_id == project_id))
+        session.exec(delete(Project).where(Project.id == project_id))
+        session.commit()
+
+
+def _measure(build, project_id: int, environment_id: int, repeat: int):
+    from sqlalchemy import event
+    from sqlmodel import Session
+    from app.core.db import engine
+
+    queries = [0]
+
+    def _count(*_):
+        queries[0] += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        samples = []
+        result = None
+        for _ in range(repeat):
+            with Session(engine) as session:
+                t0 = time.perf_counter()
+                result = build(session, "env0", project_id, environment_id)
+                samples.append(time.perf_counter() - t0)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    return result, samples, queries[0] / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--flags", type=int, default=5000)
+    ap.add_argument("--variants", type=int, default=2, help="flag başına variant sayısı")
+    ap.add_argument("--rules", type=int, default=2, help="flag başına her ortamdaki kural sayısı")
+    ap.add_argument("--envs", type=int, default=2)
+    ap.add_argument("--configs", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        db_path = os.path.join(tempfile.mkdtemp(prefix="ff-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    import app.models  # noqa: F401  (tabloların metadata'ya kaydolması için)
+    from app.core.db import init_db
+    from app.core.snapshot_loader import fetch_snapshot
+    init_db()
+
+    t0 = time.perf_counter()
+    project_id, environment_id = _seed(args)
+    print(f"== Snapshot load benchmark: {args.flags} flags x {args.variants} variants x {args.rules} rules/env, {args.envs} envs ==")
+    print(f"seeded project {project_id} in {time.perf_counter() - t0:.1f}s ({os.environ['DATABASE_URL'].split(':')[0]})")
+    try:
+        legacy, legacy_samples, legacy_queries = _measure(_legacy_build, project_id, environment_id, args.repeat)
+        new, new_samples, new_queries = _measure(fetch_snapshot, project_id, environment_id, args.repeat)
+
+        print(f"legacy (5 queries, ORM): {legacy_queries:4.0f} queries/build  {_ms(legacy_samples)}")
+        print(f"fetch_snapshot         : {new_queries:4.0f} queries/build  {_ms(new_samples)}")
+        print(f"speedup (mean): {statistics.mean(legacy_samples) / statistics.mean(new_samples):.1f}x")
+
+        by_key = lambda snapshot: {**snapshot, "flags": sorted(snapshot["flags"], key=lambda f: f["key"])}
+        print(f"same snapshot: {by_key(legacy) == by_key(new)}  (flags: {len(new['flags'])}, configs: {len(new['configs'])})")
+    finally:
+        _cleanup(project_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import random
+import string
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import eval as ev
+
+
+def _rand_id(n: int = 10) -> str:
+    return "".join(random.choice(string.ascii_letters + string.digits) for _ in range(n))
+
+
+def _random_users(n: int):
+    users = []
+    for i in range(n):
+        u = {
+            "country": random.choice(["TR", "DE", "US", None]),
+            "age": random.choice([5, 17, 18, 25, 40, 65, "30", None]),
+            "is_premium": random.choice([True, False]),
+        }
+        # user_id olmayan kullanıcılarda seed str(user) olur,bu durumu da test ediyoruz
+        if i % 13:
+            u["user_id"] = random.choice([_rand_id(), i, f"u-{i}"])
+        users.append(u)
+    return users
+
+
+RULESETS = [
+    [{"predicate": {"attr": "country", "op": "==", "value": "TR"}, "distribution": {"dark": 30, "off": 70}}],
+    [
+        {"predicate": {"attr": "country", "op": "in", "value": ["TR", "DE"]}, "distribution": {"a": 33, "b": 33, "c": 34}},
+        {"predicate": {"attr": "age", "op": ">=", "value": 18}, "distribution": {"x": 1, "off": 99}},
+    ],
+    [{"predicate": {"attr": "is_premium", "op": "==", "value": True}, "distribution": {"a": 0.2, "b": 0.5, "c": "0.3"}}],
+    [
+        {"predicate": {"attr": "age", "op": "<", "value": 30}, "distribution": {}},
+        {"predicate": {"attr": "age", "op": ">", "value": 10}, "distribution": {"z": 100}},
+    ],
+    [{"predicate": {"attr": "country", "op": "not_in", "value": ["US"]}, "distribution": {"a": 1, "b": 2, "c": 3, "d": 0}}],
+]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n-users", type=int, default=20000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    if ev.np is None:
+        print("numpy is not installed, vectorized path is disabled — nothing to compare")
+        return
+
+    random.seed(args.seed)
+    users = _random_users(args.n_users)
+    failures = 0
+
+    # 1) bucket hesabı: _hash_to_bucket ile _bucket_array birebir aynı olmalı
+    user_seeds = [ev.UserSeed(u) for u in users]
+    seeds = [f"1:flag:{s.text}" for s in user_seeds]
+    scalar = [ev._hash_to_bucket(s) for s in seeds]
+    vector = ev._bucket_array(seeds).tolist()
+    if scalar != vector:
+        failures += 1
+        print("❌ v1 bucket mismatch")
+    else:
+        print(f"✅ v1 buckets identical for {len(seeds)} seeds")
+
+    # hash_version=2: skaler CompiledFlag.bucket ile _bucket_array_v2 aynı olmalı
+    flag_v2 = ev.compile_flag(project_id=1, flag_key="flag", default_variant="off", rules=RULESETS[0], hash_version=2)
+    scalar = [flag_v2.bucket(s) for s in user_seeds]
+    hashes = ev.np.array([s.hash64 for s in user_seeds], dtype=ev.np.uint64)
+    vector = ev._bucket_array_v2(flag_v2.flag_hash, hashes).tolist()
+    if scalar != vector:
+        failures += 1
+        print("❌ v2 bucket mismatch")
+    else:
+        print(f"✅ v2 buckets identical for {len(seeds)} seeds")
+
+    # 2) variant seçimi: skaler evaluate_one_flag ile toplu (vectorized) evaluate_batch aynı olmalı
+    flags = [
+        {"key": f"flag_v{version}_{i}", "on": True, "default_variant": "off", "rules": rules, "hash_version": version}
+        for version in (1, 2)
+        for i, rules in enumerate(RULESETS)
+    ]
+    flags.append({"key": "flag_off", "on": False, "default_variant": "off", "rules": RULESETS[0]})
+    ruleset = ev.compile_ruleset(7, flags)
+    batch = ev.evaluate_batch(ruleset, users)
+
+    for f in flags:
+        expected = [
+            f["default_variant"] if not f["on"] else ev.evaluate_one_flag(
+                project_id=7,
+                flag_key=f["key"],
+                default_variant=f["default_variant"],
+                rules=f["rules"],
+                user=u,
+                hash_version=f.get("hash_version", 1),
+            )
+            for u in users
+        ]
+        got = [r[f["key"]] for r in batch]
+        if expected != got:
+            failures += 1
+            bad = sum(1 for a, b in zip(expected, got) if a != b)
+            print(f"❌ {f['key']}: {bad} mismatches")
+        else:
+            print(f"✅ {f['key']}: identical for {len(users)} users")
+
+    if failures:
+        raise SystemExit(1)
+    print("== Parity OK ==")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+"""
+projelerin FlagSnapshot satırlarını (materialized snapshot) yeniden yazan script.admin API'si her yazmada bu satırları kendisi güncelliyor,bu script sadece şu durumlar için:
+-FlagSnapshot tablosu eklenmeden önce oluşturulmuş projelerin satırlarını önceden yazmak (yoksa bu projeler ilk admin yazmasına kadar cache miss'te tablolardan oluşturuluyor)
+-DB'ye admin API'si dışından (elle SQL,başka bir servis vb.) yazıldıktan sonra satırları güncellemek
+her proje kendi transaction'ında yazılıyor.
+kullanım: python scripts/materialize_snapshots.py            (bütün projeler)
+          python scripts/materialize_snapshots.py --project 3 --project 5
+"""
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--project", type=int, action="append", help="sadece bu proje (birden fazla verilebilir)")
+    args = ap.parse_args()
+
+    from sqlmodel import Session, select
+    from app.core.db import engine, init_db
+    from app.core.snapshots import materialize_snapshots
+    from app.models import Project
+
+    init_db()
+    with Session(engine) as session:
+        project_ids = args.project or list(session.exec(select(Project.id).order_by(Project.id)))
+
+    for project_id in project_ids:
+        t0 = time.perf_counter()
+        with Session(engine) as session:
+            if session.get(Project, project_id) is None:
+                print(f"[MATERIALIZE] project {project_id} not found")
+                continue
+            materialize_snapshots(session, project_id)
+            session.commit()
+        print(f"[MATERIALIZE] project {project_id} in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,12 +31,12 @@ function Get-All($path) { return Invoke-RestMethod -Method Get -Uri "$BaseUrl$pa
 function Post($path, $body) { return Invoke-RestMethod -Method Post -Uri "$BaseUrl$path" -ContentType "application/json" -Body (Json $body) }
 function Patch($path, $body) { return Invoke-RestMethod -Method Patch -Uri "$BaseUrl$path" -ContentType "application/json" -Body (Json $body) }
 
-$projects = Get-All "/admin/v1/projects"
+$projects = Get-All "/admin/v1/projects?limit=1000"
 $project = $projects | Where-Object { $_.name -eq $ProjectName } | Select-Object -First 1
 if (-not $project) { $project = Post "/admin/v1/projects" @{ name = $ProjectName } }
 $projectId = [int]$project.id
 
-$envs = Get-All "/admin/v1/envs"
+$envs = Get-All "/admin/v1/envs?project_id=$projectId"
 $prodEnv = $envs | Where-Object { $_.project_id -eq $projectId -and $_.name -eq $ProdEnvName } | Select-Object -First 1
 if (-not $prodEnv) { $prodEnv = Post "/admin/v1/envs" @{ name = $ProdEnvName; project_id = $projectId } }
 $prodEnvId = [int]$prodEnv.id
@@ -45,14 +45,14 @@ $devEnv = $envs | Where-Object { $_.project_id -eq $projectId -and $_.name -eq $
 if (-not $devEnv) { $devEnv = Post "/admin/v1/envs" @{ name = $DevEnvName; project_id = $projectId } }
 $devEnvId = [int]$devEnv.id
 
-$keys = Get-All "/admin/v1/keys"
+$keys = Get-All "/admin/v1/keys?project_id=$projectId"
 $prodKeyObj = $keys | Where-Object { $_.key -eq $ProdKey -and $_.project_id -eq $projectId -and $_.environment_id -eq $prodEnvId } | Select-Object -First 1
 if (-not $prodKeyObj) { $prodKeyObj = Post "/admin/v1/keys" @{ key = $ProdKey; project_id = $projectId; environment_id = $prodEnvId } }
 
 $devKeyObj = $keys | Where-Object { $_.key -eq $DevKey -and $_.project_id -eq $projectId -and $_.environment_id -eq $devEnvId } | Select-Object -First 1
 if (-not $devKeyObj) { $devKeyObj = Post "/admin/v1/keys" @{ key = $DevKey; project_id = $projectId; environment_id = $devEnvId } }
 
-$flags = Get-All "/admin/v1/flags"
+$flags = Get-All "/admin/v1/flags?project_id=$projectId&limit=1000"
 $flag = $flags | Where-Object { $_.project_id -eq $projectId -and $_.key -eq "enable_dark_mode" } | Select-Object -First 1
 if (-not $flag) {
   $flag = Post "/admin/v1/flags" @{ key="enable_dark_mode"; project_id=$projectId; on=$true; default_variant="off"; status="published" }
@@ -70,7 +70,7 @@ if (-not ($rules | Where-Object { $_.environment_id -eq $prodEnvId -and $_.prior
 }
 
 # Configs (global + prod)
-$configs = Get-All "/admin/v1/configs"
+$configs = Get-All "/admin/v1/configs?project_id=$projectId&limit=1000"
 function FindCfg($envId) {
   return ($configs | Where-Object {
     $_.project_id -eq $projectId -and $_.key -eq "support_email" -and (
@@ -83,7 +83,7 @@ $g = FindCfg $null
 if (-not $g) { Post "/admin/v1/configs" @{ project_id=$projectId; environment_id=$null; key="support_email"; value="support@shop.com" } | Out-Null }
 else { Patch "/admin/v1/configs/$($g.id)" @{ value="support@shop.com" } | Out-Null }
 
-$configs = Get-All "/admin/v1/configs"
+$configs = Get-All "/admin/v1/configs?project_id=$projectId&limit=1000"
 $p = FindCfg $prodEnvId
 if (-not $p) { Post "/admin/v1/configs" @{ project_id=$projectId; environment_id=$prodEnvId; key="support_email"; value="support-prod@shop.com" } | Out-Null }
 else { Patch "/admin/v1/configs/$($p.id)" @{ value="support-prod@shop.com" } | Out-Null }